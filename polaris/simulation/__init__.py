@@ -0,0 +1,14 @@
+# ============================================================
+# GNC Hapsis rotation simulation
+#
+# Import from the modules themselves, e.g.
+#
+#   from polaris.simulation.engine import BatchSimulator
+#   from polaris.simulation.controllers import flight_law
+#
+# Nothing is imported here, so each module's demo runs with
+# `python -m polaris.simulation.<module>` without the package
+# having imported it first. The command line is
+# `python -m polaris.simulation` (__main__.py).
+#
+# ============================================================
@@ -0,0 +1,547 @@
+# ============================================================
+# Command line interface for the GNC Hapsis rotation simulation
+#
+#   python -m polaris.simulation run --law code --seed 1 -o run.npz
+#   python -m polaris.simulation campaign -n 5000 -o campaign.json
+#   python -m polaris.simulation sweep --kp-range 0.1 2 20 --kd-range 0.05 1 20
+#   python -m polaris.simulation tune --law stag -o gains.h
+#   python -m polaris.simulation fleet --seeds 8 --tf 60
+#   python -m polaris.simulation hil --device /dev/ttyACM0 --duration 60
+#   python -m polaris.simulation mission -n 5000 --config STAG/flight_controller_v3/src/Config.h
+#   python -m polaris.simulation latency --laws code stag --jitter-log "10_30_2025_test/log_*.csv"
+#   python -m polaris.simulation cycle --law stag --open-delay 0.02 --kp-range 0.2 2 50 --kd-range 0.1 1.5 50
+#   python -m polaris.simulation catalog 10_30_2025_test polaris/tests --order settling_time --limit 10
+#   python -m polaris.simulation analyze 10_30_2025_test polaris/tests --figures analysis -o analysis/summary.csv
+#
+# Headless by default: nothing is printed while simulating and
+# matplotlib is only imported for --plot. Results go to stdout as
+# JSON, or to a .json / .npz (or, for tables, .csv) file with -o.
+#
+# ============================================================
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+
+def write_output(path, data):
+    """
+    Write a dict of scalars and arrays as JSON (stdout when path is None
+    or "-"), as NPZ, or as CSV when the arrays are the columns of a table.
+    """
+    if path and path.endswith(".npz"):
+        np.savez_compressed(path, **{k: np.asarray(v) for k, v in data.items()})
+        return
+    if path and path.endswith(".csv"):
+        import pandas as pd
+
+        pd.DataFrame(data).to_csv(path, index=False)
+        return
+
+    def plain(value):
+        if isinstance(value, np.ndarray):
+            return np.where(np.isnan(value), None, value).tolist() if value.dtype.kind == "f" else value.tolist()
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, float) and np.isnan(value):
+            return None
+        if isinstance(value, dict):
+            return {k: plain(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [plain(v) for v in value]
+        return value
+
+    text = json.dumps(plain(data), indent=2)
+    if path in (None, "-"):
+        print(text)
+    else:
+        with open(path, "w") as file:
+            file.write(text + "\n")
+
+
+def parse_params(args):
+    """
+    Plant and timing overrides for campaign.NOMINAL from the shared options
+    the subcommand takes.
+    """
+    params = {}
+    if getattr(args, "bno055", False):
+        from .sensor import BNO055
+
+        params.update(BNO055)
+    for name in ("M", "R", "control_torque", "disturbance", "tf", "n_steps",
+                 "open_delay", "close_delay", "min_on", "skew", "balance",
+                 "sensor_rate", "sensor_latency", "resolution", "gyro_noise"):
+        value = getattr(args, name, None)
+        if value is not None:
+            params[name] = value
+    if getattr(args, "setpoint", None) is not None:
+        params["setpoint"] = np.radians(args.setpoint)
+    return params
+
+
+def parse_gains(args):
+    return {name: getattr(args, name) for name in ("Kp", "Kd") if getattr(args, name) is not None}
+
+
+def open_cache(args):
+    if args.cache is None:
+        return None
+    from .cache import ResultCache
+
+    return ResultCache(args.cache or None)
+
+
+def cmd_run(args):
+    from .actuator import valve_actuator
+    from .campaign import NOMINAL
+    from .controllers import flight_law
+    from .engine import BatchSimulator, cylinder_inertia
+    from .metrics import summarize
+    from .sensor import bno055_sensor
+
+    params = {**NOMINAL, **parse_params(args)}
+    gains = parse_gains(args)
+    table = None
+    if args.thrust_table:
+        from .thrust import ThrustTable
+
+        table = ThrustTable.load(args.thrust_table)
+
+    def simulate():
+        controller = flight_law(args.law, params["setpoint"], **gains)
+        sim = BatchSimulator(cylinder_inertia(params["M"], params["R"]), controller, n=args.n,
+                             tf=params["tf"], n_steps=params["n_steps"],
+                             control_torque=params["control_torque"],
+                             disturbance=params["disturbance"], thrust_table=table,
+                             actuator=valve_actuator(params), sensor=bno055_sensor(params))
+        result = sim.run(np.random.default_rng(args.seed))
+        traces = dict(t=result.t, theta=result.theta, omega=result.omega,
+                      tau=result.tau, u=result.u, setpoint=result.setpoint)
+        return {**traces, **summarize(result)}
+
+    cache = open_cache(args)
+    if cache is not None and args.seed is not None:
+        key = {"command": "run", "law": args.law, "gains": gains, "params": params,
+               "n": args.n, "seed": args.seed}
+        if table is not None:
+            key["thrust_table"] = [table.step, table.values]
+        arrays = cache.memoize(key, simulate)
+    else:
+        arrays = simulate()
+    traces = ("t", "theta", "omega", "tau", "u", "setpoint")
+
+    data = {"law": args.law, "seed": args.seed}
+    data.update({k: v for k, v in arrays.items() if k not in traces})
+    if args.traces or (args.output or "").endswith(".npz"):
+        data.update({k: arrays[k] for k in traces})
+
+    if args.verbose:
+        # Same debug lines as main.py, for the first member
+        t, theta, omega, tau = arrays["t"], arrays["theta"][0], arrays["omega"][0], arrays["tau"][0]
+        for i in range(0, t.size - 1, 100):
+            print(f"t = {t[i]:.2f}s, theta = {theta[i]:.2f}, "
+                  f"omega = {omega[i]:.2f}, tau = {tau[i]:.3f}", file=sys.stderr)
+
+    if args.plot:
+        import matplotlib.pyplot as plt
+
+        band = 5 * (np.pi / 180)
+        plt.figure("Position vs Time")
+        plt.plot(arrays["t"], arrays["theta"].T)
+        plt.axhline(arrays["setpoint"][0] - band, color='k', linestyle='--')
+        plt.axhline(arrays["setpoint"][0] + band, color='k', linestyle='--')
+        plt.xlabel("Time [s]")
+        plt.ylabel("Position (Theta) [rad]")
+        plt.title(f"{args.law} (Position vs Time)")
+        plt.grid(True)
+        plt.show()
+    return data
+
+
+def cmd_campaign(args):
+    from .campaign import run_campaign
+
+    if args.law != "main":
+        raise SystemExit("campaign only flies the main law; use run or sweep for flight laws")
+    dispersions = {name: (low, high) for name, low, high in args.disperse}
+    table = run_campaign(args.runs, seed=args.seed, dispersions=dispersions,
+                         params={**parse_params(args), **parse_gains(args)},
+                         chunk_size=args.chunk_size, workers=args.workers)
+    data = {col: table[col].to_numpy() for col in table.columns}
+    if args.plot:
+        import matplotlib.pyplot as plt
+
+        table.hist(bins=50)
+        plt.show()
+    return data
+
+
+def cmd_sweep(args):
+    from .sweep import sweep
+
+    result = sweep(np.linspace(*args.kp[:2], int(args.kp[2])),
+                   np.linspace(*args.kd[:2], int(args.kd[2])),
+                   law=args.law, n_seeds=args.seeds, seed=args.seed or 0,
+                   params=parse_params(args), chunk_size=args.chunk_size,
+                   workers=args.workers, cache=open_cache(args))
+    data = {"law": args.law, "n_seeds": result.n_seeds}
+    data.update(result.axes)
+    data.update(result.surfaces)
+    data["best"] = result.best(args.cost)
+    if (args.output or "").endswith(".npz"):
+        data.pop("best")
+    if args.plot:
+        import matplotlib.pyplot as plt
+
+        result.heatmap(args.cost)
+        plt.show()
+    return data
+
+
+def cmd_tune(args):
+    from .tuner import tune, write_gains
+
+    best = tune(law=args.law, cost=args.cost, max_seeds=args.seeds, seed=args.seed or 0,
+                params=parse_params(args), chunk_size=args.chunk_size, workers=args.workers,
+                cache=open_cache(args))
+    if args.output and not args.output.endswith((".json", ".npz")):
+        # .py / .h gains files for the flight code
+        write_gains(args.output, best)
+        args.output = "-"
+    if (args.output or "").endswith(".npz"):
+        best.pop("history")
+    return best
+
+
+def cmd_fleet(args):
+    from .fleet import fly_fleet, report
+
+    options = {name: getattr(args, name) for name in ("tf", "M", "R", "control_torque", "disturbance", "setpoint")
+               if getattr(args, name) is not None}
+    table = fly_fleet(args.scripts or None, n_seeds=args.seeds, seed=args.seed or 0,
+                      workers=args.workers, **options)
+    summary = report(table)
+    data = {"script": summary.index.to_numpy(dtype=str)}
+    data.update({col: summary[col].to_numpy() for col in summary.columns})
+    if args.plot:
+        import matplotlib.pyplot as plt
+
+        summary["rms_error"].plot.barh()
+        plt.xlabel("RMS heading error [rad]")
+        plt.tight_layout()
+        plt.show()
+    return data
+
+
+def cmd_hil(args):
+    from .hil import run_hil
+
+    result = run_hil(duration=args.duration, device=args.device, baud=args.baud, rate=args.rate,
+                     spin=args.spin, seed=args.seed)
+    data = result.summary()
+    if (args.output or "").endswith(".npz"):
+        data.pop("events")
+        data.update(result.arrays())
+    if args.plot:
+        import matplotlib.pyplot as plt
+
+        arrays = result.arrays()
+        fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True)
+        ax1.plot(arrays["sent"], arrays["altitude"])
+        ax1.set_ylabel("ALT sent [m]")
+        ax2.plot(arrays["t"], arrays["heading"])
+        ax2.set_ylabel("Heading [deg]")
+        ax2.set_xlabel("Time [s]")
+        plt.show()
+    return data
+
+
+def cmd_mission(args):
+    from .mission import CONFIG_H, read_config, run_mission, summarize_missions
+
+    dispersions = {name: (low, high) for name, low, high in args.disperse}
+    params = {"tf": args.tf} if args.tf is not None else {}
+    table = run_mission(args.runs, seed=args.seed or 0, dispersions=dispersions, params=params,
+                        config=read_config(args.config or CONFIG_H), chunk_size=args.chunk_size,
+                        workers=args.workers)
+    data = summarize_missions(table)
+    if (args.output or "").endswith(".npz"):
+        data.update({col: table[col].to_numpy() for col in table.columns})
+    if args.plot:
+        import matplotlib.pyplot as plt
+
+        table["gnc_delay"].plot.hist(bins=50)
+        plt.xlabel("GNC activation after the true crossing [s]")
+        plt.show()
+    return data
+
+
+def cmd_latency(args):
+    from .latency import PERIODS, latency_study, loop_rate_curve, measured_periods, required_rate
+
+    jitter = args.jitter
+    if args.jitter_log:
+        jitter = measured_periods(args.jitter_log)
+        if not jitter.size:
+            raise SystemExit(f"No loop periods found in {' '.join(args.jitter_log)}")
+    periods = PERIODS if args.periods is None else np.geomspace(*args.periods[:2], int(args.periods[2]))
+    table = latency_study(laws=args.laws, periods=periods, jitter=jitter, n_runs=args.runs,
+                          seed=args.seed or 0, params=parse_params(args), chunk_size=args.chunk_size,
+                          workers=args.workers)
+    curve = loop_rate_curve(table)
+    data = {"law": curve.index.get_level_values("law").to_numpy(dtype=str),
+            "rate": curve.index.get_level_values("rate").to_numpy()}
+    data.update({col: curve[col].to_numpy() for col in curve.columns})
+    data["required_rate"] = required_rate(curve, args.cost, args.tolerance).to_dict()
+    if (args.output or "").endswith(".npz"):
+        data.pop("required_rate")
+    if args.plot:
+        import matplotlib.pyplot as plt
+
+        for law, group in curve[args.cost].groupby(level="law"):
+            plt.semilogx(group.index.get_level_values("rate"), group.to_numpy(), marker="o", label=law)
+        plt.xlabel("Loop rate [Hz]")
+        plt.ylabel(args.cost)
+        plt.legend()
+        plt.grid(True)
+        plt.show()
+    return data
+
+
+def cmd_cycle(args):
+    from .campaign import NOMINAL
+    from .engine import cylinder_inertia
+    from .limit_cycle import describing_function, law_parameters, limit_cycle
+
+    params = {**NOMINAL, **parse_params(args)}
+    gains = law_parameters(args.law, **parse_gains(args))
+    if args.kp is not None:
+        gains["Kp"] = np.linspace(*args.kp[:2], int(args.kp[2]))[None, :]
+    if args.kd is not None:
+        gains["Kd"] = np.linspace(*args.kd[:2], int(args.kd[2]))[:, None]
+    gains["Kp"], gains["Kd"] = np.broadcast_arrays(gains["Kp"], gains["Kd"])
+    # The valves' mean delay stands for the command to thrust delay
+    plant = {"delay": 0.5 * (params["open_delay"] + params["close_delay"]), "loop_period": args.loop_period,
+             "control_torque": params["control_torque"], "inertia": cylinder_inertia(params["M"], params["R"])}
+    gains["min_pulse"] = np.maximum(gains.get("min_pulse", 0.0), params["min_on"])
+
+    cycle = limit_cycle(**gains, **plant, balance=params["balance"])
+    estimate = describing_function(**{k: v for k, v in gains.items() if k != "min_pulse"}, **plant)
+    data = {"law": args.law, "Kp": gains["Kp"], "Kd": gains["Kd"]}
+    data.update(cycle)
+    data.update({f"df_{name}": value for name, value in estimate.items()})
+    if args.plot and gains["Kp"].ndim == 2:
+        import matplotlib.pyplot as plt
+
+        plt.pcolormesh(gains["Kp"], gains["Kd"], cycle["amplitude"], shading="auto")
+        plt.colorbar(label="Limit cycle amplitude [deg]")
+        plt.xlabel("Kp")
+        plt.ylabel("Kd")
+        plt.show()
+    return data
+
+
+def cmd_catalog(args):
+    from .catalog import COLUMNS, query, scan
+
+    if args.roots:
+        counts = scan(args.roots, args.db, workers=args.workers, chunk_size=args.chunk_size)
+        print(f"catalog: {counts['scanned']} logs scanned, {counts['skipped']} unchanged, "
+              f"{counts['pruned']} pruned", file=sys.stderr)
+    table = query(args.db, where=args.where, order=args.order, limit=args.limit)
+    if args.plot:
+        import matplotlib.pyplot as plt
+
+        for dialect, group in table.groupby("dialect"):
+            plt.scatter(group["loop_rate"], group[args.order or "rms_error"], label=dialect)
+        plt.xlabel("Loop rate [Hz]")
+        plt.ylabel(args.order or "rms_error")
+        plt.legend()
+        plt.grid(True)
+        plt.show()
+    text = ["path", "version"] + [name for name, kind in COLUMNS.items() if kind == "TEXT"]
+    return {name: table[name].fillna("").to_numpy(dtype=str) if name in text else table[name].to_numpy()
+            for name in table.columns}
+
+
+def cmd_analyze(args):
+    from .analysis import analyze
+
+    table = analyze(args.roots, figures=args.figures, workers=args.workers, chunk_size=args.chunk_size,
+                    dpi=args.dpi)
+    if args.output and os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    print(f"analyze: {table['dialect'].notna().sum()} of {len(table)} files analyzed", file=sys.stderr)
+    return {name: table[name].fillna("").to_numpy(dtype=str) if name in ("path", "dialect", "figure")
+            else table[name].to_numpy() for name in table.columns}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m polaris.simulation",
+                                     description="GNC Hapsis rotation simulation")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    # Options every subcommand takes
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("-o", "--output",
+                        help="Write results to a .json, .npz or (catalog, analyze) .csv file (default: JSON on stdout)")
+    output.add_argument("--plot", action="store_true", help="Show matplotlib plots")
+
+    # ... and every subcommand that draws random numbers
+    common = argparse.ArgumentParser(add_help=False, parents=[output])
+    common.add_argument("--seed", type=int, default=None, help="Random seed")
+
+    # The rigid body and its thrusters
+    body = argparse.ArgumentParser(add_help=False)
+    body.add_argument("--M", type=float, help="Cylinder mass (kg)")
+    body.add_argument("--R", type=float, help="Cylinder radius (m)")
+    body.add_argument("--control-torque", dest="control_torque", type=float, help="Thruster torque (N*m)")
+
+    # The vehicle, for the subcommands that fly it
+    vehicle = argparse.ArgumentParser(add_help=False, parents=[body])
+    vehicle.add_argument("--setpoint", type=float, help="Heading setpoint (degrees)")
+    vehicle.add_argument("--turb", dest="disturbance", type=float, help="Disturbance amplitude (N*m)")
+    vehicle.add_argument("--tf", type=float, help="Final time (s)")
+
+    # The valves, as the limit cycle analysis sees them
+    valves = argparse.ArgumentParser(add_help=False)
+    valves.add_argument("--open-delay", dest="open_delay", type=float, help="Valve opening delay (s)")
+    valves.add_argument("--close-delay", dest="close_delay", type=float, help="Valve closing delay (s)")
+    valves.add_argument("--min-on", dest="min_on", type=float, help="Minimum valve open time (s)")
+    valves.add_argument("--balance", type=float, help="Negative valve thrust relative to the positive one")
+
+    # The rest of the campaign.NOMINAL plant, read by parse_params()
+    plant = argparse.ArgumentParser(add_help=False, parents=[vehicle, valves])
+    plant.add_argument("--n-steps", dest="n_steps", type=int, help="Number of time steps")
+    plant.add_argument("--skew", type=float, help="Extra delay of the negative valve (s)")
+    plant.add_argument("--sensor-rate", dest="sensor_rate", type=float, help="Heading sensor output rate (Hz)")
+    plant.add_argument("--sensor-latency", dest="sensor_latency", type=float, help="Heading sensor latency (s)")
+    plant.add_argument("--resolution", type=float, help="Heading quantum (degrees)")
+    plant.add_argument("--gyro-noise", dest="gyro_noise", type=float, help="Gyro noise standard deviation (rad/s)")
+    plant.add_argument("--bno055", action="store_true",
+                       help="Emulate the flight BNO055 (sensor.BNO055); the options above override it")
+
+    law = argparse.ArgumentParser(add_help=False)
+    law.add_argument("--law", default="main", help="Control law, a key of controllers.FLIGHT_LAWS")
+
+    gains = argparse.ArgumentParser(add_help=False)
+    gains.add_argument("--Kp", type=float, help="Override the proportional gain")
+    gains.add_argument("--Kd", type=float, help="Override the derivative gain")
+
+    workers = argparse.ArgumentParser(add_help=False)
+    workers.add_argument("--workers", type=int, default=None, help="Worker processes (1 runs in this process)")
+
+    # Chunked process-pool subcommands; each sets its own default
+    chunks = argparse.ArgumentParser(add_help=False, parents=[workers])
+    chunks.add_argument("--chunk-size", dest="chunk_size", type=int, default=500, help="Runs per worker task")
+
+    cache = argparse.ArgumentParser(add_help=False)
+    cache.add_argument("--cache", nargs="?", const="", default=None, metavar="DIR",
+                       help="Reuse results from an on-disk cache (default dir: $POLARIS_SIM_CACHE "
+                            "or ~/.cache/polaris-sim). run is only cached with --seed.")
+
+    run = sub.add_parser("run", parents=[common, law, gains, plant, cache], help="Simulate a batch of runs")
+    run.add_argument("-n", type=int, default=1, help="Batch size")
+    run.add_argument("--traces", action="store_true", help="Include the time histories in JSON output")
+    run.add_argument("-v", "--verbose", action="store_true", help="Print main.py's debug lines to stderr")
+    run.add_argument("--thrust-table", dest="thrust_table", metavar="NPZ",
+                     help="Scale the control torque by a thrust.ThrustTable (python -m polaris.simulation.thrust)")
+    run.set_defaults(func=cmd_run)
+
+    campaign = sub.add_parser("campaign", parents=[common, law, gains, plant, chunks],
+                              help="Monte Carlo campaign (main law)")
+    campaign.add_argument("-n", "--runs", type=int, default=1000, help="Number of runs")
+    campaign.add_argument("--disperse", nargs=3, action="append", default=[],
+                          metavar=("NAME", "LOW", "HIGH"), help="Uniform dispersion of a parameter")
+    campaign.set_defaults(func=cmd_campaign)
+
+    grid = sub.add_parser("sweep", parents=[common, law, plant, chunks, cache], help="Kp x Kd grid sweep")
+    grid.add_argument("--kp-range", dest="kp", nargs=3, type=float, default=[0.1, 2.0, 20], metavar=("LOW", "HIGH", "N"))
+    grid.add_argument("--kd-range", dest="kd", nargs=3, type=float, default=[0.05, 1.0, 20], metavar=("LOW", "HIGH", "N"))
+    grid.add_argument("--seeds", type=int, default=50, help="Disturbance seeds per grid point")
+    grid.add_argument("--cost", default="rms_error", help="Cost used for best and --plot")
+    grid.set_defaults(func=cmd_sweep, chunk_size=2000)
+
+    tuner = sub.add_parser("tune", parents=[common, law, plant, chunks, cache],
+                           help="Coarse-to-fine gain tuning (-o gains.py/.h writes a flight gains file)")
+    tuner.add_argument("--seeds", type=int, default=64, help="Seeds flown by the finalists")
+    tuner.add_argument("--cost", default="rms_error", help="Cost to minimize")
+    tuner.set_defaults(func=cmd_tune, chunk_size=2000)
+
+    fleet = sub.add_parser("fleet", parents=[common, vehicle, workers],
+                           help="Fly every flight script variant through the SIL harness")
+    fleet.add_argument("scripts", nargs="*", help="Scripts relative to polaris/ (default: all of them)")
+    fleet.add_argument("--seeds", type=int, default=8, help="Flights per script")
+    fleet.set_defaults(func=cmd_fleet)
+
+    hil = sub.add_parser("hil", parents=[common], help="Stream ALT: lines to a STAG board in HIL_MODE")
+    hil.add_argument("--device", help="Serial device of the board (default: simulated board on a PTY)")
+    hil.add_argument("--baud", type=int, default=115200, help="Serial baud rate")
+    hil.add_argument("--duration", type=float, default=20.0, help="Stream length (s)")
+    hil.add_argument("--rate", type=float, default=100.0, help="ALT lines per second")
+    hil.add_argument("--spin", type=float, default=0.0, help="Busy-wait this long (s) before each tick")
+    hil.set_defaults(func=cmd_hil)
+
+    mission = sub.add_parser("mission", parents=[common, chunks], help="STAG mission-state Monte Carlo")
+    mission.add_argument("-n", "--runs", type=int, default=1000, help="Number of missions")
+    mission.add_argument("--tf", type=float, help="Final time (s)")
+    mission.add_argument("--config", help="STAG Config.h to read thresholds from (default: flight_controller_v3)")
+    mission.add_argument("--disperse", nargs=3, action="append", default=[],
+                         metavar=("NAME", "LOW", "HIGH"), help="Uniform dispersion of a mission.NOMINAL parameter")
+    mission.set_defaults(func=cmd_mission, chunk_size=100)
+
+    latency = sub.add_parser("latency", parents=[common, plant, chunks], help="Performance versus flight loop rate")
+    latency.add_argument("--laws", nargs="+", help="Control laws to study (default: all flight laws)")
+    latency.add_argument("--periods", nargs=3, type=float, metavar=("LOW", "HIGH", "N"),
+                         help="Log-spaced loop periods (s) (default: 5 ms to 200 ms)")
+    latency.add_argument("--jitter", type=float, help="Uniform loop period jitter (fraction of the period)")
+    latency.add_argument("--jitter-log", dest="jitter_log", nargs="+", metavar="GLOB",
+                         help="Resample the loop periods measured in these flight logs")
+    latency.add_argument("-n", "--runs", type=int, default=200, help="Runs per law and period")
+    latency.add_argument("--cost", default="settling_time", help="Cost for required_rate and --plot")
+    latency.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative cost increase")
+    latency.set_defaults(func=cmd_latency, chunk_size=50)
+
+    cycle = sub.add_parser("cycle", parents=[output, law, gains, body, valves],
+                           help="Limit cycle of a deadzone law, per point or over a gain grid")
+    cycle.add_argument("--kp-range", dest="kp", nargs=3, type=float, metavar=("LOW", "HIGH", "N"),
+                       help="Kp grid (default: the law's Kp)")
+    cycle.add_argument("--kd-range", dest="kd", nargs=3, type=float, metavar=("LOW", "HIGH", "N"),
+                       help="Kd grid (default: the law's Kd)")
+    cycle.add_argument("--loop-period", dest="loop_period", type=float, default=0.0,
+                       help="Flight loop period (s), modelled as half a period of extra delay")
+    cycle.set_defaults(func=cmd_cycle)
+
+    catalog = sub.add_parser("catalog", parents=[common, chunks],
+                             help="Index flight and bench logs in SQLite and query them")
+    catalog.add_argument("roots", nargs="*", help="Log files, directories or globs to scan first (default: query only)")
+    catalog.add_argument("--db",
+                         help="Catalog database (default: $POLARIS_CATALOG or ~/.cache/polaris-sim/catalog.sqlite)")
+    catalog.add_argument("--where", help="SQL condition, e.g. \"dialect = 'code' AND samples > 500\"")
+    catalog.add_argument("--order", help="SQL ordering, e.g. settling_time")
+    catalog.add_argument("--limit", type=int, help="Maximum number of rows")
+    catalog.set_defaults(func=cmd_catalog, chunk_size=16)
+
+    analysis = sub.add_parser("analyze", parents=[common, chunks],
+                              help="Summarize and plot every log under files, dirs or globs")
+    analysis.add_argument("roots", nargs="+", help="Log files, directories or globs")
+    analysis.add_argument("--figures", metavar="DIR", help="Write one PNG per log here, mirroring the log tree")
+    analysis.add_argument("--dpi", type=int, default=150, help="Figure resolution")
+    analysis.set_defaults(func=cmd_analyze, chunk_size=4)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command in ("campaign", "mission"):
+        args.disperse = [(name, float(low), float(high)) for name, low, high in args.disperse]
+    data = args.func(args)
+    write_output(args.output, data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# ============================================================
+# Solenoid valve model for the GNC Hapsis rotation simulation
+#
+# Sits between the controller and the plant. Each of the two
+# valves follows its command through a delay line (open and close
+# delays may differ), stays open for at least min_on once it has
+# opened (the minimum impulse bit), and the negative valve may be
+# slower or weaker than the positive one. The delay lines are ring
+# buffers of shape (N, 2, L), so one step costs a few array
+# operations for the whole batch.
+#
+# ============================================================
+
+import numpy as np
+
+# Parameters of ValveActuator, also campaign.NOMINAL keys
+ACTUATOR = ("open_delay", "close_delay", "min_on", "skew", "balance")
+
+
+class ValveActuator:
+    """
+    Batched pair of on/off valves: index 0 gives positive torque, index 1
+    negative torque. Delays and min_on are counted in whole simulation
+    steps (rounded), so resolve them with a small enough dt.
+    """
+
+    def __init__(self, open_delay=0.0, close_delay=0.0, min_on=0.0, skew=0.0, balance=1.0):
+        """
+        :param open_delay: Command to valve open (s), scalar or (N,)
+        :param close_delay: Command off to valve closed (s), scalar or (N,)
+        :param min_on: Shortest time a valve stays open once it opens (s),
+            scalar or (N,)
+        :param skew: Extra open and close delay of the negative valve (s),
+            scalar or (N,). Negative values make the positive valve slower.
+        :param balance: Thrust of the negative valve relative to the
+            positive one, scalar or (N,)
+        """
+        self.open_delay = np.asarray(open_delay, dtype=float)
+        self.close_delay = np.asarray(close_delay, dtype=float)
+        self.min_on = np.asarray(min_on, dtype=float)
+        self.skew = np.asarray(skew, dtype=float)
+        self.balance = np.asarray(balance, dtype=float)
+        self.open_lag = None
+        self.close_lag = None
+        self.min_steps = None
+        self.gain = None
+        self.history = None
+        self.open = None
+        self.open_steps = None
+        self.flow = None
+        self.i = 0
+
+    def reset(self, n, dt):
+        """
+        Allocate closed valves and empty delay lines for n members.
+
+        :param dt: Simulation step (s)
+        """
+        def steps(delay):
+            return np.rint(np.clip(delay, 0.0, None) / dt).astype(np.int64)
+
+        skew = np.broadcast_to(self.skew, (n,))
+        lag = np.stack([np.clip(-skew, 0.0, None), np.clip(skew, 0.0, None)], axis=1)
+        self.open_lag = steps(np.broadcast_to(self.open_delay, (n,))[:, None] + lag)
+        self.close_lag = steps(np.broadcast_to(self.close_delay, (n,))[:, None] + lag)
+        self.min_steps = steps(np.broadcast_to(self.min_on, (n,)))[:, None]
+        self.gain = np.stack([np.ones(n), np.broadcast_to(self.balance, (n,))], axis=1)
+
+        length = int(max(self.open_lag.max(), self.close_lag.max())) + 1
+        self.history = np.zeros((n, 2, length), dtype=bool)
+        self.open = np.zeros((n, 2), dtype=bool)
+        self.open_steps = np.zeros((n, 2), dtype=np.int64)
+        self.flow = np.zeros(n)
+        self.i = 0
+
+    def delayed(self, lag):
+        # Command issued lag steps ago; slots not yet written read as closed
+        index = (self.i - lag) % self.history.shape[2]
+        return np.take_along_axis(self.history, index[..., None], axis=2)[..., 0]
+
+    def step(self, command):
+        """
+        Advance the valves by one step.
+
+        :param command: Controller output (-1, 0 or +1), array of shape (N,)
+        :return: Net thrust fraction actually applied, float array of shape (N,)
+        """
+        self.history[:, :, self.i % self.history.shape[2]] = np.stack([command > 0, command < 0], axis=1)
+
+        stay = self.delayed(self.close_lag) | (self.open_steps < self.min_steps)
+        self.open = np.where(self.open, stay, self.delayed(self.open_lag))
+        self.open_steps = np.where(self.open, self.open_steps + 1, 0)
+        self.i += 1
+
+        self.flow = self.open.sum(axis=1)
+        return self.open[:, 0] * self.gain[:, 0] - self.open[:, 1] * self.gain[:, 1]
+
+
+def valve_actuator(params):
+    """
+    ValveActuator from the ACTUATOR entries of a (possibly dispersed)
+    parameter dict, or None when they describe ideal valves.
+    """
+    values = {name: params[name] for name in ACTUATOR if name in params}
+    ideal = all(np.all(np.asarray(values[name]) == 0) for name in ACTUATOR[:4] if name in values)
+    if ideal and np.all(np.asarray(values.get("balance", 1.0)) == 1):
+        return None
+    return ValveActuator(**values)
+
+
+if __name__ == "__main__":
+    from .campaign import NOMINAL
+    from .controllers import flight_law
+    from .engine import BatchSimulator, cylinder_inertia
+
+    # Limit cycle of the STAG law as the valve delay grows (disturbance off)
+    delays = np.linspace(0.0, 0.1, 6)
+    controller = flight_law("stag", NOMINAL["setpoint"])
+    sim = BatchSimulator(cylinder_inertia(NOMINAL["M"], NOMINAL["R"]), controller, n=delays.size,
+                         tf=30.0, n_steps=30000, disturbance=0.0,
+                         actuator=ValveActuator(open_delay=delays, close_delay=delays, min_on=0.02))
+    result = sim.run(theta0=NOMINAL["setpoint"] - 0.5)
+    tail = result.theta[:, result.t > 20.0] - NOMINAL["setpoint"]
+    for delay, amplitude in zip(delays, np.degrees(np.ptp(tail, axis=1) / 2)):
+        print(f"delay {delay * 1000:5.0f} ms: limit cycle +/- {amplitude:.2f} deg")
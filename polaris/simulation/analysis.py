@@ -0,0 +1,193 @@
+# ============================================================
+# Batch analysis of the GNC Hapsis flight and bench logs
+#
+# serial_logger.py analyzes one log at a time, picked with input(),
+# and renders its figures serially. analyze() takes any mix of log
+# files, directories and globs, reads every log with logs.load_log()
+# in a process pool, and returns one summary row per log (the
+# catalog.summarize_log() metrics plus heading and per-valve
+# statistics; the heading's mean and spread are circular, so a log
+# that hovers around north is not averaged to south). Each worker
+# also renders the log's figure to a PNG, mirroring the logs'
+# directory tree under the output directory.
+# Figures are drawn on matplotlib.figure.Figure directly, so the
+# workers never touch a GUI backend.
+#
+# ============================================================
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .catalog import VALVES, find_logs, summarize_log
+from .metrics import BAND
+
+# Default resolution of the per-log figures
+DPI = 150
+
+# Summary columns, in table order
+SUMMARY = ["path", "dialect", "samples", "duration", "loop_rate", "rms_error", "max_error", "settling_time",
+           "duty", "pos_duty", "neg_duty", "valve_duty", "on_time", "pulses", "heading_mean", "heading_std",
+           "figure"]
+
+
+def circular_stats(degrees):
+    """
+    Circular mean (in [0, 360)) and standard deviation, sqrt(-2 ln R), of
+    headings in degrees. The spread grows without bound as the headings
+    cancel out (R -> 0).
+    """
+    angles = np.radians(np.asarray(degrees, dtype=float))
+    s, c = np.mean(np.sin(angles)), np.mean(np.cos(angles))
+    length = min(np.hypot(s, c), 1.0)
+    with np.errstate(divide="ignore"):
+        spread = np.sqrt(-2.0 * np.log(length))
+    return float(np.degrees(np.arctan2(s, c)) % 360.0), float(np.degrees(spread))
+
+
+def summarize_run(frame, band=BAND):
+    """
+    Summary of one log frame: catalog.summarize_log() plus the statistics
+    serial_logger.py prints. pos_duty and neg_duty are the two valves of
+    a dual-valve log, valve_duty the only valve of a nozzle-single one.
+
+    :return: Dict with the SUMMARY keys except path and figure
+    """
+    row = summarize_log(frame, band)
+    del row["start"]
+    row.update(dict.fromkeys(["max_error", "pos_duty", "neg_duty", "valve_duty", "on_time", "heading_mean",
+                              "heading_std"]))
+    if not len(frame):
+        return row
+    if "error" in frame:
+        row["max_error"] = float(frame["error"].abs().max())
+    if "heading" in frame:
+        row["heading_mean"], row["heading_std"] = circular_stats(frame["heading"].to_numpy())
+    for name, key in (("thrust_pos", "pos_duty"), ("thrust_neg", "neg_duty"), ("valve", "valve_duty")):
+        if name in frame:
+            row[key] = float(frame[name].mean())
+    valves = [name for name in VALVES if name in frame]
+    if valves:
+        # Each row's flags hold for the loop period logged with it
+        row["on_time"] = float(frame["dt"].to_numpy() @ frame[valves].to_numpy().any(axis=1))
+    return row
+
+
+def plot_run(frame, path, dpi=DPI, title=None):
+    """
+    Save an overview figure of one log: heading and error, angular rate,
+    and the signed valve command, on a shared time axis. Panels the log
+    has no columns for are left out.
+
+    :param path: PNG file to write
+    """
+    from matplotlib.figure import Figure
+
+    t = frame["t"].to_numpy() - frame["t"].iloc[0]
+    panels = [name for name, columns in (("heading", ("heading", "error")),
+                                          ("rate", ("gyro_x", "gyro_y", "gyro_z")),
+                                          ("valves", tuple(VALVES)))
+              if any(column in frame for column in columns)]
+    fig = Figure(figsize=(12, 2.5 * max(len(panels), 1)))
+    axes = fig.subplots(max(len(panels), 1), 1, sharex=True, squeeze=False)[:, 0]
+    fig.suptitle(title or frame.attrs.get("dialect", ""), fontweight="bold")
+
+    for ax, panel in zip(axes, panels):
+        if panel == "heading":
+            for name, style in (("heading", "b-"), ("error", "r-")):
+                if name in frame:
+                    ax.plot(t, frame[name], style, linewidth=1, label=name.capitalize())
+            ax.axhspan(-np.degrees(BAND), np.degrees(BAND), color="g", alpha=0.15, label="Band")
+            ax.set_ylabel("deg")
+        elif panel == "rate":
+            for name, style in (("gyro_x", "r-"), ("gyro_y", "g-"), ("gyro_z", "b-")):
+                if name in frame:
+                    ax.plot(t, frame[name], style, linewidth=1, alpha=0.7, label=name.replace("_", " ").title())
+            ax.set_ylabel("rad/s")
+        else:
+            u = sum(VALVES[name] * frame[name].to_numpy(dtype=int) for name in VALVES if name in frame)
+            ax.fill_between(t, 0, u, where=u > 0, color="red", alpha=0.6, step="post", label="Left (positive)")
+            ax.fill_between(t, 0, u, where=u < 0, color="gold", alpha=0.6, step="post", label="Right (negative)")
+            ax.set_ylim(-1.5, 1.5)
+            ax.set_yticks([-1, 0, 1])
+            ax.set_ylabel("Valves")
+        ax.legend(loc="upper right")
+        ax.grid(True, alpha=0.3)
+    axes[-1].set_xlabel("Time (s)")
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+
+
+def analyze_file(path, figure=None, dpi=DPI, band=BAND):
+    """
+    Summary row of one log file, and its figure when figure is a path.
+    Unrecognized files get a row with no dialect and no figure.
+    """
+    from .logs import load_log
+
+    row = dict.fromkeys(SUMMARY)
+    row["path"] = path
+    try:
+        frame = load_log(path)
+    except ValueError:
+        return row
+    row.update(summarize_run(frame, band))
+    if figure and len(frame) > 1:
+        os.makedirs(os.path.dirname(figure) or ".", exist_ok=True)
+        plot_run(frame, figure, dpi, title=os.path.basename(path))
+        row["figure"] = figure
+    return row
+
+
+def _analyze_chunk(jobs, dpi, band):
+    return [analyze_file(path, figure, dpi, band) for path, figure in jobs]
+
+
+def analyze(roots, figures=None, workers=None, chunk_size=4, dpi=DPI, band=BAND):
+    """
+    Analyze every log under roots.
+
+    :param roots: Files, directories or glob patterns (see catalog.find_logs())
+    :param figures: Directory for the per-log PNGs, None for no figures.
+        Figure paths mirror the logs' paths below their common directory.
+    :param workers: Process count, defaults to os.cpu_count(). Use 1 to
+        run in this process.
+    :param chunk_size: Logs per worker task
+    :param dpi: Figure resolution
+    :return: pandas DataFrame with one SUMMARY row per log
+    """
+    paths = find_logs(roots)
+    base = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ""
+    jobs = [(path, os.path.join(figures, os.path.splitext(os.path.relpath(path, base))[0] + ".png")
+             if figures else None) for path in paths]
+
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, max(len(chunks), 1))
+    if workers == 1:
+        rows = [row for chunk in chunks for row in _analyze_chunk(chunk, dpi, band)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_analyze_chunk, chunk, dpi, band) for chunk in chunks]
+            rows = [row for f in futures for row in f.result()]
+
+    import pandas as pd
+
+    table = pd.DataFrame(rows, columns=SUMMARY)
+    for name in SUMMARY:
+        if name not in ("path", "dialect", "figure"):
+            table[name] = pd.to_numeric(table[name])
+    return table
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    here = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    out = tempfile.mkdtemp(prefix="polaris-analysis-")
+    start = time.perf_counter()
+    table = analyze([os.path.join(here, "polaris", "tests", "11-12-test", "serial_logs")], figures=out)
+    print(f"{len(table)} logs in {time.perf_counter() - start:.1f} s, figures in {out}")
+    table["path"] = table["path"].map(os.path.basename)
+    print(table.drop(columns="figure").to_string(float_format=lambda x: f"{x:.3f}"))
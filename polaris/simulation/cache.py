@@ -0,0 +1,181 @@
+# ============================================================
+# On-disk results cache for the GNC Hapsis rotation simulation
+#
+# Results are stored as compressed NPZ files named by the SHA-256
+# of the full parameter set plus a hash of the simulation source
+# code, so editing the simulator can never return stale results.
+# Reads refresh a file's mtime and the cache evicts the least
+# recently used files once it grows past its size limit.
+#
+# ============================================================
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+# Default cache location, override with POLARIS_SIM_CACHE
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "polaris-sim")
+
+_code_version = None
+
+
+def code_version():
+    """
+    SHA-256 over the source of every module in this package.
+    """
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(here)):
+            if name.endswith(".py"):
+                digest.update(name.encode())
+                with open(os.path.join(here, name), "rb") as file:
+                    digest.update(file.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def _plain(value):
+    # JSON-safe, canonical form of a parameter value
+    if isinstance(value, np.ndarray):
+        if value.size > 64:
+            return {"sha256": hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest(),
+                    "shape": list(value.shape), "dtype": str(value.dtype)}
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def cache_key(params):
+    """
+    Content hash of a parameter dict and the current code version.
+
+    Large arrays (e.g. disturbance tables) are hashed by their bytes.
+    """
+    text = json.dumps({"params": _plain(params), "code": code_version()}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed NPZ store with LRU size eviction.
+    """
+
+    def __init__(self, directory=None, max_bytes=2 * 1024**3):
+        """
+        :param directory: Cache directory, defaults to $POLARIS_SIM_CACHE or
+            ~/.cache/polaris-sim
+        :param max_bytes: Total size the cache is trimmed back to
+        """
+        self.directory = directory or os.environ.get("POLARIS_SIM_CACHE", DEFAULT_DIR)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".npz")
+
+    def get(self, key):
+        """
+        Load a cached result as a dict of arrays, or None on a miss.
+        """
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                result = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, key, result, evict=True):
+        """
+        Store a dict of arrays. The file is written to a temporary name and
+        renamed, so concurrent workers never see a partial file. The
+        temporary name does not end in .npz, so another worker's entries()
+        and evict() leave it alone.
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".npz.tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as file:
+                np.savez_compressed(file, **result)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        if evict:
+            self.evict()
+
+    def memoize(self, params, compute):
+        """
+        Return the cached result for params, or compute() and store it.
+        """
+        key = cache_key(params)
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def entries(self):
+        """
+        (mtime, size, path) of every cached file.
+        """
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".npz"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    found.append((stat.st_mtime, stat.st_size, entry.path))
+        return found
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Delete least recently used files until the cache fits in max_bytes.
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
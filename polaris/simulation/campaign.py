@@ -0,0 +1,145 @@
+# ============================================================
+# Monte Carlo campaign runner for the GNC Hapsis simulation
+#
+# Splits a campaign into fixed-size chunks, gives every chunk its
+# own generator spawned from one SeedSequence, and fans the chunks
+# out over a process pool. Because the chunking does not depend on
+# the number of workers, the same seed always gives the same table.
+#
+# ============================================================
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .actuator import valve_actuator
+from .controllers import BatchPID
+from .engine import BatchSimulator, cylinder_inertia
+from .metrics import BAND, summarize
+from .sensor import bno055_sensor
+
+# Nominal parameters (same values as main.py)
+NOMINAL = {
+    "M": 10.0,  # (kg) weight of cylinder
+    "R": 0.25,  # (m) radius of the cylinder
+    "Kp": 0.9,
+    "Ki": 0.0,
+    "Kd": 0.45,
+    "setpoint": np.pi,  # (rad)
+    "control_torque": 1.5,  # (N*m)
+    "disturbance": 1.0,  # (N*m) amplitude of the random torque
+    "tf": 20.0,  # (s)
+    "n_steps": 1000,
+    # Valve model (actuator.ValveActuator); these defaults are ideal valves
+    "open_delay": 0.0,  # (s)
+    "close_delay": 0.0,  # (s)
+    "min_on": 0.0,  # (s) minimum impulse bit
+    "skew": 0.0,  # (s) extra delay of the negative valve
+    "balance": 1.0,  # negative valve thrust relative to the positive one
+    # Heading sensor (sensor.BNO055Sensor); these defaults are a perfect sensor
+    "sensor_rate": 0.0,  # (Hz) 0 reads every step
+    "sensor_latency": 0.0,  # (s)
+    "resolution": 0.0,  # (deg)
+    "gyro_noise": 0.0,  # (rad/s)
+}
+
+# Parameters that are shared by the whole batch and cannot be dispersed
+SHARED = ("tf", "n_steps")
+
+
+def draw_parameters(params, dispersions, n, rng):
+    """
+    Draw n parameter sets, one per run.
+
+    :param params: Nominal parameter dict (see NOMINAL)
+    :param dispersions: Dict of name -> (low, high) uniform ranges
+    :param n: Number of runs
+    :param rng: numpy.random.Generator
+    :return: Dict of name -> scalar (shared) or (n,) array (dispersed)
+    """
+    drawn = dict(params)
+    for name, (low, high) in sorted(dispersions.items()):
+        if name in SHARED:
+            raise ValueError(f"'{name}' is shared by the whole batch and cannot be dispersed")
+        if name not in params:
+            raise KeyError(f"Unknown parameter '{name}'")
+        drawn[name] = rng.uniform(low, high, size=n)
+    return drawn
+
+
+def build_simulator(params, n, controller=None):
+    """
+    Build a BatchSimulator from a (possibly dispersed) parameter dict.
+
+    :param controller: Batched controller, defaults to the main.py PID with
+        the Kp, Ki and Kd of params
+    """
+    if controller is None:
+        controller = BatchPID(params["Kp"], params["Ki"], params["Kd"], params["setpoint"])
+    return BatchSimulator(
+        cylinder_inertia(params["M"], params["R"]), controller, n=n,
+        tf=params["tf"], n_steps=params["n_steps"],
+        control_torque=params["control_torque"],
+        disturbance=params["disturbance"],
+        actuator=valve_actuator(params),
+        sensor=bno055_sensor(params),
+    )
+
+
+def run_chunk(params, dispersions, n, seed, band=BAND):
+    """
+    Simulate one chunk of a campaign and return its summary rows.
+
+    :param seed: numpy.random.SeedSequence for this chunk
+    :return: Dict of column name -> (n,) array
+    """
+    rng = np.random.default_rng(seed)
+    drawn = draw_parameters(params, dispersions, n, rng)
+    result = build_simulator(drawn, n).run(rng)
+
+    rows = summarize(result, band)
+    for name in dispersions:
+        rows[name] = drawn[name]
+    return rows
+
+
+def run_campaign(n_runs, seed=0, dispersions=None, params=None,
+                 chunk_size=500, workers=None, band=BAND):
+    """
+    Run a Monte Carlo campaign across all cores.
+
+    :param n_runs: Total number of runs
+    :param seed: Root seed (int or SeedSequence) for the whole campaign
+    :param dispersions: Dict of name -> (low, high) uniform ranges
+    :param params: Overrides for the NOMINAL parameters
+    :param chunk_size: Runs per chunk (one batch per worker task)
+    :param workers: Process count, defaults to os.cpu_count(). Use 1 to
+        run in this process.
+    :param band: Half-width of the heading band (rad)
+    :return: pandas DataFrame with one row per run
+    """
+    params = {**NOMINAL, **(params or {})}
+    dispersions = dispersions or {}
+
+    sizes = [chunk_size] * (n_runs // chunk_size)
+    if n_runs % chunk_size:
+        sizes.append(n_runs % chunk_size)
+
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    seeds = root.spawn(len(sizes))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        chunks = [run_chunk(params, dispersions, n, s, band) for n, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_chunk, params, dispersions, n, s, band)
+                       for n, s in zip(sizes, seeds)]
+            chunks = [f.result() for f in futures]
+
+    import pandas as pd
+
+    table = pd.concat([pd.DataFrame(c) for c in chunks], ignore_index=True)
+    table.index.name = "run"
+    return table
@@ -0,0 +1,286 @@
+# ============================================================
+# SQLite catalog of the GNC Hapsis flight and bench logs
+#
+# scan() walks log directories, reads every log it has not seen
+# (logs.load_log(), over a process pool) and stores one row of
+# metadata and summary metrics per log in a SQLite database:
+# dialect, sample count, duration, achieved loop rate, RMS and
+# settling of the logged heading error, thruster duty and pulse
+# count. Logs whose size and mtime are unchanged are skipped, so
+# a rescan only reads new or edited logs, and questions like "the
+# run where it settled fastest" become one query:
+#
+#   SELECT path, settling_time FROM runs
+#   WHERE settling_time IS NOT NULL ORDER BY settling_time LIMIT 5
+#
+# ============================================================
+
+import glob
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .logs import parser_version
+from .metrics import BAND
+
+# Default database location, override with POLARIS_CATALOG
+DEFAULT_DB = os.path.join(os.path.expanduser("~"), ".cache", "polaris-sim", "catalog.sqlite")
+
+# File suffixes picked up when walking a directory
+LOG_SUFFIXES = (".csv", ".txt")
+
+# Torque sign of each valve flag column
+VALVES = {"thrust_pos": 1, "thrust_neg": -1, "valve": 1}
+
+# Summary columns, in table order
+COLUMNS = {
+    "dialect": "TEXT",
+    "samples": "INTEGER",
+    "duration": "REAL",
+    "loop_rate": "REAL",
+    "rms_error": "REAL",
+    "settling_time": "REAL",
+    "duty": "REAL",
+    "pulses": "INTEGER",
+    "start": "TEXT",
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    version TEXT,
+    scanned REAL,
+    {", ".join(f"{name} {kind}" for name, kind in COLUMNS.items())}
+);
+CREATE INDEX IF NOT EXISTS runs_dialect ON runs (dialect);
+CREATE INDEX IF NOT EXISTS runs_settling_time ON runs (settling_time);
+"""
+
+_version = None
+
+
+def catalog_version():
+    """
+    SHA-256 of the log parser and of this module. Rows written by another
+    version are summarized again.
+    """
+    global _version
+    if _version is None:
+        with open(os.path.abspath(__file__), "rb") as file:
+            _version = hashlib.sha256(parser_version().encode() + file.read()).hexdigest()
+    return _version
+
+
+def connect(db=None):
+    """
+    Open (and create) the catalog database.
+
+    :param db: Database file, defaults to $POLARIS_CATALOG or
+        ~/.cache/polaris-sim/catalog.sqlite
+    """
+    db = db or os.environ.get("POLARIS_CATALOG", DEFAULT_DB)
+    if os.path.dirname(db):
+        os.makedirs(os.path.dirname(db), exist_ok=True)
+    connection = sqlite3.connect(db)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def find_logs(roots):
+    """
+    Log files under the given files, directories and glob patterns.
+    Directories are walked for LOG_SUFFIXES files, skipping hidden ones
+    (e.g. the .polaris-cache sidecars).
+
+    :return: Sorted absolute paths
+    """
+    found = set()
+    for root in [roots] if isinstance(roots, str) else roots:
+        for path in glob.glob(root) or [root]:
+            if os.path.isfile(path):
+                found.add(os.path.abspath(path))
+            for directory, names, files in os.walk(path):
+                names[:] = [name for name in names if not name.startswith(".")]
+                found.update(os.path.abspath(os.path.join(directory, name)) for name in files
+                             if name.endswith(LOG_SUFFIXES) and not name.startswith("."))
+    return sorted(found)
+
+
+def summarize_log(frame, band=BAND):
+    """
+    Summary metrics of one log frame (logs.read_log() columns).
+
+    :param band: Half-width of the heading band (rad) for settling_time
+    :return: Dict with the COLUMNS keys. Metrics the log has no columns for
+        are None.
+    """
+    t = frame["t"].to_numpy()
+    row = dict.fromkeys(COLUMNS)
+    row["dialect"] = frame.attrs["dialect"]
+    row["samples"] = len(frame)
+    if not len(frame):
+        return row
+    row["duration"] = float(t[-1] - t[0])
+    if row["duration"] > 0:
+        row["loop_rate"] = (len(frame) - 1) / row["duration"]
+    if "host_time" in frame:
+        row["start"] = str(frame["host_time"].iloc[0])
+
+    if "error" in frame:
+        error = frame["error"].to_numpy()
+        row["rms_error"] = float(np.sqrt(np.mean(error ** 2)))
+        # Same rule as metrics.settling_time(), on the logged error (deg)
+        outside = np.flatnonzero(np.abs(error) > np.degrees(band))
+        if not outside.size:
+            row["settling_time"] = 0.0
+        elif outside[-1] < len(error) - 1:
+            row["settling_time"] = float(t[outside[-1] + 1] - t[0])
+
+    valves = [name for name in VALVES if name in frame]
+    if valves:
+        # Signed command, counted like metrics.pulse_count()
+        u = sum(VALVES[name] * frame[name].to_numpy(dtype=int) for name in valves)
+        row["duty"] = float(np.mean(frame[valves].to_numpy().any(axis=1)))
+        row["pulses"] = int((u[0] != 0) + np.sum((u[1:] != 0) & (u[1:] != u[:-1])))
+    return row
+
+
+def scan_file(path, band=BAND):
+    """
+    Catalog row of one log file. Unrecognized files get a row with no
+    dialect, so they are not read again until they change.
+    """
+    from .logs import load_log
+
+    stat = os.stat(path)
+    try:
+        row = summarize_log(load_log(path), band)
+    except ValueError:
+        row = dict.fromkeys(COLUMNS)
+    row.update(path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns, version=catalog_version(),
+               scanned=time.time())
+    return row
+
+
+def _scan_chunk(paths, band):
+    return [scan_file(path, band) for path in paths]
+
+
+def scan(roots, db=None, workers=None, chunk_size=16, band=BAND, prune=True):
+    """
+    Bring the catalog up to date with the logs under roots.
+
+    :param roots: Files, directories or glob patterns (see find_logs())
+    :param db: Database file, see connect()
+    :param workers: Process count, defaults to os.cpu_count(). Use 1 to
+        run in this process.
+    :param chunk_size: Logs per worker task
+    :param prune: Delete rows of logs under roots that no longer exist
+    :return: Dict with the number of logs scanned, skipped and pruned
+    """
+    paths = find_logs(roots)
+    connection = connect(db)
+    try:
+        known = {path: (size, mtime_ns, version) for path, size, mtime_ns, version in
+                 connection.execute("SELECT path, size, mtime_ns, version FROM runs")}
+        todo = []
+        for path in paths:
+            stat = os.stat(path)
+            if known.get(path) != (stat.st_size, stat.st_mtime_ns, catalog_version()):
+                todo.append(path)
+
+        chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+        workers = min(workers or os.cpu_count() or 1, max(len(chunks), 1))
+        if workers == 1:
+            rows = [row for chunk in chunks for row in _scan_chunk(chunk, band)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_scan_chunk, chunk, band) for chunk in chunks]
+                rows = [row for f in futures for row in f.result()]
+
+        names = ["path", "size", "mtime_ns", "version", "scanned"] + list(COLUMNS)
+        connection.executemany(
+            f"INSERT OR REPLACE INTO runs ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+            [[row[name] for name in names] for row in rows])
+
+        gone = []
+        if prune:
+            prefixes = tuple(os.path.join(os.path.abspath(root), "") for root in
+                             ([roots] if isinstance(roots, str) else roots) if os.path.isdir(root))
+            gone = [(path,) for path in known if path.startswith(prefixes) and not os.path.exists(path)]
+            connection.executemany("DELETE FROM runs WHERE path = ?", gone)
+        connection.commit()
+    finally:
+        connection.close()
+    return {"scanned": len(todo), "skipped": len(paths) - len(todo), "pruned": len(gone)}
+
+
+def _nulls_last(order):
+    """
+    Add NULLS LAST to every term of an ORDER BY clause that does not say
+    where its NULLs go. SQLite puts them first in ascending order, which
+    would rank the logs that never settled ahead of the ones that did.
+    """
+    terms, depth, start = [], 0, 0
+    for i, char in enumerate(order + ","):
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if char == "," and depth == 0:
+            terms.append(order[start:i].strip())
+            start = i + 1
+    return ", ".join(term if "nulls" in term.lower() else f"{term} NULLS LAST" for term in terms if term)
+
+
+def query(db=None, where=None, order=None, limit=None, params=()):
+    """
+    Catalog rows as a pandas DataFrame, without touching the logs.
+
+    :param where: SQL condition, e.g. "dialect = 'code' AND samples > 500"
+    :param order: SQL ordering, e.g. "settling_time". Missing values sort
+        last unless a term says NULLS FIRST.
+    :param limit: Maximum number of rows
+    :param params: Values for ? placeholders in where
+    """
+    import pandas as pd
+
+    sql = "SELECT * FROM runs"
+    if where:
+        sql += f" WHERE {where}"
+    if order:
+        sql += f" ORDER BY {_nulls_last(order)}"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    connection = connect(db)
+    try:
+        table = pd.read_sql_query(sql, connection, params=params)
+    finally:
+        connection.close()
+    # Columns that came back all NULL are object, missing metrics are NaN
+    for name, kind in COLUMNS.items():
+        if kind != "TEXT":
+            table[name] = pd.to_numeric(table[name])
+    return table
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    db = os.environ.get("POLARIS_CATALOG", DEFAULT_DB)
+    roots = [os.path.join(here, "10_30_2025_test"), os.path.join(here, "polaris", "tests")]
+    for attempt in ("first", "again"):
+        start = time.perf_counter()
+        counts = scan(roots, db)
+        print(f"{attempt} scan: {counts} in {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    fastest = query(db, where="settling_time IS NOT NULL", order="settling_time", limit=5)
+    print(f"query in {(time.perf_counter() - start) * 1000:.1f} ms")
+    fastest["path"] = fastest["path"].map(lambda path: os.path.relpath(path, here))
+    print(fastest[["path", "dialect", "samples", "duration", "loop_rate", "rms_error", "settling_time",
+                   "duty", "pulses"]].to_string(float_format=lambda x: f"{x:.3f}"))
+    runs = query(db).fillna({"dialect": "unrecognized"})
+    print(runs.groupby("dialect").agg(runs=("path", "size"), samples=("samples", "sum")).to_string())
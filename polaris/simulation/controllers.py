@@ -0,0 +1,443 @@
+# ============================================================
+# Batched controller models for the GNC Hapsis rotation sim
+#
+# Every controller here holds its state as NumPy arrays with one
+# entry per batch member, so a single call advances N independent
+# simulations at once.
+#
+# All of them share one interface: reset(n) allocates the state and
+# step(theta, dt) returns the thruster command (-1, 0 or +1) for
+# every member. The simulator measures heading and torque in the
+# same frame, so a positive command is always a positive torque.
+# (On the flight hardware a positive output fires the thruster that
+# code.py labels "IMPART NEGATIVE", because the BNO055 heading runs
+# clockwise.)
+#
+# ============================================================
+
+import numpy as np
+
+
+class BatchPID:
+    """
+    Vectorized port of the PID class in misc_scripts/PID.py.
+
+    Gains and setpoint may be scalars or arrays of shape (N,). The math is
+    identical to PID.compute(): no angle wraparound, no derivative filter.
+    """
+
+    def __init__(self, Kp, Ki, Kd, setpoint):
+        """
+        Initialize the batched PID controller.
+
+        :param Kp: Proportional constant, scalar or (N,)
+        :param Ki: Integral constant, scalar or (N,)
+        :param Kd: Derivative constant, scalar or (N,)
+        :param setpoint: Desired heading (radians), scalar or (N,)
+        """
+        self.Kp = np.asarray(Kp, dtype=float)
+        self.Ki = np.asarray(Ki, dtype=float)
+        self.Kd = np.asarray(Kd, dtype=float)
+        self.setpoint = np.asarray(setpoint, dtype=float)
+        self.previous_error = None
+        self.integral = None
+        self.command = None
+
+    def reset(self, n):
+        """
+        Allocate zeroed controller state for a batch of n members.
+        """
+        self.previous_error = np.zeros(n)
+        self.integral = np.zeros(n)
+        self.command = np.zeros(n, dtype=np.int8)
+
+    def compute(self, current_heading, dt):
+        """
+        Compute the PID output for every batch member.
+
+        :param current_heading: Measured heading, array of shape (N,)
+        :param dt: Time interval between measurements (in seconds)
+        :return: Control output, array of shape (N,)
+        """
+        error = self.setpoint - current_heading
+
+        self.integral += error * dt
+
+        if dt > 0:
+            derivative = (error - self.previous_error) / dt
+        else:
+            derivative = np.zeros_like(error)
+
+        self.previous_error = error
+
+        return self.Kp * error + self.Ki * self.integral + self.Kd * derivative
+
+    def step(self, theta, dt):
+        """
+        Bang-bang law of main.py: the sign of the PID output picks the
+        thruster, and a zero output leaves the last command in place.
+
+        :param theta: Heading (rad), array of shape (N,)
+        :param dt: Time interval between measurements (in seconds)
+        :return: Thruster command, int8 array of shape (N,)
+        """
+        output = self.compute(theta, dt)
+        self.command = np.where(output > 0, 1, np.where(output < 0, -1, self.command)).astype(np.int8)
+        return self.command
+
+
+def wrap_error(error):
+    """
+    Wraparound of polaris/code.py: (error + 180) % 360 - 180, in [-180, 180).
+    """
+    return (error + 180) % 360 - 180
+
+
+def wrap_angle(angle):
+    """
+    PIDController::wrapAngle() of the STAG flight controller, in [-180, 180].
+
+    Unlike wrap_error, +180 is left as +180.
+    """
+    angle = np.where(angle > 180.0, angle - 360.0 * np.ceil((angle - 180.0) / 360.0), angle)
+    return np.where(angle < -180.0, angle + 360.0 * np.ceil((-180.0 - angle) / 360.0), angle)
+
+
+class DeadzonePD:
+    """
+    The CircuitPython PD loop flown by polaris/code.py and the tests/ variants.
+
+    Works in degrees like the flight code: the heading is read as the BNO055
+    would report it (0 to 360), the error is wrapped with wrap_error, the
+    derivative can go through the alpha low-pass filter of PID-filter.py and
+    the output has a deadzone. Inside the deadzone the thrusters turn off,
+    or with latch=True keep their last state (the variants without an else
+    branch). martian-filter.py never stores previous_error, so with
+    hold_error=True the derivative is taken against 0, i.e. error / dt.
+    """
+
+    def __init__(self, Kp, Kd, setpoint, threshold=5.0, alpha=1.0, latch=False, hold_error=False):
+        """
+        Initialize the batched flight PD controller.
+
+        :param Kp: Proportional constant (per degree), scalar or (N,)
+        :param Kd: Derivative constant (per degree/s), scalar or (N,)
+        :param setpoint: Desired heading (radians), scalar or (N,)
+        :param threshold: Deadzone on the output, scalar or (N,)
+        :param alpha: Derivative low-pass weight, 1 for no filter
+        :param latch: Keep the thrusters in their last state inside the deadzone
+        :param hold_error: Never update previous_error (martian-filter.py)
+        """
+        self.Kp = np.asarray(Kp, dtype=float)
+        self.Kd = np.asarray(Kd, dtype=float)
+        self.setpoint = np.asarray(setpoint, dtype=float)
+        self.threshold = np.asarray(threshold, dtype=float)
+        self.alpha = np.asarray(alpha, dtype=float)
+        self.latch = bool(latch)
+        self.hold_error = bool(hold_error)
+        self.previous_error = None
+        self.filtered_derivative = None
+        self.command = None
+        self.output = None
+
+    def reset(self, n):
+        """
+        Allocate zeroed controller state for a batch of n members.
+        """
+        self.previous_error = np.zeros(n)
+        self.filtered_derivative = np.zeros(n)
+        self.command = np.zeros(n, dtype=np.int8)
+        self.output = np.zeros(n)
+
+    def step(self, theta, dt):
+        """
+        Run one pass of the flight loop for every batch member.
+
+        :param theta: Heading (rad), array of shape (N,)
+        :param dt: Time interval between measurements (in seconds)
+        :return: Thruster command, int8 array of shape (N,)
+        """
+        heading = np.degrees(theta) % 360.0
+        error = wrap_error(np.degrees(self.setpoint) - heading)
+
+        if dt > 0:
+            raw_derivative = (error - self.previous_error) / dt
+        else:
+            raw_derivative = np.zeros_like(error)
+        self.filtered_derivative = self.alpha * raw_derivative + (1 - self.alpha) * self.filtered_derivative
+        if not self.hold_error:
+            self.previous_error = error
+
+        self.output = self.Kp * error + self.Kd * self.filtered_derivative
+
+        fire = np.abs(self.output) > self.threshold
+        idle = self.command if self.latch else 0
+        self.command = np.where(fire, np.sign(self.output), idle).astype(np.int8)
+        return self.command
+
+
+class HysteresisPD:
+    """
+    The STAG flight controller: PIDController::compute() followed by
+    controlThrusters() (flight_controller_v3, src/PID.cpp and Actuators.cpp).
+
+    PD in degrees with wrap_angle, then a thruster fires when the effort
+    passes threshold_on and turns off only when it drops below
+    threshold_off. Once on, a thruster cannot change for min_pulse ms.
+    Time is counted in whole milliseconds, like millis().
+    """
+
+    def __init__(self, Kp, Kd, setpoint, threshold_on=5.0, threshold_off=2.0, min_pulse=50):
+        """
+        Initialize the batched STAG controller.
+
+        :param Kp: Proportional constant (per degree), scalar or (N,)
+        :param Kd: Derivative constant (per degree/s), scalar or (N,)
+        :param setpoint: Desired heading (radians), scalar or (N,)
+        :param threshold_on: Effort needed to turn a thruster on (THRESHOLD_ON)
+        :param threshold_off: Effort below which thrusters turn off (THRESHOLD_OFF)
+        :param min_pulse: Minimum thruster pulse in ms (MIN_THRUSTER_PULSE)
+        """
+        self.Kp = np.asarray(Kp, dtype=float)
+        self.Kd = np.asarray(Kd, dtype=float)
+        self.setpoint = np.asarray(setpoint, dtype=float)
+        self.threshold_on = np.asarray(threshold_on, dtype=float)
+        self.threshold_off = np.asarray(threshold_off, dtype=float)
+        self.min_pulse = np.asarray(min_pulse, dtype=np.int64)
+        self.last_error = None
+        self.command = None
+        self.on_time = None
+        self.millis = 0
+        self.output = None
+
+    def reset(self, n):
+        """
+        Allocate zeroed controller state for a batch of n members.
+        """
+        self.last_error = np.zeros(n)
+        self.command = np.zeros(n, dtype=np.int8)
+        self.on_time = np.zeros(n, dtype=np.int64)
+        self.millis = 0
+        self.output = np.zeros(n)
+
+    def step(self, theta, dt):
+        """
+        Run one 100 Hz loop iteration for every batch member.
+
+        :param theta: Heading (rad), array of shape (N,)
+        :param dt: Time interval between measurements (in seconds)
+        :return: Thruster command, int8 array of shape (N,)
+        """
+        self.millis += int(round(dt * 1000))
+
+        heading = np.degrees(theta) % 360.0
+        error = wrap_angle(np.degrees(self.setpoint) - heading)
+        if dt > 0:
+            derivative = (error - self.last_error) / dt
+        else:
+            derivative = np.zeros_like(error)
+        self.last_error = error
+        self.output = self.Kp * error + self.Kd * derivative
+
+        effort = self.output
+        command = np.where(effort > self.threshold_on, 1,
+                  np.where(effort < -self.threshold_on, -1,
+                  np.where(np.abs(effort) < self.threshold_off, 0, self.command)))
+
+        # A thruster that is on holds for at least min_pulse
+        held = (self.command != 0) & (self.millis - self.on_time < self.min_pulse)
+        command = np.where(held, self.command, command).astype(np.int8)
+
+        started = (command != 0) & (command != self.command)
+        self.on_time = np.where(started, self.millis, self.on_time)
+        self.command = command
+        return self.command
+
+
+class PulsePID:
+    """
+    The PID loops of RP2040_files/integrationTest.py, pidPico.py and
+    codeReview.py.
+
+    Unlike DeadzonePD the deadzone is on the heading error, not the output:
+    outside it the sign of the PID output picks a thruster, which then
+    fires for a fixed pulse (or one scaled by the output, pidPico.py) and
+    is not fired again while it is on. The integral only accumulates while
+    |error| > windup. pidPico.py does not turn the other thruster off when
+    one fires, so both can be open at once; the command is then 0.
+    """
+
+    def __init__(self, Kp, Ki, Kd, setpoint, threshold=5.0, windup=1.0, pulse=0.5, pulse_gain=0.0,
+                 exclusive=True, from_heading=False):
+        """
+        Initialize the batched RP2040 PID controller.
+
+        :param Kp: Proportional constant (per degree), scalar or (N,)
+        :param Ki: Integral constant (per degree*s), scalar or (N,)
+        :param Kd: Derivative constant (per degree/s), scalar or (N,)
+        :param setpoint: Desired heading (radians), scalar or (N,)
+        :param threshold: Deadzone on |error| (deg), scalar or (N,)
+        :param windup: Integrate only while |error| exceeds this (deg)
+        :param pulse: Thruster on-time (s); inf keeps a thruster on until
+            the other one fires (codeReview.py)
+        :param pulse_gain: When > 0 the on-time is min(|output| * pulse_gain,
+            pulse) (pidPico.py)
+        :param exclusive: Firing one thruster turns the other off
+        :param from_heading: Use codeReview.py's error, the heading itself
+            wrapped to (-180, 180], which ignores the setpoint
+        """
+        self.Kp = np.asarray(Kp, dtype=float)
+        self.Ki = np.asarray(Ki, dtype=float)
+        self.Kd = np.asarray(Kd, dtype=float)
+        self.setpoint = np.asarray(setpoint, dtype=float)
+        self.threshold = np.asarray(threshold, dtype=float)
+        self.windup = np.asarray(windup, dtype=float)
+        self.pulse = np.asarray(pulse, dtype=float)
+        self.pulse_gain = np.asarray(pulse_gain, dtype=float)
+        self.exclusive = bool(exclusive)
+        self.from_heading = bool(from_heading)
+        self.previous_error = None
+        self.integral = None
+        self.right = None
+        self.left = None
+        self.off_time = None
+        self.clock = 0.0
+        self.command = None
+        self.output = None
+
+    def reset(self, n):
+        """
+        Allocate zeroed controller state for a batch of n members.
+        """
+        self.previous_error = np.zeros(n)
+        self.integral = np.zeros(n)
+        self.right = np.zeros(n, dtype=bool)
+        self.left = np.zeros(n, dtype=bool)
+        self.off_time = np.zeros(n)
+        self.clock = 0.0
+        self.command = np.zeros(n, dtype=np.int8)
+        self.output = np.zeros(n)
+
+    def step(self, theta, dt):
+        """
+        Run one pass of the flight loop for every batch member.
+
+        :param theta: Heading (rad), array of shape (N,)
+        :param dt: Time interval between measurements (in seconds)
+        :return: Thruster command, int8 array of shape (N,)
+        """
+        self.clock += dt
+
+        heading = np.degrees(theta) % 360.0
+        if self.from_heading:
+            error = np.where(heading > 180, heading - 360, heading)
+        else:
+            error = wrap_error(np.degrees(self.setpoint) - heading)
+
+        self.integral = np.where(np.abs(error) > self.windup, self.integral + error * dt, self.integral)
+        if dt > 0:
+            derivative = (error - self.previous_error) / dt
+        else:
+            derivative = np.zeros_like(error)
+        self.previous_error = error
+        self.output = self.Kp * error + self.Ki * self.integral + self.Kd * derivative
+
+        pulse = np.where(self.pulse_gain > 0, np.minimum(np.abs(self.output) * self.pulse_gain, self.pulse),
+                         self.pulse)
+        outside = np.abs(error) > self.threshold
+        fire_right = outside & (self.output > 0) & ~self.right
+        fire_left = outside & (self.output < 0) & ~self.left
+        if self.exclusive:
+            self.left &= ~fire_right
+            self.right &= ~fire_left
+        self.right |= fire_right
+        self.left |= fire_left
+        self.off_time = np.where(fire_right | fire_left, self.clock + pulse, self.off_time)
+
+        expired = self.clock >= self.off_time
+        self.right &= ~expired
+        self.left &= ~expired
+
+        # A positive output fires the right thruster, like code.py's
+        self.command = (self.right.astype(np.int8) - self.left.astype(np.int8))
+        return self.command
+
+
+class ControllerGroup:
+    """
+    Run different controllers side by side in one batch.
+
+    The batch is split into consecutive blocks, one per controller, so a
+    single simulation can compare several flight laws on the same draws.
+    """
+
+    def __init__(self, controllers, counts):
+        """
+        :param controllers: List of batched controllers
+        :param counts: Number of members given to each controller
+        """
+        if len(controllers) != len(counts):
+            raise ValueError("Need one count per controller")
+        self.controllers = list(controllers)
+        self.counts = [int(c) for c in counts]
+        self.bounds = np.cumsum([0] + self.counts)
+
+    @property
+    def setpoint(self):
+        return np.concatenate([np.broadcast_to(c.setpoint, (k,))
+                               for c, k in zip(self.controllers, self.counts)])
+
+    def reset(self, n):
+        """
+        Reset every controller for its block of the batch.
+        """
+        if n != self.bounds[-1]:
+            raise ValueError(f"ControllerGroup covers {self.bounds[-1]} members, not {n}")
+        for c, k in zip(self.controllers, self.counts):
+            c.reset(k)
+
+    def step(self, theta, dt):
+        """
+        Step every controller on its own block of theta.
+        """
+        return np.concatenate([c.step(theta[a:b], dt) for c, a, b
+                               in zip(self.controllers, self.bounds[:-1], self.bounds[1:])])
+
+
+# Deployed control laws with their flight gains
+FLIGHT_LAWS = {
+    "main": (BatchPID, {"Kp": 0.9, "Ki": 0.0, "Kd": 0.45}),  # simulation/main.py
+    "code": (DeadzonePD, {"Kp": 0.56, "Kd": 0.50, "threshold": 5.0}),  # polaris/code.py
+    "martian": (DeadzonePD, {"Kp": 0.56, "Kd": 0.45, "threshold": 5.0}),  # tests/*/martian.py
+    "pid-filter": (DeadzonePD, {"Kp": 0.56, "Kd": 0.45, "threshold": 5.0,
+                                "alpha": 0.2, "latch": True}),  # tests/*/PID-filter.py
+    "martian-filter": (DeadzonePD, {"Kp": 0.56, "Kd": 0.45, "threshold": 5.0, "alpha": 0.2,
+                                    "latch": True, "hold_error": True}),  # tests/*/martian-filter.py
+    "old-code": (DeadzonePD, {"Kp": 0.56, "Kd": 0.45, "threshold": 1.0,
+                              "latch": True}),  # tests/*/old-code.py, RP2040_files/code.py
+    "stag": (HysteresisPD, {"Kp": 1.0, "Kd": 0.6, "threshold_on": 5.0,
+                            "threshold_off": 2.0, "min_pulse": 50}),  # STAG flight_controller_v3
+    "integration": (PulsePID, {"Kp": 0.9, "Ki": 0.0, "Kd": 0.45, "threshold": 5.0,
+                               "pulse": 0.5}),  # RP2040_files/integrationTest.py
+    "pico": (PulsePID, {"Kp": 1.5, "Ki": 0.01, "Kd": 0.5, "threshold": 1.0, "pulse": 1.0,
+                        "pulse_gain": 0.1, "exclusive": False}),  # RP2040_files/pidPico.py
+    "code-review": (PulsePID, {"Kp": 0.9, "Ki": 0.0, "Kd": 0.45, "threshold": 0.0, "pulse": np.inf,
+                               "from_heading": True}),  # RP2040_files/codeReview.py
+}
+# tests/11-12-test/martian_square_wave*.py have no law to model: their
+# square wave evaluates to -1 on every pass (2 * k % 2 is always 0), which
+# never leaves the 5 degree deadzone, so they never fire.
+
+
+def flight_law(name, setpoint, **overrides):
+    """
+    Build one of the deployed control laws in FLIGHT_LAWS.
+
+    :param name: Key of FLIGHT_LAWS
+    :param setpoint: Desired heading (radians), scalar or (N,)
+    :param overrides: Replace any of the flight gains
+    """
+    if name not in FLIGHT_LAWS:
+        raise KeyError(f"Unknown flight law '{name}', expected one of {sorted(FLIGHT_LAWS)}")
+    cls, gains = FLIGHT_LAWS[name]
+    return cls(setpoint=setpoint, **{**gains, **overrides})
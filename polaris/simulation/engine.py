@@ -0,0 +1,210 @@
+# ============================================================
+# Batch rotation engine for the GNC Hapsis simulation
+#
+# Steps N independent cylinders at once. All state lives in
+# preallocated (N, n_steps) NumPy arrays, so the only Python loop
+# left is the one over time.
+#
+# ============================================================
+
+import numpy as np
+
+
+def cylinder_inertia(M, R):
+    """
+    Moment of inertia for a solid cylinder (I = 1/2 * M * R^2).
+
+    :param M: Mass (kg), scalar or array
+    :param R: Radius (m), scalar or array
+    :return: Moment of inertia (kg*m^2)
+    """
+    return 0.5 * np.asarray(M, dtype=float) * np.asarray(R, dtype=float) ** 2
+
+
+class BatchResult:
+    """
+    Trajectories produced by BatchSimulator.run().
+
+    theta, omega, alpha and tau have shape (N, n_steps); u holds the
+    thruster command (-1, 0 or +1) issued on each step and applied the net
+    thrust fraction the valves delivered (equal to u without an actuator).
+    measured and gyro are the sensor readings the controller saw (theta and
+    omega without a sensor).
+    """
+
+    def __init__(self, t, theta, omega, alpha, tau, u, setpoint, dt, applied=None,
+                 measured=None, gyro=None):
+        self.t = t
+        self.theta = theta
+        self.omega = omega
+        self.alpha = alpha
+        self.tau = tau
+        self.u = u
+        self.setpoint = setpoint
+        self.dt = dt
+        self.applied = u if applied is None else applied
+        self.measured = theta if measured is None else measured
+        self.gyro = omega if gyro is None else gyro
+
+    def __len__(self):
+        return self.theta.shape[0]
+
+    def member(self, k):
+        """
+        Return a single batch member as a dict of 1-D arrays.
+        """
+        return {
+            "t": self.t,
+            "theta": self.theta[k],
+            "omega": self.omega[k],
+            "alpha": self.alpha[k],
+            "tau": self.tau[k],
+            "u": self.u[k],
+            "applied": self.applied[k],
+            "measured": self.measured[k],
+            "gyro": self.gyro[k],
+        }
+
+
+class BatchSimulator:
+    """
+    Vectorized version of the simulation loop in main.py.
+
+    Every physical parameter may be given per member as an array of
+    shape (N,), or as a scalar shared by the whole batch.
+    """
+
+    def __init__(self, inertia, controller, n=None, tf=20.0, n_steps=1000,
+                 control_torque=1.5, disturbance=1.0, thrust_table=None,
+                 actuator=None, sensor=None):
+        """
+        :param inertia: Moment of inertia (kg*m^2), scalar or (N,)
+        :param controller: Batched controller, e.g. controllers.BatchPID
+        :param n: Batch size. Inferred from the array arguments if omitted.
+        :param tf: Final time for the simulation (s)
+        :param n_steps: Number of time samples
+        :param control_torque: Thruster torque magnitude (N*m), scalar or (N,)
+        :param disturbance: Amplitude of the uniform random disturbance
+            torque (N*m), scalar or (N,)
+        :param thrust_table: Optional thrust.ThrustTable. control_torque is
+            then the full-tank torque, scaled each step by the table at the
+            member's cumulative valve on-time (both valves share one tank).
+        :param actuator: Optional actuator.ValveActuator between the
+            controller and the plant. Without one, commands act on the
+            same step with the full torque.
+        :param sensor: Optional sensor.BNO055Sensor between the plant and
+            the controller. Without one, the controller sees the true theta.
+        """
+        self.inertia = np.asarray(inertia, dtype=float)
+        self.controller = controller
+        self.control_torque = np.asarray(control_torque, dtype=float)
+        self.disturbance = np.asarray(disturbance, dtype=float)
+        self.thrust_table = thrust_table
+        self.actuator = actuator
+        self.sensor = sensor
+        self.tf = float(tf)
+        self.n_steps = int(n_steps)
+        self.dt = self.tf / self.n_steps
+
+        if n is None:
+            sizes = [np.size(a) for a in (self.inertia, self.control_torque,
+                                          self.disturbance,
+                                          getattr(controller, "setpoint", 0.0))]
+            n = max(sizes)
+        self.n = int(n)
+
+    def disturbance_torque(self, rng):
+        """
+        Draw the (N, n_steps) disturbance torque tensor for one run.
+
+        :param rng: numpy.random.Generator
+        """
+        noise = rng.uniform(-1.0, 1.0, size=(self.n, self.n_steps))
+        return noise * np.broadcast_to(self.disturbance, (self.n,))[:, None]
+
+    def run(self, rng=None, disturbance_torque=None, theta0=0.0, omega0=0.0, ticks=None, sensor_noise=None):
+        """
+        Integrate every batch member from t = 0 to tf.
+
+        :param rng: numpy.random.Generator used for the disturbance draw and
+            the sensor noise
+        :param disturbance_torque: Optional precomputed (N, n_steps) torque
+            tensor. Overrides rng for the disturbance when given.
+        :param theta0: Initial angle (rad), scalar or (N,)
+        :param omega0: Initial angular velocity (rad/s), scalar or (N,)
+        :param ticks: Optional (n_steps,) bool array of the steps on which
+            the flight loop runs, shared by the batch. The controller is
+            only stepped there, with the time since its previous tick as dt,
+            and its command is held in between.
+        :param sensor_noise: Optional precomputed (N, n_steps) standard
+            normal gyro noise draws. Overrides rng for the sensor noise, so
+            callers that share disturbance draws between members can share
+            the noise too.
+        :return: BatchResult
+        """
+        n, steps, dt = self.n, self.n_steps, self.dt
+
+        if disturbance_torque is None:
+            if rng is None:
+                rng = np.random.default_rng()
+            disturbance_torque = self.disturbance_torque(rng)
+        elif rng is None:
+            # A precomputed torque means a reproducible run; keep the
+            # sensor noise reproducible too
+            rng = np.random.default_rng(0)
+
+        t = np.arange(steps) * dt
+        theta = np.empty((n, steps))
+        omega = np.empty((n, steps))
+        alpha = np.empty((n, steps))
+        tau = np.empty((n, steps))
+        u = np.zeros((n, steps), dtype=np.int8)
+        applied = None if self.actuator is None else np.zeros((n, steps))
+        measured = None if self.sensor is None else np.zeros((n, steps))
+        gyro = None if self.sensor is None else np.zeros((n, steps))
+
+        theta[:, 0] = theta0
+        omega[:, 0] = omega0
+        inertia = np.broadcast_to(self.inertia, (n,))
+        torque = np.broadcast_to(self.control_torque, (n,))
+        on_time = np.zeros(n)
+
+        self.controller.reset(n)
+        if self.actuator is not None:
+            self.actuator.reset(n, dt)
+        if self.sensor is not None:
+            self.sensor.reset(n, dt, rng, sensor_noise)
+
+        output = np.zeros(n, dtype=np.int8)
+        last_tick = -1
+
+        for i in range(steps):
+            reading = theta[:, i]
+            if self.sensor is not None:
+                reading = measured[:, i] = self.sensor.step(theta[:, i], omega[:, i])
+                gyro[:, i] = self.sensor.gyro
+            if ticks is None:
+                output = self.controller.step(reading, dt)
+            elif ticks[i]:
+                output = self.controller.step(reading, (i - last_tick) * dt)
+                last_tick = i
+            u[:, i] = output
+
+            command = output
+            if self.actuator is not None:
+                command = applied[:, i] = self.actuator.step(output)
+
+            if self.thrust_table is None:
+                tau[:, i] = command * torque + disturbance_torque[:, i]
+            else:
+                tau[:, i] = command * torque * self.thrust_table.lookup(on_time) + disturbance_torque[:, i]
+                flow = np.abs(command) if self.actuator is None else self.actuator.flow
+                on_time += flow * dt
+            alpha[:, i] = tau[:, i] / inertia
+
+            if i + 1 < steps:
+                omega[:, i + 1] = omega[:, i] + alpha[:, i] * dt
+                theta[:, i + 1] = theta[:, i] + omega[:, i] * dt + 0.5 * alpha[:, i] * dt**2
+
+        setpoint = np.broadcast_to(getattr(self.controller, "setpoint", 0.0), (n,))
+        return BatchResult(t, theta, omega, alpha, tau, u, setpoint, dt, applied, measured, gyro)
@@ -0,0 +1,362 @@
+# ============================================================
+# Event-driven analytic simulation of bang-bang PD control
+#
+# Between thruster switches the torque is piecewise constant
+# (+/- control torque, or zero in the deadzone, plus a held
+# disturbance), so theta is a quadratic in time and the PD
+# switching function
+#
+#     s = Kp * (setpoint - theta) - Kd * omega
+#
+# is a quadratic too. Each switch is found by solving s = level in
+# closed form, and the state jumps straight from one event to the
+# next. When a switch would immediately switch back (the deadzone
+# edge for code.py, or zero for the sign-only law in main.py) the
+# motion slides along the surface s = level with
+#
+#     omega(tau) = omega0 * exp(-(Kp / Kd) * tau)
+#
+# which is the continuous-time limit of the chattering the fixed
+# step loop produces. All N members advance together; the loop
+# runs once per event, not once per time step.
+#
+# ============================================================
+
+import numpy as np
+
+from .engine import BatchResult
+
+# Roots closer than this to the current time are the event just handled
+_EPS = 1e-12
+
+
+def _crossing(c2, c1, c0, rising):
+    """
+    First time tau > 0 where c2*tau^2 + c1*tau + c0 crosses zero in the
+    given direction. Returns inf where there is no such crossing.
+    """
+    c2, c1, c0 = np.broadcast_arrays(c2, c1, c0)
+    tau = np.full(c0.shape, np.inf)
+
+    linear = c2 == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lin = -c0 / c1
+        ok = linear & (c1 != 0) & ((c1 > 0) == rising) & (lin > _EPS)
+        tau[ok] = lin[ok]
+
+        disc = c1 * c1 - 4 * c2 * c0
+        quad = ~linear & (disc >= 0)
+        sq = np.sqrt(np.where(quad, disc, 0.0))
+
+        # Numerically stable pair of roots, sorted
+        q = -0.5 * (c1 + np.where(c1 >= 0, sq, -sq))
+        r1 = np.where(q != 0, q / c2, -c1 / (2 * c2))
+        r2 = np.where(q != 0, c0 / q, r1)
+        lo, hi = np.minimum(r1, r2), np.maximum(r1, r2)
+
+    # A convex s rises through zero at its larger root and falls through
+    # it at the smaller one; a concave s does the opposite.
+    pick = np.where((c2 > 0) == rising, hi, lo)
+    ok = quad & (pick > _EPS)
+    tau[ok] = pick[ok]
+    return tau
+
+
+def switch_levels(mode, threshold, release):
+    """
+    Switching-function levels that end the current thruster mode.
+
+    :param mode: Thruster mode per member (-1, 0 or +1)
+    :return: (fall, rise) levels. A mode ends when s falls through `fall`
+        or rises through `rise`; NaN where the mode has no such exit.
+    """
+    fall = np.where(mode == 1, release, np.where(mode == 0, -threshold, np.nan))
+    rise = np.where(mode == -1, -release, np.where(mode == 0, threshold, np.nan))
+    return fall, rise
+
+
+def switch_mode(mode, rising, threshold):
+    """
+    Mode reached after leaving `mode` through one of its switching levels.
+
+    With threshold = 0 (sign-only law) the thrusters swap directly;
+    otherwise they pass through the deadzone first.
+    """
+    sign_law = threshold == 0
+    up = np.where(mode == 0, 1, np.where(sign_law, 1, 0))
+    down = np.where(mode == 0, -1, np.where(sign_law, -1, 0))
+    return np.where(rising, up, down)
+
+
+class EventResult:
+    """
+    Piecewise-analytic trajectories produced by EventSimulator.run().
+
+    Segment arrays have shape (n_segments, N). Members that finished early
+    are padded with segments starting at tf.
+    """
+
+    def __init__(self, sim, start, theta0, omega0, u0, accel, sliding,
+                 dist, n_events, theta_final, omega_final):
+        self.sim = sim
+        self.start = start
+        self.theta0 = theta0
+        self.omega0 = omega0
+        self.u0 = u0
+        self.accel = accel
+        self.sliding = sliding
+        self.dist = dist
+        self.n_events = n_events
+        self.theta_final = theta_final
+        self.omega_final = omega_final
+
+    def sample(self, t):
+        """
+        Evaluate every member on the time grid t.
+
+        :param t: Ascending sample times in [0, tf]
+        :return: engine.BatchResult. During sliding, u holds the
+            equivalent (average) thruster command, so it may be fractional.
+        """
+        sim = self.sim
+        t = np.asarray(t, dtype=float)
+        n = self.start.shape[1]
+
+        # Segment that covers each sample, per member
+        index = np.empty((n, t.size), dtype=np.intp)
+        for k in range(n):
+            index[k] = np.searchsorted(self.start[:, k], t, side="right") - 1
+        member = np.arange(n)[:, None]
+
+        def seg(a):
+            return a[index, member]
+
+        tau = t[None, :] - seg(self.start)
+        theta0, omega0, u0 = seg(self.theta0), seg(self.omega0), seg(self.u0)
+        accel, sliding, dist = seg(self.accel), seg(self.sliding), seg(self.dist)
+
+        inertia = sim.inertia[:, None]
+        torque = sim.control_torque[:, None]
+        lam = (sim.Kp / sim.Kd)[:, None]
+
+        decay = np.exp(-lam * tau)
+        theta = np.where(sliding,
+                         theta0 + omega0 * (1 - decay) / lam,
+                         theta0 + omega0 * tau + 0.5 * accel * tau**2)
+        omega = np.where(sliding, omega0 * decay, omega0 + accel * tau)
+        alpha = np.where(sliding, -lam * omega, accel)
+        tau_total = alpha * inertia
+        u = np.where(sliding, (tau_total - dist) / torque, u0)
+
+        return BatchResult(t, theta, omega, alpha, tau_total, u,
+                           np.broadcast_to(sim.setpoint, (n,)),
+                           t[1] - t[0] if t.size > 1 else sim.tf)
+
+
+class EventSimulator:
+    """
+    Event-driven bang-bang PD simulator.
+
+    The thruster turns on when the switching function s rises above
+    +threshold (or falls below -threshold) and turns off when it falls
+    back inside +/- release. threshold = 0 gives the sign-only law of
+    main.py; threshold = release gives a plain deadzone like code.py.
+    s is in the units of the sim (radians), so a 5 degree deadzone on a
+    degree-based controller is threshold = 5 * pi / 180.
+
+    Only PD laws are supported (Ki = 0 in every deployed controller),
+    and Kd must be positive so that sliding along the surface is defined.
+    """
+
+    def __init__(self, inertia, Kp, Kd, setpoint, n=None, tf=20.0,
+                 control_torque=1.5, threshold=0.0, release=None):
+        """
+        :param inertia: Moment of inertia (kg*m^2), scalar or (N,)
+        :param Kp: Proportional constant, scalar or (N,)
+        :param Kd: Derivative constant, scalar or (N,), must be > 0
+        :param setpoint: Desired heading (rad), scalar or (N,)
+        :param n: Batch size. Inferred from the array arguments if omitted.
+        :param tf: Final time for the simulation (s)
+        :param control_torque: Thruster torque magnitude (N*m), scalar or (N,)
+        :param threshold: Switching-function level that turns a thruster on
+        :param release: Level that turns it back off (defaults to threshold)
+        """
+        if release is None:
+            release = threshold
+        args = [inertia, Kp, Kd, setpoint, control_torque, threshold, release]
+        if n is None:
+            n = max(np.size(a) for a in args)
+        self.n = int(n)
+
+        def batch(a):
+            return np.broadcast_to(np.asarray(a, dtype=float), (self.n,)).copy()
+
+        (self.inertia, self.Kp, self.Kd, self.setpoint, self.control_torque,
+         self.threshold, self.release) = [batch(a) for a in args]
+        self.tf = float(tf)
+
+        if np.any(self.Kd <= 0):
+            raise ValueError("EventSimulator needs Kd > 0")
+        if np.any(self.release > self.threshold) or np.any(self.release < 0):
+            raise ValueError("release must lie between 0 and threshold")
+
+    def disturbance_torque(self, rng, amplitude=1.0, hold=None):
+        """
+        Draw a piecewise-constant disturbance, held for `hold` seconds.
+
+        :param rng: numpy.random.Generator
+        :param amplitude: Uniform disturbance amplitude (N*m), scalar or (N,)
+        :param hold: Hold time (s). Defaults to tf (one value per run).
+        :return: (disturbance_torque, hold) ready for run()
+        """
+        hold = self.tf if hold is None else float(hold)
+        k = int(np.ceil(self.tf / hold))
+        noise = rng.uniform(-1.0, 1.0, size=(self.n, k))
+        amplitude = np.broadcast_to(np.asarray(amplitude, dtype=float), (self.n,))
+        return noise * amplitude[:, None], hold
+
+    def _equivalent_command(self, omega, dist):
+        """
+        Thruster command that holds the state on a switching surface.
+        """
+        lam = self.Kp / self.Kd
+        return (-self.inertia * lam * omega - dist) / self.control_torque
+
+    def run(self, disturbance_torque=0.0, hold=None, theta0=0.0, omega0=0.0,
+            max_events=100000):
+        """
+        Integrate every member from t = 0 to tf.
+
+        :param disturbance_torque: (N,) constant torque, or (N, K) torques
+            each held for `hold` seconds
+        :param hold: Hold time of each disturbance column (s)
+        :param theta0: Initial angle (rad), scalar or (N,)
+        :param omega0: Initial angular velocity (rad/s), scalar or (N,)
+        :param max_events: Safety cap on loop iterations
+        :return: EventResult
+        """
+        n, tf = self.n, self.tf
+        inertia, torque = self.inertia, self.control_torque
+        Kp, Kd, setpoint = self.Kp, self.Kd, self.setpoint
+        on, off = self.threshold, self.release
+        lam = Kp / Kd
+
+        dist_table = np.asarray(disturbance_torque, dtype=float)
+        if dist_table.ndim < 2:
+            dist_table = np.broadcast_to(dist_table, (n,))[:, None]
+        n_hold = dist_table.shape[1]
+        hold = tf if hold is None else float(hold)
+        rows = np.arange(n)
+
+        t = np.zeros(n)
+        theta = np.broadcast_to(np.asarray(theta0, dtype=float), (n,)).copy()
+        omega = np.broadcast_to(np.asarray(omega0, dtype=float), (n,)).copy()
+        n_events = np.zeros(n, dtype=np.int64)
+
+        # Initial mode from the switching function at t = 0
+        s = Kp * (setpoint - theta) - Kd * omega
+        mode = np.where(s > on, 1, np.where(s < -on, -1, 0))
+        mode = np.where((on == 0) & (mode == 0), np.where(s >= 0, 1, -1), mode)
+        sliding = np.zeros(n, dtype=bool)
+        slide_lo = np.zeros(n)
+        slide_hi = np.zeros(n)
+
+        dist = dist_table[:, 0].copy()
+        if np.any(on == 0):
+            # Sign law starting exactly on s = 0 may slide from the start
+            u_eq = self._equivalent_command(omega, dist)
+            start = (on == 0) & (s == 0) & (np.abs(u_eq) < 1)
+            sliding |= start
+            slide_lo[start], slide_hi[start] = -1, 1
+
+        segments = []
+        active = t < tf
+        for _ in range(max_events):
+            if not active.any():
+                break
+
+            k = np.minimum((t / hold + 1e-9).astype(np.int64), n_hold - 1)
+            dist = dist_table[rows, k]
+            next_hold = np.where(k + 1 < n_hold, (k + 1) * hold, np.inf)
+
+            # Free motion under the current mode
+            accel = (mode * torque + dist) / inertia
+            c2 = -0.5 * Kp * accel
+            c1 = -Kp * omega - Kd * accel
+            c0 = Kp * (setpoint - theta) - Kd * omega
+
+            fall_level, rise_level = switch_levels(mode, on, off)
+            with np.errstate(invalid="ignore"):
+                fall = _crossing(c2, c1, c0 - fall_level, rising=False)
+                rise = _crossing(c2, c1, c0 - rise_level, rising=True)
+            switch = np.minimum(fall, rise)
+
+            # Sliding: leave the surface when the equivalent command
+            # reaches the authority of either neighbouring mode
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scale = -inertia * lam * omega
+                x_hi = (slide_hi * torque + dist) / scale
+                x_lo = (slide_lo * torque + dist) / scale
+                exit_hi = np.where((x_hi > 0) & (x_hi < 1), -np.log(x_hi) / lam, np.inf)
+                exit_lo = np.where((x_lo > 0) & (x_lo < 1), -np.log(x_lo) / lam, np.inf)
+            exit_slide = np.minimum(exit_hi, exit_lo)
+            switch = np.where(sliding, exit_slide, switch)
+
+            step = np.minimum(switch, np.minimum(next_hold, tf) - t)
+            step = np.where(active, np.maximum(step, 0.0), 0.0)
+
+            u_seg = np.where(sliding, self._equivalent_command(omega, dist), mode).astype(float)
+            segments.append((np.where(active, t, tf), theta.copy(), omega.copy(),
+                             u_seg, accel, sliding.copy(), dist))
+
+            # Advance to the end of the segment in closed form
+            decay = np.exp(-lam * step)
+            theta = np.where(sliding,
+                             theta + omega * (1 - decay) / lam,
+                             theta + omega * step + 0.5 * accel * step**2)
+            omega = np.where(sliding, omega * decay, omega + accel * step)
+            t = np.where(active, t + step, t)
+
+            hit = active & (step == switch) & np.isfinite(switch)
+
+            # Leaving a sliding surface
+            leave = hit & sliding
+            mode = np.where(leave & (exit_hi <= exit_lo), slide_hi, mode)
+            mode = np.where(leave & (exit_lo < exit_hi), slide_lo, mode).astype(np.int64)
+            sliding &= ~leave
+
+            # Crossing a switching level
+            cross = hit & ~leave
+            rising = rise <= fall
+            new_mode = np.where(cross, switch_mode(mode, rising, on), mode)
+
+            # Switching back would cross the same level again: slide
+            # instead if the equivalent command lies between the modes
+            same_level = (on == 0) | (on == off)
+            lo = np.minimum(mode, new_mode)
+            hi = np.maximum(mode, new_mode)
+            u_eq = self._equivalent_command(omega, dist)
+            start = cross & same_level & (u_eq > lo) & (u_eq < hi)
+            sliding |= start
+            slide_lo = np.where(start, lo, slide_lo)
+            slide_hi = np.where(start, hi, slide_hi)
+            mode = np.where(cross & ~start, new_mode, mode)
+            n_events += hit
+
+            # A new disturbance value can push a sliding member off the surface
+            at_hold = active & ~hit & sliding & (t < tf)
+            if at_hold.any():
+                k = np.minimum((t / hold + 1e-9).astype(np.int64), n_hold - 1)
+                u_eq = self._equivalent_command(omega, dist_table[rows, k])
+                up = at_hold & (u_eq >= slide_hi)
+                down = at_hold & (u_eq <= slide_lo)
+                mode = np.where(up, slide_hi, np.where(down, slide_lo, mode)).astype(np.int64)
+                sliding &= ~(up | down)
+                n_events += up | down
+
+            active = t < tf * (1 - 1e-12)
+        else:
+            raise RuntimeError(f"EventSimulator did not reach tf within {max_events} events")
+
+        stacked = [np.stack(a) for a in zip(*segments)]
+        return EventResult(self, *stacked, n_events, theta, omega)
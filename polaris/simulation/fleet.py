@@ -0,0 +1,141 @@
+# ============================================================
+# SIL fleet runner: fly every flight script variant at once
+#
+# Finds the CircuitPython flight scripts in polaris/ (code.py,
+# tests/*/ and RP2040_files/), flies each one in a worker process
+# through the SIL harness on the same set of disturbance seeds and
+# initial headings, and tabulates RMS error, settling, pulse count
+# and loop rate per variant. Re-qualifying every variant after a
+# change takes seconds instead of a day at the test stand.
+#
+# ============================================================
+
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .sil import THRUSTER_NAMES, run_flight
+
+# polaris/, where the flight scripts live
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Columns of report(), in order
+REPORT = ("rms_error", "settling_time", "pulses", "gas_used", "time_in_band", "loop_rate")
+
+
+# A flight script imports board and switches a thruster from code that
+# is not commented out
+_BOARD = re.compile(r"^\s*(import|from)\s+board\b", re.MULTILINE)
+_FIRES = re.compile(r"^[^#\n]*\b(%s)\.value\s*=" % "|".join(THRUSTER_NAMES), re.MULTILINE)
+
+
+def discover(root=ROOT):
+    """
+    Flight scripts under root: every .py file outside simulation/ that
+    imports board and switches a thruster. Host-side tools
+    (serial_logger.py etc.) and bench scripts that only set up the pins
+    (RP2040_files/ledMosfet.py) are skipped.
+
+    :return: Sorted list of paths relative to root
+    """
+    found = []
+    for path in glob.glob(os.path.join(root, "**", "*.py"), recursive=True):
+        relative = os.path.relpath(path, root)
+        if relative.split(os.sep)[0] == "simulation":
+            continue
+        with open(path, errors="replace") as file:
+            source = file.read()
+        if _BOARD.search(source) and _FIRES.search(source):
+            found.append(relative)
+    return sorted(found)
+
+
+def fly(script, root, seed, heading0, options):
+    """
+    Fly one script once and summarize it (runs in a worker process).
+    """
+    record = run_flight(os.path.join(root, script), seed=seed, heading0=heading0, **options)
+    row = {"script": script, "error": record.error or ""}
+    row.update(record.summary())
+    row["loops"] = int(record.reads.size)
+    return row
+
+
+def fly_fleet(scripts=None, n_seeds=8, seed=0, heading_range=(-180.0, 180.0), root=ROOT,
+              workers=None, **options):
+    """
+    Fly every script on the same disturbance seeds and initial headings.
+
+    :param scripts: Paths relative to root, defaults to discover(root)
+    :param n_seeds: Flights per script
+    :param seed: Root seed for the disturbance seeds and initial headings
+    :param heading_range: (low, high) uniform range of the initial heading (deg)
+    :param root: Directory the script paths are relative to
+    :param workers: Process count, defaults to os.cpu_count(). Use 1 to
+        fly in this process.
+    :param options: Passed to sil.run_flight (tf, M, R, control_torque,
+        disturbance, setpoint, clock, ...). Each script flies with its own
+        wiring (sil.script_thrusters()) unless thrusters is given.
+    :return: pandas DataFrame indexed by (script, run)
+    """
+    scripts = discover(root) if scripts is None else list(scripts)
+    root_seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    heading_seed, *seeds = root_seed.spawn(n_seeds + 1)
+    headings = np.random.default_rng(heading_seed).uniform(*heading_range, size=n_seeds)
+
+    flights = [(script, root, s, float(h), options)
+               for script in scripts for s, h in zip(seeds, headings)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        rows = [fly(*flight) for flight in flights]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(fly, *zip(*flights)))
+
+    import pandas as pd
+
+    table = pd.DataFrame(rows)
+    table.insert(1, "run", np.tile(np.arange(n_seeds), len(scripts)))
+    table.insert(2, "heading0", np.tile(headings, len(scripts)))
+    return table.set_index(["script", "run"])
+
+
+def report(table):
+    """
+    One row per script: means over its flights (settling time over the
+    flights that settled), sorted by RMS error. skipped counts flights
+    that never reached a control loop without raising (the script caught
+    its own exception, e.g. RP2040_files/integrationTest.py); failed
+    counts the other flights that raised or never settled.
+
+    :param table: Output of fly_fleet()
+    :return: pandas DataFrame indexed by script
+    """
+    grouped = table.groupby(level="script")
+    summary = grouped[list(REPORT)].mean()
+    summary["settled"] = grouped["settling_time"].count() / grouped.size()
+    # Scripts that catch their own exceptions end up blinking the red LED
+    # without flying a single control loop
+    skipped = (table["error"] == "") & (table["loops"] == 0)
+    failed = ~skipped & ((table["error"] != "") | table["settling_time"].isna())
+    summary["skipped"] = skipped.groupby(level="script").sum()
+    summary["failed"] = failed.groupby(level="script").sum()
+    return summary.sort_values("rms_error")
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.time()
+    table = fly_fleet(n_seeds=8, tf=60.0)
+    summary = report(table)
+    print(summary.to_string(float_format=lambda x: f"{x:.3f}"))
+    print(f"{len(table)} flights of 60 s in {time.time() - start:.1f} s")
+    for script, error in table["error"].groupby(level="script").first().items():
+        if error:
+            print(f"{script}: {error}")
+    for script in summary.index[summary["skipped"] > 0]:
+        print(f"{script}: skipped, never reached a control loop")
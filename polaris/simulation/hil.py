@@ -0,0 +1,522 @@
+# ============================================================
+# Hardware-in-the-loop host for the STAG HIL_MODE altitude shim
+#
+# With HIL_MODE defined in Config.h, STAG's readBarometer() takes
+# its altitude from `ALT:<value>` lines on Serial instead of the
+# BMP3XX (rejecting jumps of 10 m or more). This host streams a
+# simulated ascent profile as ALT: lines at the board's 100 Hz loop
+# rate and parses the `PID Output: ... | Heading: ...` and `EVENT:`
+# lines the board prints back, measuring how long the board takes
+# to respond.
+#
+# Ticks are scheduled on absolute deadlines with asyncio, so the
+# cadence never drifts; a missed tick is skipped instead of sent
+# late, and nothing is ever queued on the host side.
+#
+# FakeBoard plays the STAG v3 loop on the far end of a pseudo-
+# terminal, so the host can be exercised without a board:
+#
+#   python -m polaris.simulation hil --duration 20
+#   python -m polaris.simulation hil --device /dev/ttyACM0
+#
+# ============================================================
+
+import asyncio
+import errno
+import fcntl
+import math
+import os
+import re
+import struct
+import termios
+import tty
+
+import numpy as np
+
+from .controllers import HysteresisPD
+from .engine import cylinder_inertia
+from .mission import ascent_profile
+
+# Config.h (flight_controller_v3)
+LOOP_PERIOD = 0.010
+TARGET_ALTITUDE = 250.0
+GNC_ACTIVATION_VELOCITY = 1.0
+GNC_TIME = 30.0
+ALTITUDE_LANDING_THRESHOLD = 50.0
+LANDING_VELOCITY_THRESHOLD = 0.1
+RATE_LIMIT = 10.0
+
+# Serial commands and the state the board announces once it took them
+ACKS = {"ARM": "ARMED", "LAUNCH": "ASCENT", "ABORT": "GROUND"}
+
+NUMBER = r"([-+]?(?:\d+\.?\d*|\.\d+|nan|inf|ovf))"
+PID_LINE = re.compile(r"PID Output:\s*" + NUMBER + r"\s*\|\s*Heading:\s*" + NUMBER +
+                      r"(?:\s*\|\s*Pitch:\s*" + NUMBER + r"\s*\|\s*Roll:\s*" + NUMBER + ")?")
+EVENT_LINE = re.compile(r"EVENT: Transitioned to state (\w+)")
+
+
+def parse_line(line):
+    """
+    Parse one line printed by the board.
+
+    :return: ("pid", (output, heading, pitch, roll)), ("event", state) or
+        ("text", line). Fields the board did not print (or printed as
+        nan / ovf) are NaN.
+    """
+    match = PID_LINE.search(line)
+    if match:
+        values = []
+        for text in match.groups():
+            try:
+                values.append(float(text))
+            except (TypeError, ValueError):
+                values.append(math.nan)
+        return "pid", tuple(values)
+    match = EVENT_LINE.search(line)
+    if match:
+        return "event", match.group(1)
+    return "text", line
+
+
+def open_pty():
+    """
+    Raw, non-blocking pseudo-terminal pair.
+
+    :return: (host_fd, board_fd)
+    """
+    host, board = os.openpty()
+    tty.setraw(board)  # No echo and no newline translation
+    for fd in (host, board):
+        os.set_blocking(fd, False)
+    return host, board
+
+
+def open_serial(path, baud=115200):
+    """
+    Open a serial device (e.g. /dev/ttyACM0) raw and non-blocking, without
+    pyserial.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    tty.setraw(fd)
+    attrs = termios.tcgetattr(fd)
+    speed = getattr(termios, f"B{baud}")
+    attrs[4] = attrs[5] = speed
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    termios.tcflush(fd, termios.TCIOFLUSH)
+    return fd
+
+
+def write_line(fd, data):
+    """
+    Write without blocking. A full output buffer drops the line instead of
+    queueing it, so a stalled reader cannot build up a backlog.
+
+    :return: True if the whole line was written
+    """
+    try:
+        return os.write(fd, data) == len(data)
+    except BlockingIOError:
+        return False
+    except OSError as e:
+        if e.errno == errno.EIO:  # Other end closed
+            return False
+        raise
+
+
+class LineReader:
+    """
+    Splits bytes arriving on a non-blocking fd into lines.
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.buffer = bytearray()
+
+    def read(self):
+        """
+        Drain the fd and return the complete lines received (as str).
+        """
+        while True:
+            try:
+                chunk = os.read(self.fd, 4096)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                if e.errno == errno.EIO:
+                    break
+                raise
+            if not chunk:
+                break
+            self.buffer.extend(chunk)
+        *lines, rest = self.buffer.split(b"\n")
+        self.buffer = bytearray(rest)
+        return [line.decode(errors="replace").strip() for line in lines]
+
+
+class HILResult:
+    """
+    Everything the host sent and received during one HIL session.
+
+    Times are seconds since the start of the stream (host clock).
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.scheduled = []
+        self.sent = []
+        self.altitude = []
+        self.skipped = 0
+        self.dropped = 0
+        self.telemetry = []
+        self.events = []
+        self.text = []
+        self.commands = {}
+        self.backlog = 0
+
+    def arrays(self):
+        """
+        Dict of arrays: scheduled/sent times and altitude of every ALT line,
+        and t/output/heading/pitch/roll of every PID line.
+        """
+        telemetry = np.array(self.telemetry, dtype=float).reshape(-1, 5)
+        return {
+            "scheduled": np.array(self.scheduled),
+            "sent": np.array(self.sent),
+            "altitude": np.array(self.altitude),
+            "t": telemetry[:, 0],
+            "output": telemetry[:, 1],
+            "heading": telemetry[:, 2],
+            "pitch": telemetry[:, 3],
+            "roll": telemetry[:, 4],
+        }
+
+    def response_latency(self):
+        """
+        Time from each PID line back to the last ALT line sent before it,
+        the age of the freshest sample the board could have used.
+        """
+        sent = np.array(self.sent)
+        received = np.array([row[0] for row in self.telemetry])
+        if sent.size == 0 or received.size == 0:
+            return np.array([])
+        index = np.searchsorted(sent, received, side="right") - 1
+        valid = index >= 0
+        return received[valid] - sent[index[valid]]
+
+    def summary(self):
+        """
+        Cadence and latency statistics, suitable for JSON.
+        """
+        scheduled, sent = np.array(self.scheduled), np.array(self.sent)
+        rows = {"lines_sent": len(self.sent), "skipped": self.skipped, "dropped": self.dropped,
+                "pid_lines": len(self.telemetry), "max_backlog_bytes": self.backlog}
+        if sent.size:
+            lateness = sent - scheduled
+            rows["jitter_mean"] = float(lateness.mean())
+            rows["jitter_p99"] = float(np.percentile(lateness, 99))
+            rows["jitter_max"] = float(lateness.max())
+            # Slope of lateness over time; zero when the cadence holds
+            rows["drift"] = float(np.polyfit(scheduled, lateness, 1)[0]) if sent.size > 1 else 0.0
+            if sent.size > 1:
+                rows["rate"] = float((sent.size - 1) / (sent[-1] - sent[0]))
+        latency = self.response_latency()
+        if latency.size:
+            rows["response_latency_median"] = float(np.median(latency))
+            rows["response_latency_p99"] = float(np.percentile(latency, 99))
+        for command, info in self.commands.items():
+            rows[f"{command.lower()}_latency"] = info.get("latency", math.nan)
+            rows[f"{command.lower()}_attempts"] = info["attempts"]
+        rows["gnc_detect_latency"] = self.gnc_detect_latency()
+        rows["events"] = [state for _, state in self.events]
+        return rows
+
+    def gnc_detect_latency(self, target=TARGET_ALTITUDE):
+        """
+        Time from the first ALT line above the GNC target altitude to the
+        GNC_ACTIVE event. Includes the board's velocity filter lag.
+        """
+        above = [t for t, alt in zip(self.sent, self.altitude) if alt > target]
+        active = [t for t, state in self.events if state == "GNC_ACTIVE"]
+        if not above or not active:
+            return math.nan
+        return active[0] - above[0]
+
+
+class HILHost:
+    """
+    Streams ALT: lines to the board at a fixed rate and records its replies.
+    """
+
+    def __init__(self, fd, profile=ascent_profile, rate=1 / LOOP_PERIOD,
+                 commands=((0.5, "ARM"), (1.0, "LAUNCH")), spin=0.0):
+        """
+        :param fd: Non-blocking fd of the serial port or PTY
+        :param profile: Function of time (s) -> altitude (m)
+        :param rate: ALT lines per second (the board's loop rate)
+        :param commands: (time, command) pairs. A command is appended to
+            every tick's ALT line until the board announces the state it
+            leads to: under HIL_MODE readBarometer() consumes one line per
+            loop before the state machine reads its command.
+        :param spin: Busy-wait the last spin seconds before each deadline
+            instead of sleeping, for sub-millisecond cadence on a free core
+        """
+        self.fd = fd
+        self.profile = profile
+        self.period = 1.0 / rate
+        self.commands = sorted(commands)
+        self.spin = spin
+        self.reader = LineReader(fd)
+        self.result = HILResult(self.period)
+
+    def receive(self):
+        now = self.loop.time() - self.start
+        for line in self.reader.read():
+            kind, value = parse_line(line)
+            if kind == "pid":
+                self.result.telemetry.append((now,) + value)
+            elif kind == "event":
+                self.result.events.append((now, value))
+                for command, info in self.result.commands.items():
+                    if "latency" not in info and ACKS.get(command) == value:
+                        info["latency"] = now - info["first"]
+            else:
+                self.result.text.append((now, line))
+
+    def pending_commands(self, now):
+        """
+        Commands due by now that the board has not acknowledged yet.
+        """
+        due = []
+        for at, command in self.commands:
+            if at > now:
+                break
+            info = self.result.commands.setdefault(command, {"first": None, "attempts": 0})
+            if "latency" not in info:
+                due.append(command)
+        return due
+
+    async def run(self, duration):
+        """
+        Stream for duration seconds.
+
+        :return: HILResult
+        """
+        self.loop = asyncio.get_running_loop()
+        self.start = self.loop.time()
+        self.loop.add_reader(self.fd, self.receive)
+        result = self.result
+        try:
+            tick = 0
+            while tick * self.period < duration:
+                deadline = self.start + tick * self.period
+                delay = deadline - self.spin - self.loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                while self.loop.time() < deadline:
+                    pass
+                now = self.loop.time() - self.start
+
+                # Behind by a whole period or more: skip to the current tick
+                # rather than bursting the missed lines
+                current = int(now / self.period)
+                if current > tick:
+                    result.skipped += current - tick
+                    tick = current
+                scheduled = tick * self.period
+
+                altitude = float(self.profile(scheduled))
+                data = f"ALT:{altitude:.2f}\n"
+                commands = self.pending_commands(scheduled)
+                for command in commands:
+                    data += command + "\n"
+
+                sent = self.loop.time() - self.start
+                if write_line(self.fd, data.encode()):
+                    result.scheduled.append(scheduled)
+                    result.sent.append(sent)
+                    result.altitude.append(altitude)
+                    for command in commands:
+                        info = result.commands[command]
+                        info["attempts"] += 1
+                        if info["first"] is None:
+                            info["first"] = sent
+                else:
+                    result.dropped += 1
+                result.backlog = max(result.backlog, pending_bytes(self.fd))
+                tick += 1
+            # Let the last replies arrive
+            await asyncio.sleep(2 * self.period)
+            self.receive()
+        finally:
+            self.loop.remove_reader(self.fd)
+        for info in result.commands.values():
+            info.pop("first", None)
+        return result
+
+
+def pending_bytes(fd):
+    """
+    Bytes received on fd that the host has not read yet.
+    """
+    try:
+        return struct.unpack("i", fcntl.ioctl(fd, termios.FIONREAD, b"\0\0\0\0"))[0]
+    except OSError:
+        return 0
+
+
+class FakeBoard:
+    """
+    Stand-in for the STAG v3 loop under HIL_MODE, on the board end of a PTY.
+
+    Every 10 ms it reads one line for readBarometer() (ALT: with the 10 m
+    rate limiter), updates the EMA vertical velocity (tau = 0.75 s), runs
+    the mission state machine, and in GNC_ACTIVE flies HysteresisPD against
+    a rotation plant and prints the PID line.
+    """
+
+    def __init__(self, fd, heading0=90.0, M=10.0, R=0.25, control_torque=1.5, disturbance=1.0,
+                 seed=None):
+        self.fd = fd
+        self.reader = LineReader(fd)
+        self.lines = []
+        self.inertia = cylinder_inertia(M, R)
+        self.control_torque = control_torque
+        self.disturbance = disturbance
+        self.rng = np.random.default_rng(seed)
+        self.theta = math.radians(heading0)
+        self.omega = 0.0
+        self.pid = HysteresisPD(1.0, 0.6, 0.0)
+        self.pid.reset(1)
+        self.state = None
+        self.altitude = 0.0
+        self.velocity = 0.0
+        self.last_altitude = None
+        self.state_time = 0.0
+
+    def println(self, text):
+        write_line(self.fd, (text + "\r\n").encode())
+
+    def transition(self, state, now):
+        self.state = state
+        self.state_time = now
+        self.println(f"EVENT: Transitioned to state {state}")
+
+    def read_line(self):
+        self.lines.extend(self.reader.read())
+        return self.lines.pop(0) if self.lines else None
+
+    def read_barometer(self):
+        line = self.read_line()
+        if line and line.startswith("ALT:") and len(line) > 4:
+            try:
+                parsed = float(line[4:])
+            except ValueError:
+                parsed = 0.0  # String::toFloat()
+            if self.altitude == 0.0 or abs(parsed - self.altitude) < RATE_LIMIT:
+                self.altitude = parsed
+
+    def update_velocity(self, dt):
+        if self.last_altitude is not None and dt > 0:
+            raw = (self.altitude - self.last_altitude) / dt
+            alpha = dt / (0.75 + dt)
+            self.velocity = alpha * raw + (1.0 - alpha) * self.velocity
+        self.last_altitude = self.altitude
+
+    async def run(self, duration, period=LOOP_PERIOD):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        self.println("=== Hapsis Payload System ===")
+        self.transition("GROUND", 0.0)
+        tick = 1
+        while tick * period <= duration:
+            delay = start + tick * period - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = tick * period
+            tick += 1
+
+            self.read_barometer()
+            self.update_velocity(period)
+
+            alpha = (self.pid.command[0] * self.control_torque
+                     + self.rng.uniform(-1.0, 1.0) * self.disturbance) / self.inertia
+            self.theta += self.omega * period + 0.5 * alpha * period ** 2
+            self.omega += alpha * period
+
+            if self.state in ("GROUND", "ARMED"):
+                command = self.read_line()
+                if command is None:
+                    continue
+                command = command.upper()
+                if self.state == "GROUND" and command == "ARM":
+                    self.transition("ARMED", now)
+                elif self.state == "ARMED" and command == "LAUNCH":
+                    self.transition("ASCENT", now)
+                elif self.state == "ARMED" and command == "ABORT":
+                    self.transition("GROUND", now)
+            elif self.state == "ASCENT":
+                if self.altitude > TARGET_ALTITUDE and self.velocity > GNC_ACTIVATION_VELOCITY:
+                    self.transition("GNC_ACTIVE", now)
+            elif self.state == "GNC_ACTIVE":
+                if now - self.state_time >= GNC_TIME:
+                    self.pid.command[:] = 0
+                    self.transition("PYRO_FIRED", now)
+                    continue
+                self.pid.step(np.array([self.theta]), period)
+                heading = math.degrees(self.theta) % 360.0
+                self.println(f"PID Output: {self.pid.output[0]:.2f} | Heading: {heading:.2f} "
+                             f"| Pitch: 0.00 | Roll: 0.00")
+            elif self.state == "PYRO_FIRED":
+                self.transition("DESCENT", now)
+            elif self.state == "DESCENT":
+                if (self.altitude < ALTITUDE_LANDING_THRESHOLD
+                        and abs(self.velocity) < LANDING_VELOCITY_THRESHOLD):
+                    self.transition("LANDED", now)
+
+
+def run_hil(duration=20.0, device=None, baud=115200, profile=ascent_profile, rate=1 / LOOP_PERIOD,
+            commands=((0.5, "ARM"), (1.0, "LAUNCH")), spin=0.0, seed=None):
+    """
+    Run one HIL session in real time.
+
+    :param duration: Stream length (s)
+    :param device: Serial device of the board, or None to fly a FakeBoard
+        over a pseudo-terminal
+    :param baud: Serial baud rate
+    :param profile: Function of time (s) -> altitude (m)
+    :param rate: ALT lines per second
+    :param commands: (time, command) pairs sent to the board
+    :param spin: See HILHost
+    :param seed: Disturbance seed of the FakeBoard
+    :return: HILResult
+    """
+
+    async def session():
+        if device is not None:
+            fd = open_serial(device, baud)
+            try:
+                return await HILHost(fd, profile, rate, commands, spin).run(duration)
+            finally:
+                os.close(fd)
+
+        host_fd, board_fd = open_pty()
+        try:
+            board = asyncio.ensure_future(FakeBoard(board_fd, seed=seed).run(duration + 0.1))
+            result = await HILHost(host_fd, profile, rate, commands, spin).run(duration)
+            board.cancel()
+            try:
+                await board
+            except asyncio.CancelledError:
+                pass
+            return result
+        finally:
+            os.close(host_fd)
+            os.close(board_fd)
+
+    return asyncio.run(session())
+
+
+if __name__ == "__main__":
+    result = run_hil(duration=12.0, seed=0)
+    for name, value in result.summary().items():
+        print(f"{name} = {value}")
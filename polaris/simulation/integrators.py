@@ -0,0 +1,529 @@
+# ============================================================
+# Pluggable integrators for the continuous-time rotation model
+#
+# Euler (the mixed update main.py has always used), classic RK4
+# and adaptive Dormand-Prince RK45. The simulator treats the PD
+# bang-bang law in continuous time: every step is checked for a
+# thruster on/off crossing of the switching function, and the
+# crossing is located to machine precision by re-stepping, so a
+# large step never smears a switch across its whole length.
+#
+# Run `python -m polaris.simulation.integrators` for a benchmark
+# of accuracy versus CPU time against a fine-step reference.
+#
+# ============================================================
+
+import time
+
+import numpy as np
+
+from .engine import BatchResult
+from .events import switch_levels, switch_mode
+
+
+class Euler:
+    """
+    Fixed-step update used by main.py:
+    theta += omega*h + 0.5*alpha*h^2, omega += alpha*h.
+    """
+
+    name = "euler"
+    adaptive = False
+    evals = 1
+
+    def step(self, f, t, theta, omega, h):
+        dtheta, domega = f(t, theta, omega)
+        return theta + h * dtheta + 0.5 * h * h * domega, omega + h * domega, None
+
+
+class RK4:
+    """
+    Classic fixed-step fourth-order Runge-Kutta.
+    """
+
+    name = "rk4"
+    adaptive = False
+    evals = 4
+
+    def step(self, f, t, theta, omega, h):
+        k1t, k1w = f(t, theta, omega)
+        k2t, k2w = f(t + h / 2, theta + h / 2 * k1t, omega + h / 2 * k1w)
+        k3t, k3w = f(t + h / 2, theta + h / 2 * k2t, omega + h / 2 * k2w)
+        k4t, k4w = f(t + h, theta + h * k3t, omega + h * k3w)
+        theta1 = theta + h / 6 * (k1t + 2 * k2t + 2 * k3t + k4t)
+        omega1 = omega + h / 6 * (k1w + 2 * k2w + 2 * k3w + k4w)
+        return theta1, omega1, None
+
+
+class RK45:
+    """
+    Adaptive Dormand-Prince 5(4) with a per-member step size.
+    """
+
+    name = "rk45"
+    adaptive = True
+    evals = 7
+
+    _C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1])
+    _A = [
+        [],
+        [1 / 5],
+        [3 / 40, 9 / 40],
+        [44 / 45, -56 / 15, 32 / 9],
+        [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+        [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+        [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+    ]
+    _B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+    _B4 = np.array([5179 / 57600, 0, 7571 / 16695, 393 / 640,
+                    -92097 / 339200, 187 / 2100, 1 / 40])
+
+    def __init__(self, rtol=1e-6, atol=1e-9):
+        self.rtol = rtol
+        self.atol = atol
+
+    def step(self, f, t, theta, omega, h):
+        kt, kw = [], []
+        for c, a in zip(self._C, self._A):
+            th = theta + h * sum(ai * k for ai, k in zip(a, kt))
+            om = omega + h * sum(ai * k for ai, k in zip(a, kw))
+            dt_, dw_ = f(t + c * h, th, om)
+            kt.append(dt_)
+            kw.append(dw_)
+
+        theta1 = theta + h * sum(b * k for b, k in zip(self._B, kt))
+        omega1 = omega + h * sum(b * k for b, k in zip(self._B, kw))
+
+        E = self._B - self._B4
+        err_t = h * sum(e * k for e, k in zip(E, kt))
+        err_w = h * sum(e * k for e, k in zip(E, kw))
+        sc_t = self.atol + self.rtol * np.maximum(np.abs(theta), np.abs(theta1))
+        sc_w = self.atol + self.rtol * np.maximum(np.abs(omega), np.abs(omega1))
+        err = np.sqrt(0.5 * ((err_t / sc_t) ** 2 + (err_w / sc_w) ** 2))
+        return theta1, omega1, err
+
+
+INTEGRATORS = {"euler": Euler, "rk4": RK4, "rk45": RK45}
+
+
+def get_integrator(integrator):
+    """
+    Resolve an integrator name ('euler', 'rk4', 'rk45') or pass an
+    instance through unchanged.
+    """
+    if isinstance(integrator, str):
+        try:
+            return INTEGRATORS[integrator]()
+        except KeyError:
+            raise ValueError(f"Unknown integrator '{integrator}', "
+                             f"expected one of {sorted(INTEGRATORS)}") from None
+    return integrator
+
+
+class GustDisturbance:
+    """
+    Smooth random disturbance torque: a sum of sinusoids with random
+    frequency and phase per member, scaled so |torque| <= amplitude.
+    """
+
+    def __init__(self, rng, n, amplitude=1.0, n_modes=8, max_frequency=2.0):
+        """
+        :param rng: numpy.random.Generator
+        :param n: Batch size
+        :param amplitude: Peak torque (N*m), scalar or (N,)
+        :param n_modes: Sinusoids per member
+        :param max_frequency: Highest gust frequency (Hz)
+        """
+        self.frequency = rng.uniform(0.0, max_frequency, size=(n, n_modes))
+        self.phase = rng.uniform(0.0, 2 * np.pi, size=(n, n_modes))
+        weight = rng.uniform(0.0, 1.0, size=(n, n_modes))
+        amplitude = np.broadcast_to(np.asarray(amplitude, dtype=float), (n,))
+        self.weight = weight / weight.sum(axis=1, keepdims=True) * amplitude[:, None]
+
+    def __call__(self, t, idx):
+        """
+        Disturbance torque at times t (one per member in idx).
+        """
+        arg = 2 * np.pi * self.frequency[idx] * np.asarray(t)[:, None] + self.phase[idx]
+        return (self.weight[idx] * np.sin(arg)).sum(axis=1)
+
+
+class ContinuousSimulator:
+    """
+    Batched continuous-time bang-bang PD simulation with a pluggable
+    integrator and switching-event localization.
+
+    The thruster logic matches EventSimulator: on above +/- threshold,
+    off below +/- release, sign-only when threshold = 0, and analytic
+    sliding (omega' = -(Kp/Kd) * omega) where a switch would flip straight
+    back. Unlike EventSimulator the torque between switches does not have
+    to be constant, so smooth disturbances and viscous damping are allowed.
+    """
+
+    def __init__(self, inertia, Kp, Kd, setpoint, n=None, tf=20.0,
+                 control_torque=1.5, threshold=0.0, release=None, damping=0.0,
+                 disturbance=0.0):
+        """
+        :param inertia: Moment of inertia (kg*m^2), scalar or (N,)
+        :param Kp: Proportional constant, scalar or (N,)
+        :param Kd: Derivative constant, scalar or (N,), must be > 0
+        :param setpoint: Desired heading (rad), scalar or (N,)
+        :param n: Batch size. Inferred from the array arguments if omitted.
+        :param tf: Final time for the simulation (s)
+        :param control_torque: Thruster torque magnitude (N*m), scalar or (N,)
+        :param threshold: Switching-function level that turns a thruster on
+        :param release: Level that turns it back off (defaults to threshold)
+        :param damping: Viscous damping (N*m*s/rad), scalar or (N,)
+        :param disturbance: Constant torque (scalar or (N,)) or a callable
+            d(t, idx) such as GustDisturbance
+        """
+        if release is None:
+            release = threshold
+        args = [inertia, Kp, Kd, setpoint, control_torque, threshold, release, damping]
+        if n is None:
+            n = max(np.size(a) for a in args)
+        self.n = int(n)
+
+        def batch(a):
+            return np.broadcast_to(np.asarray(a, dtype=float), (self.n,)).copy()
+
+        (self.inertia, self.Kp, self.Kd, self.setpoint, self.control_torque,
+         self.threshold, self.release, self.damping) = [batch(a) for a in args]
+        self.tf = float(tf)
+
+        if callable(disturbance):
+            self.disturbance = disturbance
+        else:
+            constant = batch(disturbance)
+            self.disturbance = lambda t, idx: constant[idx]
+
+        if np.any(self.Kd <= 0):
+            raise ValueError("ContinuousSimulator needs Kd > 0")
+        if np.any(self.release > self.threshold) or np.any(self.release < 0):
+            raise ValueError("release must lie between 0 and threshold")
+
+    def _switching(self, theta, omega, idx):
+        return self.Kp[idx] * (self.setpoint[idx] - theta) - self.Kd[idx] * omega
+
+    def _equivalent_command(self, t, omega, idx):
+        lam = self.Kp[idx] / self.Kd[idx]
+        torque = (-self.inertia[idx] * lam + self.damping[idx]) * omega
+        return (torque - self.disturbance(t, idx)) / self.control_torque[idx]
+
+    def _dynamics(self, idx, mode, sliding):
+        inertia = self.inertia[idx]
+        torque = self.control_torque[idx] * mode
+        damping = self.damping[idx]
+        lam = self.Kp[idx] / self.Kd[idx]
+
+        def f(t, theta, omega):
+            alpha = (torque + self.disturbance(t, idx) - damping * omega) / inertia
+            return omega, np.where(sliding, -lam * omega, alpha)
+
+        return f
+
+    def _event_value(self, t, theta, omega, idx, sliding):
+        """
+        Quantity watched for events: s for free flight, the equivalent
+        command while sliding.
+        """
+        s = self._switching(theta, omega, idx)
+        if not sliding.any():
+            return s
+        return np.where(sliding, self._equivalent_command(t, omega, idx), s)
+
+    def run(self, integrator="rk45", dt=0.02, t_eval=None, theta0=0.0,
+            omega0=0.0, locate_events=True, max_iterations=10_000_000):
+        """
+        Integrate every member from t = 0 to tf.
+
+        :param integrator: 'euler', 'rk4', 'rk45' or an integrator instance
+        :param dt: Fixed step (Euler, RK4) or initial step (RK45) in seconds
+        :param t_eval: Output times. Defaults to 1001 samples over [0, tf].
+            Steps are cut short to land on every output time.
+        :param theta0: Initial angle (rad), scalar or (N,)
+        :param omega0: Initial angular velocity (rad/s), scalar or (N,)
+        :param locate_events: Find each switch exactly. With False the
+            thruster mode is only updated at the start of each step, which
+            is the sampled behaviour of main.py.
+        :return: (BatchResult on t_eval, stats dict)
+        """
+        integ = get_integrator(integrator)
+        n, tf = self.n, self.tf
+        on, off = self.threshold, self.release
+        if t_eval is None:
+            t_eval = np.linspace(0.0, tf, 1001)
+        t_eval = np.asarray(t_eval, dtype=float)
+
+        t = np.zeros(n)
+        theta = np.broadcast_to(np.asarray(theta0, dtype=float), (n,)).copy()
+        omega = np.broadcast_to(np.asarray(omega0, dtype=float), (n,)).copy()
+        h = np.full(n, float(dt))
+
+        all_idx = np.arange(n)
+        s = self._switching(theta, omega, all_idx)
+        mode = np.where(s > on, 1, np.where(s < -on, -1, 0))
+        mode = np.where((on == 0) & (mode == 0), np.where(s >= 0, 1, -1), mode)
+        sliding = np.zeros(n, dtype=bool)
+        slide_lo = np.zeros(n)
+        slide_hi = np.zeros(n)
+        slide_level = np.zeros(n)
+
+        # Members that switched on their last step, and the level they
+        # switched at. They start on that level, so rounding must not
+        # decide which side of it they are on.
+        fresh = np.zeros(n, dtype=bool)
+        fresh_level = np.zeros(n)
+
+        out_theta = np.empty((n, t_eval.size))
+        out_omega = np.empty((n, t_eval.size))
+        out_u = np.empty((n, t_eval.size))
+        out_k = np.zeros(n, dtype=np.int64)
+
+        stats = {"steps": np.zeros(n, dtype=np.int64),
+                 "rejected": np.zeros(n, dtype=np.int64),
+                 "events": np.zeros(n, dtype=np.int64),
+                 "evaluations": np.zeros(n, dtype=np.int64)}
+
+        def record(idx):
+            # Store members sitting on their next output time
+            at = idx[np.abs(t[idx] - t_eval[out_k[idx]]) <= 1e-12 * max(tf, 1.0)]
+            while at.size:
+                k = out_k[at]
+                t[at] = t_eval[k]
+                out_theta[at, k] = theta[at]
+                out_omega[at, k] = omega[at]
+                u_now = np.where(sliding[at], self._equivalent_command(t[at], omega[at], at), mode[at])
+                out_u[at, k] = u_now
+                out_k[at] += 1
+                more = out_k[at] < t_eval.size
+                at = at[more]
+                at = at[np.abs(t[at] - t_eval[out_k[at]]) <= 1e-12 * max(tf, 1.0)]
+
+        record(all_idx)
+
+        for _ in range(max_iterations):
+            idx = np.nonzero(out_k < t_eval.size)[0]
+            if idx.size == 0:
+                break
+
+            if not locate_events:
+                # Sampled control law, evaluated once per step
+                s = self._switching(theta[idx], omega[idx], idx)
+                m = mode[idx]
+                fall_level, rise_level = switch_levels(m, on[idx], off[idx])
+                with np.errstate(invalid="ignore"):
+                    down = s < fall_level
+                    up = s > rise_level
+                m = np.where(down, switch_mode(m, False, on[idx]), m)
+                m = np.where(up, switch_mode(m, True, on[idx]), m)
+                mode[idx] = m
+
+            target = t_eval[out_k[idx]]
+            limit = target - t[idx]
+            hh = np.minimum(h[idx], limit)
+            f = self._dynamics(idx, mode[idx], sliding[idx])
+            th1, om1, err = integ.step(f, t[idx], theta[idx], omega[idx], hh)
+            stats["evaluations"][idx] += integ.evals
+
+            if integ.adaptive:
+                accept = err <= 1.0
+                with np.errstate(divide="ignore"):
+                    factor = np.clip(0.9 * err ** -0.2, 0.2, 5.0)
+                grown = hh * factor
+                truncated = hh < h[idx]
+                h[idx] = np.where(accept & truncated, np.maximum(h[idx], grown), grown)
+                stats["rejected"][idx] += ~accept
+                idx, hh, th1, om1 = idx[accept], hh[accept], th1[accept], om1[accept]
+                if idx.size == 0:
+                    continue
+
+            if locate_events:
+                hh, th1, om1, hit, rising = self._locate(
+                    integ, idx, t[idx], theta[idx], omega[idx], hh, th1, om1,
+                    mode, sliding, slide_lo, slide_hi, fresh, fresh_level, stats)
+            else:
+                hit = np.zeros(idx.size, dtype=bool)
+
+            t[idx] = t[idx] + hh
+            theta[idx] = th1
+            omega[idx] = om1
+            stats["steps"][idx] += 1
+
+            # Keep sliding members exactly on their surface so integrator
+            # error cannot leave them on the wrong side of it
+            on_surface = idx[sliding[idx]]
+            omega[on_surface] = (self._switching(theta[on_surface], 0.0, on_surface)
+                                 - slide_level[on_surface]) / self.Kd[on_surface]
+
+            fresh[idx] = False
+            if hit.any():
+                self._switch(t, theta, omega, idx[hit], rising[hit], mode, sliding,
+                             slide_lo, slide_hi, slide_level, fresh, fresh_level)
+                stats["events"][idx[hit]] += 1
+
+            record(idx)
+        else:
+            raise RuntimeError(f"ContinuousSimulator did not reach tf within {max_iterations} steps")
+
+        # While sliding out_u is the equivalent command, so this also gives
+        # alpha = -(Kp/Kd) * omega on the surface
+        dist = self.disturbance(np.tile(t_eval, n), np.repeat(all_idx, t_eval.size))
+        tau = (out_u * self.control_torque[:, None] + dist.reshape(n, -1)
+               - self.damping[:, None] * out_omega)
+        result = BatchResult(t_eval, out_theta, out_omega, tau / self.inertia[:, None],
+                             tau, out_u, self.setpoint.copy(),
+                             t_eval[1] - t_eval[0] if t_eval.size > 1 else tf)
+        return result, stats
+
+    def _locate(self, integ, idx, t0, theta0, omega0, hh, theta1, omega1,
+                mode, sliding, slide_lo, slide_hi, fresh, fresh_level, stats,
+                tol=1e-12, max_iter=60):
+        """
+        Check accepted steps for a switching event and shorten each step
+        that has one so it ends exactly on the first crossing.
+
+        :return: (hh, theta1, omega1, hit, rising) for the members in idx
+        """
+        m = mode[idx]
+        sl = sliding[idx]
+        fall_level, rise_level = switch_levels(m, self.threshold[idx], self.release[idx])
+        up_level = np.where(sl, slide_hi[idx], rise_level)
+        down_level = np.where(sl, slide_lo[idx], fall_level)
+
+        v0 = self._event_value(t0, theta0, omega0, idx, sl)
+        v1 = self._event_value(t0 + hh, theta1, omega1, idx, sl)
+        # A member that starts on the level it just switched at has not
+        # crossed it again until it is strictly past it
+        new_up = fresh[idx] & (up_level == fresh_level[idx])
+        new_down = fresh[idx] & (down_level == fresh_level[idx])
+        with np.errstate(invalid="ignore"):
+            up = np.where(new_up, v1 > up_level, (v0 < up_level) & (v1 >= up_level))
+            down = np.where(new_down, v1 < down_level, (v0 > down_level) & (v1 <= down_level))
+            down &= ~up
+        hit = up | down
+        if not hit.any():
+            return hh, theta1, omega1, hit, up
+
+        # Illinois (modified regula falsi) on the step length, re-stepping
+        # from the start of the step for every trial length
+        sub = np.nonzero(hit)[0]
+        ids = idx[sub]
+        sign = np.where(up[sub], 1.0, -1.0)
+        level = np.where(up[sub], up_level[sub], down_level[sub])
+        strict = np.where(up[sub], new_up[sub], new_down[sub])
+        f = self._dynamics(ids, m[sub], sl[sub])
+        ts, ths, oms = t0[sub], theta0[sub], omega0[sub]
+
+        a = np.zeros(sub.size)
+        b = hh[sub].copy()
+        ga = np.minimum(sign * (v0[sub] - level), 0.0)
+        gb = sign * (v1[sub] - level)
+        th_b, om_b = theta1[sub].copy(), omega1[sub].copy()
+        side = np.zeros(sub.size)
+
+        for _ in range(max_iter):
+            todo = (b - a) > tol * np.maximum(1.0, b)
+            if not todo.any():
+                break
+            with np.errstate(divide="ignore", invalid="ignore"):
+                c = b - gb * (b - a) / (gb - ga)
+            inside = (c > a) & (c < b)
+            c = np.where(inside, c, 0.5 * (a + b))
+            c = np.where(todo, c, b)
+
+            th_c, om_c, _ = integ.step(f, ts, ths, oms, c)
+            stats["evaluations"][ids] += integ.evals * todo
+            gc = sign * (self._event_value(ts + c, th_c, om_c, ids, sl[sub]) - level)
+
+            right = todo & ((gc > 0) | ((gc == 0) & ~strict))
+            left = todo & ~right
+            ga = np.where(right & (side == 1), ga / 2, ga)
+            gb = np.where(left & (side == -1), gb / 2, gb)
+            b, gb = np.where(right, c, b), np.where(right, gc, gb)
+            a, ga = np.where(left, c, a), np.where(left, gc, ga)
+            th_b, om_b = np.where(right, th_c, th_b), np.where(right, om_c, om_b)
+            side = np.where(right, 1, np.where(left, -1, side))
+
+        hh = hh.copy()
+        theta1 = theta1.copy()
+        omega1 = omega1.copy()
+        hh[sub], theta1[sub], omega1[sub] = b, th_b, om_b
+        return hh, theta1, omega1, hit, up
+
+    def _switch(self, t, theta, omega, ev, rising, mode, sliding, slide_lo,
+                slide_hi, slide_level, fresh, fresh_level):
+        """
+        Apply the thruster transition for members ev that just hit an event.
+        """
+        on, off = self.threshold[ev], self.release[ev]
+        was_sliding = sliding[ev]
+
+        # Leaving a sliding surface: the neighbouring mode whose authority
+        # was exceeded takes over
+        leave_mode = np.where(rising, slide_hi[ev], slide_lo[ev])
+
+        # Crossing a switching level
+        new_mode = switch_mode(mode[ev], rising, on)
+        fall_level, rise_level = switch_levels(mode[ev], on, off)
+        level = np.where(rising, rise_level, fall_level)
+        same_level = (on == 0) | (on == off)
+        lo = np.minimum(mode[ev], new_mode)
+        hi = np.maximum(mode[ev], new_mode)
+        u_eq = self._equivalent_command(t[ev], omega[ev], ev)
+        start = ~was_sliding & same_level & (u_eq > lo) & (u_eq < hi)
+
+        mode[ev] = np.where(was_sliding, leave_mode,
+                            np.where(start, mode[ev], new_mode)).astype(mode.dtype)
+        sliding[ev] = start
+        slide_lo[ev] = np.where(start, lo, slide_lo[ev])
+        slide_hi[ev] = np.where(start, hi, slide_hi[ev])
+        fresh[ev] = ~start
+        fresh_level[ev] = np.where(was_sliding, slide_level[ev], level)
+        slide_level[ev] = np.where(start, level, slide_level[ev])
+        omega[ev] = np.where(start, (self._switching(theta[ev], 0.0, ev) - level) / self.Kd[ev],
+                             omega[ev])
+
+
+def benchmark(n=16, tf=20.0, seed=0, damping=0.05):
+    """
+    Accuracy versus CPU time for every integrator against a tight-tolerance
+    RK45 reference, on smooth random gusts.
+
+    :return: pandas DataFrame, one row per integrator setting
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    gust = GustDisturbance(rng, n, amplitude=1.0)
+    sim = ContinuousSimulator(0.3125, 0.9, 0.45, np.pi, n=n, tf=tf,
+                              damping=damping, disturbance=gust)
+    t_eval = np.linspace(0.0, tf, 21)
+
+    reference, _ = sim.run(RK45(rtol=1e-12, atol=1e-14), dt=1e-3, t_eval=t_eval)
+
+    cases = [(Euler(), False, dt) for dt in (0.02, 0.01, 0.005, 0.002, 0.001)]
+    cases += [(Euler(), True, dt) for dt in (0.02, 0.01, 0.005, 0.002, 0.001)]
+    cases += [(RK4(), True, dt) for dt in (0.2, 0.1, 0.05, 0.02, 0.01)]
+    cases += [(RK45(rtol=rtol, atol=rtol * 1e-3), True, 0.01)
+              for rtol in (1e-3, 1e-4, 1e-5, 1e-6, 1e-7, 1e-8)]
+
+    rows = []
+    for integ, locate, dt in cases:
+        start = time.process_time()
+        result, stats = sim.run(integ, dt=dt, t_eval=t_eval, locate_events=locate)
+        cpu = time.process_time() - start
+        rows.append({
+            "integrator": integ.name,
+            "locate_events": locate,
+            "dt": dt,
+            "rtol": getattr(integ, "rtol", np.nan),
+            "cpu_s": cpu,
+            "evaluations": stats["evaluations"].mean(),
+            "max_error": np.abs(result.theta - reference.theta).max(),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    print(benchmark().to_string(index=False))
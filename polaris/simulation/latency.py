@@ -0,0 +1,218 @@
+# ============================================================
+# Loop-rate sensitivity study for the GNC Hapsis flight laws
+#
+# The flight loop does not run every simulation step: SD writes and
+# print() stretch it to ~60 ms on code.py (~11 ms over USB serial
+# only). This study flies every control law at a range of loop
+# periods, with the period jittered either parametrically or by
+# resampling the loop periods measured in our own logs, and gives
+# one "performance versus loop rate" curve per law. The chunks fan
+# out over a process pool like campaign.py, and every (law, period)
+# point sees the same disturbance and jitter draws.
+#
+# ============================================================
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .campaign import NOMINAL, build_simulator
+from .controllers import FLIGHT_LAWS, flight_law
+from .metrics import BAND, summarize
+
+# Costs averaged by loop_rate_curve()
+COSTS = ("rms_error", "settling_time", "pulses", "gas_used", "time_in_band")
+
+# Default loop periods (s), 200 Hz down to 5 Hz
+PERIODS = np.geomspace(0.005, 0.2, 10)
+
+# (s) simulation step of the study, fine enough to place 5 ms ticks
+STUDY_DT = 0.001
+
+
+def measured_periods(paths, skip_first=True):
+    """
+    Loop periods logged by the flight scripts.
+
+    Reads the dt column of every log logs.load_log() recognizes, e.g. the
+    SD card logs (10_30_2025_test/log_*.csv) and the host serial logs.
+    Files it does not recognize are skipped.
+
+    :param paths: File paths or glob patterns
+    :param skip_first: Drop the first row of every log, which holds the
+        time since boot rather than a loop period
+    :return: 1-D array of periods (s)
+    """
+    from .logs import load_log
+
+    periods = []
+    for pattern in [paths] if isinstance(paths, str) else paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            try:
+                found = load_log(path)["dt"].to_numpy()
+            except ValueError:
+                continue
+            periods.extend(found[1:] if skip_first else found)
+    periods = np.asarray(periods, dtype=float)
+    return periods[np.isfinite(periods) & (periods > 0)]
+
+
+def draw_periods(period, jitter, size, rng):
+    """
+    Draw successive loop periods.
+
+    :param period: Mean loop period (s)
+    :param jitter: None for a fixed period, a fraction for a uniform
+        period in period * (1 +/- jitter), or an array of measured periods
+        whose shape is resampled and rescaled to the mean period
+    :param size: Number of periods
+    :param rng: numpy.random.Generator
+    """
+    if jitter is None:
+        return np.full(size, float(period))
+    if np.ndim(jitter) == 0:
+        return period * rng.uniform(1.0 - jitter, 1.0 + jitter, size)
+    measured = np.asarray(jitter, dtype=float)
+    return rng.choice(measured, size) * (period / measured.mean())
+
+
+def loop_ticks(periods, dt, n_steps):
+    """
+    Boolean (n_steps,) mask of the simulation steps a loop with the given
+    successive periods runs on. The first iteration runs at t = 0.
+    """
+    times = np.concatenate([[0.0], np.cumsum(periods)])
+    index = np.unique(np.rint(times / dt).astype(np.int64))
+    ticks = np.zeros(n_steps, dtype=bool)
+    ticks[index[index < n_steps]] = True
+    return ticks
+
+
+def run_point(law, params, period, jitter, n, seed, band=BAND):
+    """
+    Fly one chunk of one (law, period) point.
+
+    The chunk shares one jitter realization; the disturbances differ
+    per run.
+
+    :param seed: numpy.random.SeedSequence for this chunk
+    :return: Dict of column name -> (n,) array
+    """
+    jitter_seed, run_seed = seed.spawn(2)
+    dt = params["tf"] / params["n_steps"]
+    limit = int(np.ceil(params["tf"] / (period * 0.5))) + 1
+    periods = draw_periods(period, jitter, limit, np.random.default_rng(jitter_seed))
+    ticks = loop_ticks(periods, dt, int(params["n_steps"]))
+
+    sim = build_simulator(params, n, flight_law(law, params["setpoint"]))
+    result = sim.run(np.random.default_rng(run_seed), ticks=ticks)
+
+    rows = summarize(result, band)
+    # A run that never settles counts as settling at tf, so a slow loop
+    # that loses its hardest runs cannot look like it settles faster
+    rows["settled"] = np.isfinite(rows["settling_time"])
+    rows["settling_time"] = np.where(rows["settled"], rows["settling_time"], params["tf"])
+    rows["law"] = np.full(n, law)
+    rows["period"] = np.full(n, period)
+    rows["achieved_period"] = np.full(n, params["tf"] / ticks.sum())
+    return rows
+
+
+def latency_study(laws=None, periods=PERIODS, jitter=None, n_runs=200, seed=0, params=None,
+                  chunk_size=50, workers=None, band=BAND):
+    """
+    Fly every law at every loop period.
+
+    :param laws: Keys of controllers.FLIGHT_LAWS, defaults to all of them
+    :param periods: Mean loop periods (s)
+    :param jitter: See draw_periods(); pass measured_periods(...) to use
+        the jitter seen on the hardware
+    :param n_runs: Runs per (law, period) point
+    :param seed: Root seed (int or SeedSequence)
+    :param params: Overrides for the campaign.NOMINAL parameters. n_steps
+        defaults to a STUDY_DT step.
+    :param chunk_size: Runs per worker task
+    :param workers: Process count, defaults to os.cpu_count(). Use 1 to
+        run in this process.
+    :return: pandas DataFrame with one row per run
+    """
+    overrides = dict(params or {})
+    params = {**NOMINAL, **overrides}
+    if "n_steps" not in overrides:
+        params["n_steps"] = int(round(params["tf"] / STUDY_DT))
+    laws = list(FLIGHT_LAWS) if laws is None else list(laws)
+
+    sizes = [chunk_size] * (n_runs // chunk_size)
+    if n_runs % chunk_size:
+        sizes.append(n_runs % chunk_size)
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    seeds = root.spawn(len(sizes))
+
+    points = [(law, params, float(p), jitter, n, s, band)
+              for law in laws for p in periods for n, s in zip(sizes, seeds)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        chunks = [run_point(*point) for point in points]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_point, *point) for point in points]
+            chunks = [f.result() for f in futures]
+
+    import pandas as pd
+
+    table = pd.concat([pd.DataFrame(c) for c in chunks], ignore_index=True)
+    table.index.name = "run"
+    return table
+
+
+def loop_rate_curve(table):
+    """
+    Mean costs per law and loop rate (Hz), fastest rate first. Runs that
+    never settled count as settling at tf (see run_point()); settled is
+    the fraction that did.
+
+    :param table: Output of latency_study()
+    :return: pandas DataFrame indexed by (law, rate)
+    """
+    table = table.assign(rate=1.0 / table["period"])
+    curve = table.groupby(["law", "rate"])[list(COSTS) + ["settled"]].mean()
+    curve["achieved_rate"] = 1.0 / table.groupby(["law", "rate"])["achieved_period"].mean()
+    return curve.sort_index(level=["law", "rate"], ascending=[True, False])
+
+
+def required_rate(curve, cost="settling_time", tolerance=0.1):
+    """
+    Slowest loop rate per law whose cost (lower is better) stays within
+    tolerance of the law's cost at the fastest rate studied.
+
+    :param curve: Output of loop_rate_curve()
+    :param tolerance: Allowed relative degradation
+    :return: pandas Series of rate (Hz) indexed by law
+    """
+    def slowest(group):
+        group = group.droplevel("law")
+        best = group[cost].iloc[0]
+        within = group[cost] <= best + tolerance * abs(best)
+        # The rate must hold from the fastest rate down, not just somewhere
+        ok = within.cumprod().astype(bool)
+        return group.index[ok].min()
+
+    return curve.groupby(level="law").apply(slowest).rename("required_rate")
+
+
+if __name__ == "__main__":
+    import time
+
+    here = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    jitter = measured_periods(os.path.join(here, "10_30_2025_test", "log_*.csv"))
+    print(f"{jitter.size} logged loop periods, median {np.median(jitter) * 1000:.0f} ms, "
+          f"p95 {np.percentile(jitter, 95) * 1000:.0f} ms")
+
+    start = time.time()
+    table = latency_study(laws=["code", "stag"], n_runs=100, jitter=jitter)
+    curve = loop_rate_curve(table)
+    print(curve.to_string(float_format=lambda x: f"{x:.3f}"))
+    print(required_rate(curve).to_string())
+    print(f"{len(table)} runs in {time.time() - start:.1f} s")
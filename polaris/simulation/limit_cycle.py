@@ -0,0 +1,427 @@
+# ============================================================
+# Limit-cycle predictor for the deadzone / hysteresis flight laws
+#
+# Without disturbance, a bang-bang PD law with a deadzone
+# (code.py threshold 5, STAG THRESHOLD_ON/OFF 5/2) settles into a
+# symmetric limit cycle. Between events (threshold crossings, end of
+# the minimum pulse, a delayed thrust change arriving) the motion is
+# a coast or a constant-acceleration arc, so every event time is the
+# root of a quadratic. The Poincare map from one negative turn-on to
+# the next is flown event by event on arrays, and its fixed point
+# (the periodic orbit) is closed with Newton steps, for a whole gain
+# grid at once. A describing function estimate is given alongside
+# for comparison.
+#
+# Heading and switching lines are in degrees, like the flight code.
+#
+# ============================================================
+
+import numpy as np
+
+from .campaign import NOMINAL
+from .controllers import FLIGHT_LAWS, PulsePID
+from .engine import cylinder_inertia
+
+# Events followed per cycle before a point is declared sliding (Zeno
+# chattering on the switching line has no limit cycle)
+MAX_EVENTS = 48
+
+# Thrust changes that may be in flight through the delay at once
+QUEUE = 4
+
+# Plain cycles flown before the Newton steps, and Newton steps
+SETTLE_CYCLES = 6
+NEWTON_STEPS = 8
+
+# Bisection steps of the describing-function amplitude
+BISECTIONS = 60
+
+
+def acceleration(control_torque=None, inertia=None):
+    """
+    Thruster angular acceleration (deg/s^2) for the NOMINAL plant unless
+    control_torque (N*m) or inertia (kg*m^2) are given.
+    """
+    torque = NOMINAL["control_torque"] if control_torque is None else control_torque
+    inertia = cylinder_inertia(NOMINAL["M"], NOMINAL["R"]) if inertia is None else inertia
+    return np.degrees(np.asarray(torque, dtype=float) / inertia)
+
+
+def first_root(c0, c1, c2, after):
+    """
+    Smallest t > after with c2 * t^2 + c1 * t + c0 = 0, or inf.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        disc = c1 * c1 - 4.0 * c2 * c0
+        root = np.sqrt(np.where(disc >= 0, disc, np.nan))
+        # Stable quadratic formula; linear when c2 == 0
+        q = -0.5 * (c1 + np.copysign(root, c1))
+        t1 = np.where(c2 != 0, q / c2, -c0 / c1)
+        t2 = np.where(q != 0, c0 / q, np.inf)
+    t1 = np.where(np.isfinite(t1) & (t1 > after), t1, np.inf)
+    t2 = np.where(np.isfinite(t2) & (t2 > after) & (c2 != 0), t2, np.inf)
+    return np.minimum(t1, t2)
+
+
+class _Orbit:
+    """
+    Event-driven flight of the PD hysteresis law for a whole (flattened)
+    grid: between events the thrust is constant, so every switching time
+    is a quadratic root. The command logic is HysteresisPD's with the
+    effort written as -s, s = Kp * x + Kd * v; thrust follows the command
+    after delay. Points drop out of the working arrays as they finish
+    their cycle, so the slow ones do not hold up the rest.
+    """
+
+    # State and stats returned by cycle(); the pend_ entries are (QUEUE, N)
+    STATE = ("x", "v", "u", "pend_u", "pend_t")
+    STATS = ("period", "firing", "high", "low", "valid")
+
+    def __init__(self, Kp, Kd, on, off, min_pulse, delay, a, balance):
+        self.gains = (Kp, Kd, on, off, min_pulse, delay, a, a * balance)
+
+    def subset(self, keep):
+        orbit = _Orbit.__new__(_Orbit)
+        orbit.gains = tuple(gain[keep] for gain in self.gains)
+        return orbit
+
+    @staticmethod
+    def accel(u, a_pos, a_neg):
+        return np.where(u > 0, a_pos, np.where(u < 0, -a_neg, 0.0))
+
+    @staticmethod
+    def decide(s, cmd, on, off):
+        return np.where(s > on, -1, np.where(s < -on, 1, np.where(np.abs(s) < off, 0, cmd)))
+
+    def cycle(self, state):
+        """
+        Fly from one turn-on of the negative thruster command to the next.
+
+        :param state: Dict of x, v, u (thrust), pend_u, pend_t (queue of
+            QUEUE pending thrust changes and the time until each, inf for
+            a free slot, earliest first) at a negative turn-on
+        :return: (state at the next one, stats dict)
+        """
+        out = {name: np.array(state[name], dtype=float) for name in self.STATE}
+        out.update({name: np.zeros(out["x"].shape) for name in self.STATS})
+        out["valid"] = np.zeros(out["x"].shape, dtype=bool)
+
+        Kp, Kd, on, off, min_pulse, delay, a_pos, a_neg = self.gains
+        x, v, u, pend_u, pend_t = (out[name].copy() for name in self.STATE)
+        index = np.arange(x.size)
+        cmd = np.full(x.shape, -1)
+        age = np.zeros(x.shape)
+        time = np.zeros(x.shape)
+        firing = np.zeros(x.shape)
+        high, low = x.copy(), x.copy()
+        valid = np.ones(x.shape, dtype=bool)
+        slot = np.arange(QUEUE)[:, None]
+
+        for _ in range(MAX_EVENTS):
+            A = self.accel(u, a_pos, a_neg)
+            s = Kp * x + Kd * v
+            c1, c2 = Kp * v + Kd * A, 0.5 * Kp * A
+            held = (cmd != 0) & (age < min_pulse)
+
+            # Candidate events: pending thrust change, end of the minimum
+            # pulse, and crossings of the four threshold lines (the command
+            # only reacts to some of them, decide() sorts that out)
+            expiry = np.where(held, min_pulse - age, np.inf)
+            levels = np.stack([on, -on, off, -off])
+            crossing = np.where(held, np.inf, first_root(s - levels, c1, c2, 1e-12).min(axis=0))
+            dt = np.minimum.reduce([pend_t[0], expiry, crossing])
+            # A point with nothing left to happen rests inside the deadzone
+            todo = np.isfinite(dt)
+            valid &= todo
+
+            # Extremes of x inside the interval, then advance
+            peak = np.where(A != 0, -v / np.where(A != 0, A, 1.0), -1.0)
+            inside = todo & (peak > 0) & (peak < dt)
+            x_peak = x + v * peak + 0.5 * A * peak ** 2
+            dt = np.where(todo, dt, 0.0)
+            high = np.where(inside, np.maximum(high, x_peak), high)
+            low = np.where(inside, np.minimum(low, x_peak), low)
+            x = x + v * dt + 0.5 * A * dt ** 2
+            v = v + A * dt
+            high, low = np.maximum(high, x), np.minimum(low, x)
+            time += dt
+            firing += np.abs(u) * dt
+            age += dt
+            pend_t = pend_t - dt
+
+            # Apply the event(s) that fired
+            arrived = todo & (pend_t[0] <= 1e-12)
+            u = np.where(arrived, pend_u[0], u)
+            pend_u = np.where(arrived, np.roll(pend_u, -1, axis=0), pend_u)
+            pend_t = np.where(arrived & (slot < QUEUE - 1), np.roll(pend_t, -1, axis=0),
+                              np.where(arrived, np.inf, pend_t))
+
+            # Judge a crossing just past the line, in the direction of motion
+            s = Kp * x + Kd * v
+            slope = Kp * v + Kd * self.accel(u, a_pos, a_neg)
+            nudged = np.where(dt == crossing, s + 1e-9 * np.sign(slope), s)
+            new = np.where(todo & ((dt == crossing) | (dt == expiry)), self.decide(nudged, cmd, on, off), cmd)
+            changed = todo & (new != cmd)
+            now = changed & (delay <= 0)
+            u = np.where(now, new, u)
+            # Queue the change behind the ones already in flight
+            queued = np.isfinite(pend_t).sum(axis=0)
+            valid &= ~(changed & ~now & (queued >= QUEUE))
+            push = (changed & ~now) & (slot == np.minimum(queued, QUEUE - 1))
+            pend_u = np.where(push, new, pend_u)
+            pend_t = np.where(push, delay, pend_t)
+            age = np.where(changed & (new != 0), 0.0, age)
+            cmd = new
+
+            # Hand the finished points back and fly on with the rest
+            todo &= ~(changed & (new == -1))
+            if not todo.all():
+                finished = ~todo
+                for name, value in zip(self.STATE + self.STATS, (x, v, u, pend_u, pend_t,
+                                                                  time, firing, high, low, valid)):
+                    out[name][..., index[finished]] = value[..., finished]
+                x, v, u, pend_u, pend_t, time, firing, high, low, valid, cmd, age, index = (
+                    value[..., todo] for value in (x, v, u, pend_u, pend_t, time, firing, high, low,
+                                                   valid, cmd, age, index))
+                Kp, Kd, on, off, min_pulse, delay, a_pos, a_neg = (
+                    value[todo] for value in (Kp, Kd, on, off, min_pulse, delay, a_pos, a_neg))
+            if not index.size:
+                break
+
+        # Points still flying never closed their cycle (e.g. sliding)
+        for name, value in zip(self.STATE + self.STATS, (x, v, u, pend_u, pend_t, time, firing, high, low)):
+            out[name][..., index] = value
+        state = {name: out[name] for name in self.STATE}
+        return state, {name: out[name] for name in self.STATS}
+
+
+def limit_cycle(Kp, Kd, threshold_on=5.0, threshold_off=None, min_pulse=0.0, delay=0.0,
+                loop_period=0.0, control_torque=None, inertia=None, balance=1.0):
+    """
+    Periodic orbit of the PD deadzone law by shooting on the Poincare map
+    of the negative thruster's turn-on. Every argument may be an array;
+    they are broadcast together, so a whole gain grid is one call.
+
+    The orbit is flown for SETTLE_CYCLES cycles from the upper switching
+    line and then closed with Newton steps on the (x, v) fixed point.
+    Where the cycles form a neutral family (slope 1, e.g. every pulse
+    held to min_pulse), the member returned depends on that start.
+
+    :param Kp: Proportional gain (per degree), > 0
+    :param Kd: Derivative gain (per degree/s)
+    :param threshold_on: Effort that turns a thruster on
+    :param threshold_off: Effort below which it turns off (default: threshold_on)
+    :param min_pulse: Minimum thruster pulse (s)
+    :param delay: Command to thrust delay (s), e.g. valve latency
+    :param loop_period: Flight loop period (s); sampling adds half of it
+        to the delay
+    :param balance: Negative-side thrust relative to the positive side
+    :return: Dict of arrays: amplitude (deg, half peak-to-peak), offset
+        (deg), period (s), duty (thrust fraction of the time), slope
+        (largest Floquet multiplier magnitude; < 1 is a stable cycle) and
+        found. Points without a cycle (e.g. sliding on the switching line)
+        are NaN.
+    """
+    on = np.asarray(threshold_on, dtype=float)
+    off = on if threshold_off is None else np.asarray(threshold_off, dtype=float)
+    a = acceleration(control_torque, inertia)
+    delay = np.asarray(delay, dtype=float) + 0.5 * np.asarray(loop_period, dtype=float)
+    Kp, Kd, on, off, min_pulse, delay, a, balance = np.broadcast_arrays(
+        *(np.asarray(p, dtype=float) for p in (Kp, Kd, on, off, min_pulse, delay, a, balance)))
+    shape = Kp.shape
+    Kp, Kd, on, off, min_pulse, delay, a, balance = (
+        p.ravel() for p in (Kp, Kd, on, off, min_pulse, delay, a, balance))
+    orbit = _Orbit(Kp, Kd, on, off, min_pulse, delay, a, balance)
+
+    # Start just past the upper switching line, where the negative
+    # command turns on, drifting outwards: from rest, equal min_pulse
+    # impulses can stop the vehicle dead inside the hysteresis band
+    zero = np.zeros(Kp.shape)
+    v = np.where(Kd > 0, on / np.where(Kd > 0, 2 * Kd, 1.0), 0.0) + zero
+    pend_u, pend_t = np.zeros((QUEUE,) + Kp.shape), np.full((QUEUE,) + Kp.shape, np.inf)
+    pend_u[0], pend_t[0] = -1.0, np.where(delay > 0, delay, np.inf)
+    state = {"x": (on + 1e-9 - Kd * v) / Kp + zero, "v": v, "u": np.where(delay > 0, 0.0, -1.0),
+             "pend_u": pend_u, "pend_t": pend_t}
+
+    # Points that fail a cycle (no orbit) are dropped as they go
+    live = np.arange(Kp.size)
+    for _ in range(SETTLE_CYCLES):
+        state, stats = orbit.cycle(state)
+        keep = stats["valid"]
+        if not keep.all():
+            live, orbit = live[keep], orbit.subset(keep)
+            state = {name: value[..., keep] for name, value in state.items()}
+            Kp, Kd, on = Kp[keep], Kd[keep], on[keep]
+
+    def shoot(orbit, state, x, v):
+        mapped, stats = orbit.cycle(dict(state, x=x, v=v))
+        return mapped["x"] - x, mapped["v"] - v, stats
+
+    def jacobian(orbit, state, x, v, gx, gv):
+        # Forward differences of the map residual (J of g, the map's is J + I)
+        hx = 1e-7 * (1.0 + np.abs(x))
+        hv = 1e-7 * (1.0 + np.abs(v))
+        jxx, jvx = [(g - g0) / hx for g, g0 in zip(shoot(orbit, state, x + hx, v)[:2], (gx, gv))]
+        jxv, jvv = [(g - g0) / hv for g, g0 in zip(shoot(orbit, state, x, v + hv)[:2], (gx, gv))]
+        return jxx, jxv, jvx, jvv
+
+    def closure(gx, gv):
+        scale = on / Kp + 1e-9
+        return np.hypot(gx / scale, gv * np.maximum(Kd, 1e-3) / scale)
+
+    # Newton steps on the fixed point, for the points not yet closed
+    x, v = state["x"], state["v"]
+    gx, gv, stats = shoot(orbit, state, x, v)
+    for _ in range(NEWTON_STEPS):
+        unclosed = np.flatnonzero(stats["valid"] & (closure(gx, gv) > 1e-12))
+        if not unclosed.size:
+            break
+        sub = orbit.subset(unclosed)
+        base = {name: value[..., unclosed] for name, value in state.items()}
+        jxx, jxv, jvx, jvv = jacobian(sub, base, x[unclosed], v[unclosed], gx[unclosed], gv[unclosed])
+        det = jxx * jvv - jxv * jvx
+        ok = np.isfinite(det) & (det != 0)
+        det = np.where(ok, det, 1.0)
+        x[unclosed] = np.where(ok, x[unclosed] - (jvv * gx[unclosed] - jxv * gv[unclosed]) / det, x[unclosed])
+        v[unclosed] = np.where(ok, v[unclosed] - (-jvx * gx[unclosed] + jxx * gv[unclosed]) / det, v[unclosed])
+        gx[unclosed], gv[unclosed], moved = shoot(sub, base, x[unclosed], v[unclosed])
+        for name, value in moved.items():
+            stats[name][unclosed] = value
+
+    # Floquet multipliers: eigenvalues of the map's Jacobian (J + I)
+    jxx, jxv, jvx, jvv = jacobian(orbit, state, x, v, gx, gv)
+    trace = jxx + jvv + 2.0
+    det = (jxx + 1.0) * (jvv + 1.0) - jxv * jvx
+    disc = np.sqrt((trace * trace / 4.0 - det).astype(complex))
+    slope = np.maximum(np.abs(trace / 2.0 + disc), np.abs(trace / 2.0 - disc))
+
+    found = stats["valid"] & (closure(gx, gv) < 1e-6) & (stats["period"] > 0) & (stats["firing"] > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        duty = stats["firing"] / stats["period"]
+    result = {
+        "amplitude": 0.5 * (stats["high"] - stats["low"]),
+        "offset": 0.5 * (stats["high"] + stats["low"]),
+        "period": stats["period"],
+        "duty": duty,
+        "slope": slope,
+    }
+    full = {}
+    for name, value in result.items():
+        full[name] = np.full(int(np.prod(shape)), np.nan)
+        full[name][live] = np.where(found, value, np.nan)
+        full[name] = full[name].reshape(shape)
+    full["found"] = np.zeros(int(np.prod(shape)), dtype=bool)
+    full["found"][live] = found
+    full["found"] = full["found"].reshape(shape)
+    return full
+
+
+def describing_function(Kp, Kd, threshold_on=5.0, threshold_off=None, delay=0.0, loop_period=0.0,
+                        control_torque=None, inertia=None, n_amplitudes=256):
+    """
+    Describing-function estimate of the same limit cycle (symmetric
+    thrust, no minimum pulse).
+
+    The relay with deadzone and hysteresis acts on s = Kp * x + Kd * v.
+    For each trial amplitude of s the magnitude balance gives the
+    frequency in closed form; the phase balance is then solved by a scan
+    and bisection over the amplitude. The largest-amplitude solution
+    (the stable one) is returned. A PD loop often has enough phase lead
+    that the first harmonic predicts no cycle at all; the cycles seen
+    there come from the minimum pulse and the delay, which only
+    limit_cycle() resolves.
+
+    :return: Dict of arrays: amplitude (deg of heading), period (s), found
+    """
+    on = np.asarray(threshold_on, dtype=float)
+    off = on if threshold_off is None else np.asarray(threshold_off, dtype=float)
+    c = acceleration(control_torque, inertia)
+    Kp, Kd, on, off, delay, c = np.broadcast_arrays(
+        *(np.asarray(p, dtype=float) for p in (Kp, Kd, on, off,
+                                               np.asarray(delay) + 0.5 * np.asarray(loop_period), c)))
+
+    def balance(A, Kp, Kd, on, off, delay, c):
+        # Relay with deadzone on/off and unit output, input amplitude A
+        real = (np.sqrt(np.clip(1 - (off / A) ** 2, 0, None))
+                + np.sqrt(np.clip(1 - (on / A) ** 2, 0, None))) * 2.0 / (np.pi * A)
+        imag = 2.0 * (on - off) / (np.pi * A ** 2)
+        gain = np.hypot(real, imag)
+        # Magnitude: c * |Kp + j Kd w| / w^2 = 1 / |N|, a quadratic in w^2
+        need = 1.0 / gain
+        w2 = (c ** 2 * Kd ** 2 + np.sqrt(c ** 4 * Kd ** 4 + 4 * need ** 2 * c ** 2 * Kp ** 2)) / (2 * need ** 2)
+        w = np.sqrt(w2)
+        # Phase: the loop's lead from Kd minus the delay lag must match
+        # the relay's hysteresis lag
+        return np.arctan2(Kd * w, Kp) - w * delay - np.arctan2(imag, real), w
+
+    scale = np.maximum(on, 1e-3)[..., None]
+    grid = scale * np.geomspace(1.0 + 1e-9, 1e4, n_amplitudes)
+    phase, _ = balance(grid, *(p[..., None] for p in (Kp, Kd, on, off, delay, c)))
+    sign = np.sign(phase)
+    crossing = (sign[..., :-1] <= 0) & (sign[..., 1:] > 0)
+    # Last (largest amplitude) crossing from lagging to leading
+    has = crossing.any(axis=-1)
+    k = n_amplitudes - 2 - np.argmax(crossing[..., ::-1], axis=-1)
+    low = np.take_along_axis(grid, k[..., None], axis=-1)[..., 0]
+    high = np.take_along_axis(grid, k[..., None] + 1, axis=-1)[..., 0]
+
+    for _ in range(BISECTIONS):
+        middle = np.sqrt(low * high)
+        ahead = balance(middle, Kp, Kd, on, off, delay, c)[0] > 0
+        low = np.where(ahead, low, middle)
+        high = np.where(ahead, middle, high)
+    A = np.sqrt(low * high)
+    _, w = balance(A, Kp, Kd, on, off, delay, c)
+
+    return {
+        "amplitude": np.where(has, A / np.hypot(Kp, Kd * w), np.nan),
+        "period": np.where(has, 2.0 * np.pi / w, np.nan),
+        "found": has,
+    }
+
+
+def law_parameters(law, **overrides):
+    """
+    limit_cycle() keyword arguments for a controllers.FLIGHT_LAWS entry.
+    The low-pass filter and latch of the filter laws are not modelled.
+
+    :raises ValueError: A PulsePID law, whose deadzone is on the error
+    """
+    cls, gains = FLIGHT_LAWS[law]
+    if cls is PulsePID:
+        raise ValueError(f"Law '{law}' has its deadzone on the heading error; limit_cycle() needs an output deadzone")
+    gains = {**gains, **overrides}
+    params = {"Kp": gains["Kp"], "Kd": gains["Kd"]}
+    if "threshold_on" in gains:
+        params["threshold_on"] = gains["threshold_on"]
+        params["threshold_off"] = gains["threshold_off"]
+        params["min_pulse"] = gains.get("min_pulse", 0) / 1000.0
+    else:
+        params["threshold_on"] = gains.get("threshold", 0.0)
+    return params
+
+
+if __name__ == "__main__":
+    import time
+
+    for law in ("code", "stag"):
+        for delay in (0.0, 0.02, 0.05):
+            cycle = limit_cycle(**law_parameters(law), delay=delay)
+            estimate = describing_function(**{k: v for k, v in law_parameters(law).items() if k != "min_pulse"},
+                                           delay=delay)
+            line = f"{law:>5}, delay {delay * 1000:3.0f} ms: "
+            if cycle["found"]:
+                line += (f"+/- {cycle['amplitude']:.3f} deg every {cycle['period']:.3f} s, "
+                         f"duty {cycle['duty']:.3f}, multiplier {cycle['slope']:.2f}")
+            else:
+                line += "no limit cycle"
+            if estimate["found"]:
+                line += f" (describing function: +/- {estimate['amplitude']:.3f} deg every {estimate['period']:.3f} s)"
+            print(line)
+
+    Kp, Kd = np.meshgrid(np.linspace(0.2, 2.0, 200), np.linspace(0.1, 1.5, 200))
+    start = time.perf_counter()
+    grid = limit_cycle(Kp, Kd, 5.0, 2.0, min_pulse=0.05, delay=0.02)
+    elapsed = time.perf_counter() - start
+    print(f"STAG {Kp.size} point gain grid in {elapsed * 1000:.0f} ms "
+          f"({elapsed / Kp.size * 1e6:.1f} us per point), {grid['found'].mean():.0%} with a cycle")
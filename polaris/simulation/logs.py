@@ -0,0 +1,455 @@
+# ============================================================
+# Log dialect registry for the GNC Hapsis flight and bench logs
+#
+# Every script that ever wrote a log picked its own CSV shape: the
+# code.py SD log, integrationTest.py's with an I column, the square
+# wave test with a preamble line, 9-21-test.py's BMI160 logs in raw
+# counts (some with a row one field shorter than the header), the
+# PID_boiled bench logs, STAG's flight_log_N.csv and the host serial
+# captures with a "[timestamp] " prefix. A Dialect says how to
+# recognise one from its first lines and how its fields map onto one
+# set of canonical columns and units (UNITS). read_log() fingerprints
+# the file, keeps the lines with the dialect's field count in one
+# pass over the bytes (corrupt SD lines drop out there) and parses
+# them with a single read_csv call.
+#
+# load_log() puts a sidecar cache in front of read_log(): the parsed
+# columns go to .polaris-cache/<log name>/ next to the log, one .npy
+# per column plus a JSON manifest, and later loads memory-map them.
+# The manifest records the log's size and mtime and a hash of this
+# module, so an edited log or parser is parsed again.
+#
+# ============================================================
+
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+
+# (rad/s per count) BMI160 gyro at the driver's default +/-250 deg/s range
+BMI160_GYRO = np.radians(250.0 / 32768)
+
+# (m/s^2 per count) BMI160 accelerometer at the default +/-2 g range
+BMI160_ACCEL = 2.0 * 9.80665 / 32768
+
+# Canonical columns and their units. Valve columns are 1 while the valve
+# is open; pos/neg is the torque they give (left is positive everywhere).
+UNITS = {
+    "t": "s",
+    "dt": "s",
+    "host_time": "datetime64",
+    "heading": "deg",
+    "roll": "deg",
+    "pitch": "deg",
+    "gyro_x": "rad/s",
+    "gyro_y": "rad/s",
+    "gyro_z": "rad/s",
+    "accel_x": "m/s^2",
+    "accel_y": "m/s^2",
+    "accel_z": "m/s^2",
+    "thrust_pos": "",
+    "thrust_neg": "",
+    "valve": "",
+    "output": "",
+    "error": "deg",
+    "integral": "deg*s",
+    "derivative": "deg/s",
+    "temperature": "degC",
+    "pressure": "Pa",
+    "altitude": "m",
+    "vertical_accel": "m/s^2",
+    "vertical_vel": "m/s",
+    "state": "",
+}
+
+# Valve and mission state columns are small integers / categories
+FLAGS = ("thrust_pos", "thrust_neg", "valve")
+
+# Lines read to fingerprint a file
+HEAD_LINES = 64
+
+# Sidecar cache directory, created next to the logs
+CACHE_DIR = ".polaris-cache"
+
+
+class Dialect:
+    """
+    One CSV shape and its mapping onto the canonical columns.
+    """
+
+    def __init__(self, name, columns, header=None, preamble=0, timestamped=False, scale=None,
+                 active_low=(), text=(), source=""):
+        """
+        :param name: Registry key
+        :param columns: Canonical name per data field, None to drop it. A
+            log without t gets the running sum of dt, and the other way
+            round (the first dt is then 0).
+        :param header: Field names of the header line, None when there is none
+        :param preamble: Lines before the header
+        :param timestamped: Data lines carry the host serial logger's
+            "[YYYY-mm-dd HH:MM:SS.fff] " prefix; it becomes host_time, and
+            lines without it (prints, errors) are skipped
+        :param scale: Dict of column -> factor to the canonical unit
+        :param active_low: Columns holding relay levels, 0 meaning open
+        :param text: Columns kept as strings (mission state)
+        :param source: Script that writes this shape
+        """
+        self.name = name
+        self.columns = list(columns)
+        self.header = None if header is None else [field.strip() for field in header]
+        self.preamble = preamble
+        self.timestamped = timestamped
+        self.scale = dict(scale or {})
+        self.active_low = tuple(active_low)
+        self.text = tuple(text)
+        self.source = source
+
+    @property
+    def fields(self):
+        return len(self.columns)
+
+    def matches(self, lines):
+        """
+        Whether the first lines of a file (decoded, newlines stripped) look
+        like this dialect: same header, and data rows with this many fields
+        (lines with a single field, i.e. bare prints, are ignored). A log
+        with a matching header and no rows yet matches.
+        """
+        if self.timestamped:
+            rows = [line.partition("] ")[2] for line in lines if line.startswith("[") and "] " in line]
+        else:
+            if self.header is not None:
+                if len(lines) <= self.preamble or split(lines[self.preamble]) != self.header:
+                    return False
+                rows = lines[self.preamble + 1:]
+            else:
+                rows = lines
+        counts = [row.count(",") + 1 for row in rows if "," in row][:16]
+        if not counts:
+            return self.header is not None
+        return max(set(counts), key=counts.count) == self.fields
+
+
+def split(line):
+    return [field.strip() for field in line.split(",")]
+
+
+CODE = ["dt", "heading", "thrust_neg", "thrust_pos", "gyro_x", "gyro_y", "gyro_z", "output", "error"]
+NOZZLE = ["gyro_x", "gyro_y", "gyro_z", "accel_x", "accel_y", "accel_z"]
+BMI160 = {**{name: BMI160_GYRO for name in NOZZLE[:3]}, **{name: BMI160_ACCEL for name in NOZZLE[3:]}}
+STAG = ["t", "temperature", "pressure", "altitude", "roll", "pitch", "heading", "vertical_accel"]
+STAG_END = ["thrust_pos", "thrust_neg", "state"]
+
+DIALECTS = {}
+
+
+def register_dialect(dialect):
+    """
+    Add a Dialect to DIALECTS. detect() tries them in registration order.
+    """
+    DIALECTS[dialect.name] = dialect
+    return dialect
+
+
+register_dialect(Dialect(
+    "code", CODE + ["derivative"],
+    header="Time,Angular Position,R Solenoid,L Solenoid,Angular Vel X,Angular Vel Y,Angular Vel Z,"
+           "PID Error,P,D".split(","),
+    source="polaris/code.py"))
+register_dialect(Dialect(
+    "integration", CODE + ["integral", "derivative"],
+    header="Time,Angular Position,R Solenoid,L Solenoid,Angular Vel X,Angular Vel Y,Angular Vel Z,"
+           "PID Error,P,I,D".split(","),
+    source="polaris/RP2040_files/integrationTest.py"))
+register_dialect(Dialect(
+    "square-wave", ["t"] + CODE,
+    header="Time,DeltaT,Angular Position,R Solenoid,L Solenoid,Angular Vel X,Angular Vel Y,Angular Vel Z,"
+           "PID Error,P".split(","),
+    preamble=1, source="polaris/tests/11-12-test/martian_square_wave.py"))
+register_dialect(Dialect(
+    "serial", CODE + ["derivative"], timestamped=True,
+    source="polaris/tests/11-12-test/serial_connect.py (code.py over USB)"))
+# 9-21-test.py: relay 1 is the left valve. The earliest left/right runs
+# logged only the valve under test, one field fewer than the header.
+register_dialect(Dialect(
+    "nozzle", ["thrust_pos", "thrust_neg", "t"] + NOZZLE,
+    header="Nozzle 1 state,Nozzle 2 state,Time,Gyro X,Gyro Y,Gyro Z,Accel X,Accel Y,Accel Z".split(","),
+    scale=BMI160, active_low=("thrust_pos", "thrust_neg"), source="polaris/misc_scripts/9-21-test.py"))
+register_dialect(Dialect(
+    "nozzle-single", ["valve", "t"] + NOZZLE,
+    header="Nozzle 1 state,Nozzle 2 state,Time,Gyro X,Gyro Y,Gyro Z,Accel X,Accel Y,Accel Z".split(","),
+    scale=BMI160, active_low=("valve",), source="polaris/misc_scripts/9-21-test.py"))
+# PID_boiled.py: relay 1 is GPIO 15, the right valve of 9-21-test.py
+register_dialect(Dialect(
+    "pid-boiled", ["thrust_neg", "thrust_pos", "t", "gyro_y"],
+    header="Nozzle 1 state,Nozzle 2 state,Time,Vel Y".split(","),
+    scale={"gyro_y": BMI160_GYRO}, active_low=("thrust_neg", "thrust_pos"),
+    source="polaris/misc_scripts/PID_boiled.py"))
+register_dialect(Dialect(
+    "stag", STAG + ["vertical_vel"] + STAG_END,
+    header="Timestamp,Temperature,Pressure,Altitude,Roll,Pitch,Heading,VerticalAccel,VerticalVel,"
+           "LeftThruster,RightThruster,MissionState".split(","),
+    scale={"t": 1e-3}, text=("state",), source="STAG/flight_controller_v3/src/Logging.cpp"))
+register_dialect(Dialect(
+    "stag-v2", STAG + STAG_END,
+    header="Timestamp,Temperature,Pressure,Altitude,Roll,Pitch,Heading,VerticalAccel,"
+           "LeftThruster,RightThruster,MissionState".split(","),
+    scale={"t": 1e-3}, text=("state",), source="STAG/flight_controller_v2/src/Logging.cpp"))
+
+
+def head(path, n=HEAD_LINES):
+    with open(path, "rb") as file:
+        return file.read(65536).decode("latin-1").splitlines()[:n]
+
+
+def detect(path):
+    """
+    Dialect of a log file, from its first HEAD_LINES lines.
+
+    :raises ValueError: No registered dialect matches
+    """
+    lines = head(path)
+    for dialect in DIALECTS.values():
+        if dialect.matches(lines):
+            return dialect
+    raise ValueError(f"Unrecognized log format: {path}")
+
+
+def data_rows(raw, dialect):
+    """
+    Bytes of the data rows of a whole file: lines past the header with
+    exactly dialect.fields fields. For timestamped dialects, only lines
+    with the "[timestamp] " prefix, which is rewritten as a leading field.
+
+    :param raw: Writable uint8 array of the file, ending in a newline
+    """
+    ends = np.flatnonzero(raw == ord("\n"))
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    commas = np.flatnonzero(raw == ord(","))
+    keep = np.searchsorted(commas, ends) - np.searchsorted(commas, starts) == dialect.fields - 1
+    if dialect.header is not None:
+        keep[:dialect.preamble + 1] = False
+
+    if dialect.timestamped:
+        brackets = np.flatnonzero(raw == ord("]"))
+        close = np.append(brackets, raw.size)[np.searchsorted(brackets, starts)]
+        after = raw[np.minimum(close + 1, raw.size - 1)]
+        keep &= (raw[starts] == ord("[")) & (close < ends) & (after == ord(" "))
+        raw[close[keep]] = ord(",")
+
+    mask = np.repeat(keep, ends - starts + 1)
+    if dialect.timestamped:
+        mask[starts[keep]] = False
+        mask[close[keep] + 1] = False
+    return raw[mask]
+
+
+def read_log(path, dialect=None):
+    """
+    Read any registered log shape into canonical columns.
+
+    Rows with a field that does not parse (corrupt SD writes, repeated
+    headers) are dropped. The frame's attrs hold the dialect name, the
+    units of its columns and the preamble lines.
+
+    :param path: Log file
+    :param dialect: Dialect or DIALECTS key, detected when None
+    :return: pandas DataFrame with t, dt and the dialect's canonical columns
+    """
+    import pandas as pd
+
+    if dialect is None:
+        dialect = detect(path)
+    elif isinstance(dialect, str):
+        if dialect not in DIALECTS:
+            raise KeyError(f"Unknown log dialect '{dialect}', expected one of {sorted(DIALECTS)}")
+        dialect = DIALECTS[dialect]
+
+    raw = np.fromfile(path, dtype=np.uint8)
+    if raw.size and raw[-1] != ord("\n"):
+        raw = np.append(raw, np.uint8(ord("\n")))
+    fields = [name or f"unused_{k}" for k, name in enumerate(dialect.columns)]
+    names = (["host_time"] if dialect.timestamped else []) + fields
+    text = (("host_time",) if dialect.timestamped else ()) + dialect.text
+    rows = data_rows(raw, dialect) if raw.size else raw
+    if rows.size:
+        frame = pd.read_csv(io.BytesIO(rows), header=None, names=names, skipinitialspace=True,
+                            encoding="latin-1", dtype={name: str for name in text})
+    else:
+        frame = pd.DataFrame({name: pd.Series(dtype=str if name in text else float) for name in names})
+
+    # One coercion pass over the columns that caught a malformed value
+    numeric = [name for name in fields if name not in text]
+    for name in numeric:
+        if not pd.api.types.is_float_dtype(frame[name]):
+            frame[name] = pd.to_numeric(frame[name], errors="coerce").astype(float)
+    frame = frame[frame[numeric].notna().all(axis=1).to_numpy()]
+    frame = frame.drop(columns=[name for name in names if name.startswith("unused_")]).reset_index(drop=True)
+
+    for name, factor in dialect.scale.items():
+        frame[name] = frame[name] * factor
+    for name in FLAGS:
+        if name in frame:
+            level = frame[name].to_numpy()
+            frame[name] = ((level == 0) if name in dialect.active_low else (level != 0)).astype(np.int8)
+    if "state" in frame:
+        from .mission import STATES
+
+        frame["state"] = pd.Categorical(frame["state"].str.strip(), categories=list(STATES) + ["UNKNOWN"])
+    if "host_time" in frame:
+        frame["host_time"] = pd.to_datetime(frame["host_time"], format="%Y-%m-%d %H:%M:%S.%f", errors="coerce")
+
+    if "t" not in frame:
+        frame.insert(0, "t", frame["dt"].cumsum())
+    if "dt" not in frame:
+        frame.insert(1, "dt", frame["t"].diff().fillna(0.0))
+    frame = frame[["t", "dt"] + [name for name in frame.columns if name not in ("t", "dt")]]
+
+    frame.attrs["dialect"] = dialect.name
+    frame.attrs["units"] = {name: UNITS[name] for name in frame.columns if name in UNITS}
+    frame.attrs["preamble"] = head(path, dialect.preamble) if dialect.preamble else []
+    return frame
+
+
+_parser_version = None
+
+
+def parser_version():
+    """
+    SHA-256 of this module's source, stored in every cache manifest.
+    """
+    global _parser_version
+    if _parser_version is None:
+        with open(os.path.abspath(__file__), "rb") as file:
+            _parser_version = hashlib.sha256(file.read()).hexdigest()
+    return _parser_version
+
+
+def cache_path(path):
+    """
+    Sidecar cache directory of a log file.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIR, name)
+
+
+def _source(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "parser": parser_version()}
+
+
+def _read_cache(path, dialect):
+    # Memory-mapped frame, or None when the cache is missing or stale
+    import pandas as pd
+
+    directory = cache_path(path)
+    try:
+        with open(os.path.join(directory, "manifest.json")) as file:
+            manifest = json.load(file)
+        if manifest["source"] != _source(path):
+            return None
+        if dialect is not None and manifest["attrs"]["dialect"] != dialect:
+            return None
+        columns = {}
+        for column in manifest["columns"]:
+            data = np.load(os.path.join(directory, column["name"] + ".npy"), mmap_mode="r").view(np.ndarray)
+            if len(data) != manifest["rows"]:
+                return None
+            if "categories" in column:
+                data = pd.Categorical.from_codes(data, categories=column["categories"])
+            columns[column["name"]] = data
+    except (OSError, ValueError, KeyError):
+        return None
+    frame = pd.DataFrame(columns, copy=False)
+    frame.attrs.update(manifest["attrs"])
+    return frame
+
+
+def _write_cache(path, frame, source):
+    # The manifest is removed first and written last, and every file is
+    # renamed into place, so a reader never pairs it with other columns
+    import pandas as pd
+
+    directory = cache_path(path)
+    os.makedirs(directory, exist_ok=True)
+    manifest = os.path.join(directory, "manifest.json")
+    if os.path.exists(manifest):
+        os.unlink(manifest)
+    columns = []
+    for name in frame.columns:
+        series = frame[name]
+        column = {"name": name}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            column["categories"] = [str(c) for c in series.cat.categories]
+            data = series.cat.codes.to_numpy()
+        else:
+            data = series.to_numpy()
+        with open(os.path.join(directory, name + ".npy.tmp"), "wb") as file:
+            np.save(file, data)
+        os.replace(os.path.join(directory, name + ".npy.tmp"), os.path.join(directory, name + ".npy"))
+        columns.append(column)
+    text = json.dumps({"source": source, "rows": len(frame), "columns": columns, "attrs": frame.attrs})
+    with open(manifest + ".tmp", "w") as file:
+        file.write(text)
+    os.replace(manifest + ".tmp", manifest)
+
+
+def load_log(path, dialect=None, cache=True):
+    """
+    read_log() through the sidecar cache.
+
+    The first load parses the log and writes its columns to cache_path();
+    later loads memory-map them until the log or this module changes. The
+    returned columns are then read-only. A log in a read-only directory,
+    or read with a dialect other than the detected one, is just parsed.
+
+    :param path: Log file
+    :param dialect: Dialect or DIALECTS key, detected when None
+    :param cache: False to bypass the cache
+    :return: pandas DataFrame as read_log()
+    """
+    if not cache:
+        return read_log(path, dialect)
+    name = dialect.name if isinstance(dialect, Dialect) else dialect
+    frame = _read_cache(path, name)
+    if frame is not None:
+        return frame
+    source = _source(path)
+    frame = read_log(path, dialect)
+    if dialect is not None:
+        # Only the detected dialect is cached, a forced one is a one-off
+        try:
+            if detect(path).name != frame.attrs["dialect"]:
+                return frame
+        except ValueError:
+            return frame
+    try:
+        _write_cache(path, frame, source)
+    except OSError:
+        pass
+    return frame
+
+
+if __name__ == "__main__":
+    import glob
+    import time
+
+    here = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    patterns = ["10_30_2025_test/*.csv", "polaris/tests/test_data/*.csv", "polaris/tests/11-11-test/*.csv",
+                "polaris/tests/11-12-test/serial_logs/*"]
+    paths = [path for pattern in patterns for path in sorted(glob.glob(os.path.join(here, pattern)))]
+    for attempt in ("parse", "cached"):
+        start = time.perf_counter()
+        found = {}
+        for path in paths:
+            try:
+                frame = load_log(path)
+            except ValueError:
+                found.setdefault("unrecognized", []).append(0)
+                continue
+            found.setdefault(frame.attrs["dialect"], []).append(len(frame))
+        print(f"{attempt}: {len(paths)} files in {time.perf_counter() - start:.3f} s")
+    for name, sizes in found.items():
+        print(f"{name:>14}: {len(sizes):3d} files, {sum(sizes):7d} rows")
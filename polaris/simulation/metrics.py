@@ -0,0 +1,116 @@
+# ============================================================
+# Performance metrics for batched rotation runs
+#
+# Every function takes (N, n_steps) arrays and returns one value
+# per batch member.
+#
+# ============================================================
+
+import numpy as np
+
+# Half-width of the heading band drawn in main.py (5 degrees)
+BAND = 5 * (np.pi / 180)
+
+
+def heading_error(result):
+    """
+    Signed heading error (setpoint - theta) for every sample, in radians.
+
+    Wrapped to [-pi, pi] like the flight code, so a controller that settles
+    a full turn away from the setpoint still counts as on target. The
+    setpoint is either one per member (N,) or one per sample (N, n_steps).
+    """
+    setpoint = np.asarray(result.setpoint)
+    if setpoint.ndim == 1:
+        setpoint = setpoint[:, None]
+    error = setpoint - result.theta
+    return error - 2 * np.pi * np.round(error / (2 * np.pi))
+
+
+def settling_time(result, band=BAND):
+    """
+    Time after which the heading stays inside +/- band for the rest of the run.
+
+    Members that are still outside the band on the last sample get NaN.
+    """
+    outside = np.abs(heading_error(result)) > band
+    steps = outside.shape[1]
+
+    # Index of the last sample outside the band (-1 when never outside)
+    last_outside = steps - 1 - np.argmax(outside[:, ::-1], axis=1)
+    last_outside = np.where(outside.any(axis=1), last_outside, -1)
+
+    settled = last_outside < steps - 1
+    index = np.clip(last_outside + 1, 0, steps - 1)
+    return np.where(settled, result.t[index], np.nan)
+
+
+def overshoot(result):
+    """
+    Largest excursion past the setpoint, measured away from the start (rad).
+    """
+    # Follow the error continuously from the final heading, so the approach
+    # side is the one the heading actually came from
+    error = np.unwrap(heading_error(result), axis=1)
+    error = error - 2 * np.pi * np.round(error[:, -1:] / (2 * np.pi))
+    approach = np.sign(error[:, 0])
+    approach = np.where(approach == 0, 1.0, approach)
+    return np.clip((-error * approach[:, None]).max(axis=1), 0.0, None)
+
+
+def time_in_band(result, band=BAND):
+    """
+    Total time spent inside +/- band (s).
+    """
+    inside = np.abs(heading_error(result)) <= band
+    return inside.sum(axis=1) * result.dt
+
+
+def thruster_duty(result):
+    """
+    Fraction of samples with either thruster firing. While sliding the
+    command is fractional, so it counts as its equivalent duty cycle.
+    Counts the thrust the valves delivered (result.applied), not the
+    command.
+    """
+    return np.abs(result.applied).mean(axis=1)
+
+
+def rms_error(result):
+    """
+    Root-mean-square heading error over the whole run (rad).
+    """
+    return np.sqrt(np.mean(heading_error(result) ** 2, axis=1))
+
+
+def pulse_count(result):
+    """
+    Number of thruster firings: every change to a nonzero delivered thrust.
+    """
+    u = np.sign(result.applied)
+    start = u[:, :1] != 0
+    fired = (u[:, 1:] != 0) & (u[:, 1:] != u[:, :-1])
+    return start.sum(axis=1) + fired.sum(axis=1)
+
+
+def gas_used(result):
+    """
+    Total thruster on-time (s) the valves delivered. Gas mass is this times
+    the nozzle flow rate.
+    """
+    return np.abs(result.applied).sum(axis=1) * result.dt
+
+
+def summarize(result, band=BAND):
+    """
+    Collect the standard metrics for a batch into a dict of (N,) arrays.
+    """
+    return {
+        "settling_time": settling_time(result, band),
+        "overshoot": overshoot(result),
+        "time_in_band": time_in_band(result, band),
+        "thruster_duty": thruster_duty(result),
+        "rms_error": rms_error(result),
+        "pulses": pulse_count(result),
+        "gas_used": gas_used(result),
+    }
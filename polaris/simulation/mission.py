@@ -0,0 +1,348 @@
+# ============================================================
+# Vectorized 1-DOF ascent and mission-state model of STAG main.cpp
+#
+# Flies thousands of noisy barometric ascent profiles through the
+# STAG v3 loop logic: BMP3XX altitude (noise, base-altitude error,
+# IIR filter), getVerticalVelocity() (EMA, tau = 0.75 s) and the
+# GROUND -> ARMED -> ASCENT -> GNC_ACTIVE -> PYRO_FIRED -> DESCENT
+# -> LANDED state machine with the thresholds from Config.h.
+#
+# Every transition is either a fixed delay or the first 10 ms tick
+# at which a condition holds, so a chunk of runs is computed as
+# (N, n_ticks) arrays and first-index searches instead of a
+# Python loop over ticks. Reports GNC activation timing and false
+# triggers, so a Config.h change is checked in seconds.
+#
+# ============================================================
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .campaign import draw_parameters
+
+# STAG flight_controller_v3/src/Config.h, read by read_config()
+CONFIG_H = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "STAG",
+                        "flight_controller_v3", "src", "Config.h")
+
+# Config.h values used by the model, as of flight_controller_v3
+CONFIG = {
+    "LOOP_PERIOD": 10,  # (ms)
+    "ABORT_FIRE_PYRO_TIME": 10000,  # (ms) ASCENT time after which GNC starts anyway
+    "GNC_TIME": 30000,  # (ms)
+    "TARGET_ALTITUDE": 250.0,  # (m)
+    "GNC_ACTIVATION_VELOCITY": 1.0,  # (m/s)
+    "ALTITUDE_LANDING_THRESHOLD": 50.0,  # (m)
+    "LANDING_VELOCITY_THRESHOLD": 0.1,  # (m/s)
+}
+
+STATES = ("GROUND", "ARMED", "ASCENT", "GNC_ACTIVE", "PYRO_FIRED", "DESCENT", "LANDED")
+
+# firePyros(): time between charges (ms) and the velocity that ends the sequence early
+PYRO_INTERVAL = 5000
+PYRO_VELOCITY = -1.0
+
+# How GNC_ACTIVE was entered (gnc_cause column)
+CAUSES = ("none", "altitude", "timeout")
+
+# Flight and sensor parameters
+NOMINAL = {
+    "hold": 5.0,  # (s) on the pad before liftoff
+    "burn_time": 3.0,  # (s)
+    "accel": 60.0,  # (m/s^2) boost acceleration
+    "descent_rate": 15.0,  # (m/s) under the parachute
+    "arm_time": 1.0,  # (s) ARM command sent
+    "launch_time": 2.0,  # (s) LAUNCH command sent
+    "baro_noise": 0.5,  # (m) 1-sigma altitude noise per reading
+    "base_noise": 0.3,  # (m) 1-sigma error of baseAlt, taken at power-up
+    "iir": 3,  # BMP3_IIR_FILTER_COEFF_3
+    "spike_rate": 0.0,  # probability of a glitched reading
+    "spike": 50.0,  # (m) size of a glitch
+    "tf": 200.0,  # (s)
+}
+
+
+def read_config(path=CONFIG_H):
+    """
+    Numeric #defines of a STAG Config.h, falling back to CONFIG.
+
+    :return: Dict of name -> value for the keys of CONFIG
+    """
+    config = dict(CONFIG)
+    try:
+        with open(path) as file:
+            text = file.read()
+    except OSError:
+        return config
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.DOTALL)
+    for name, value in re.findall(r"^\s*#define\s+(\w+)\s+([-+.\d]+)", text, re.MULTILINE):
+        if name in config:
+            config[name] = type(config[name])(float(value))
+    return config
+
+
+def ascent_profile(t, hold=2.0, burn_time=3.0, accel=60.0, descent_rate=6.0, g=9.81):
+    """
+    Altitude (m) of a simple flight: on the pad for hold seconds, constant
+    acceleration boost, ballistic coast to apogee, then a constant-rate
+    descent under the parachute.
+
+    :param t: Time (s), scalar or array. The other parameters broadcast
+        against it, so (N, 1) parameters and a (n_ticks,) t give (N, n_ticks).
+    :return: Altitude
+    """
+    t = np.asarray(t, dtype=float)
+    since = np.clip(t - hold, 0.0, None)
+    burnout_speed = accel * burn_time
+    burnout_alt = 0.5 * accel * burn_time ** 2
+    coast_time = burnout_speed / g
+
+    boost = 0.5 * accel * np.minimum(since, burn_time) ** 2
+    coast = np.clip(since - burn_time, 0.0, coast_time)
+    descent = np.clip(since - burn_time - coast_time, 0.0, None)
+    altitude = np.where(since <= burn_time, boost,
+                        burnout_alt + burnout_speed * coast - 0.5 * g * coast ** 2 - descent_rate * descent)
+    return np.clip(altitude, 0.0, None)
+
+
+def first_true(mask, start=None):
+    """
+    Index of the first True in every row of mask at or after start.
+
+    :param mask: (N, n) bool array
+    :param start: (N,) int array of first allowed indices (default 0).
+        Rows with start < 0 are skipped.
+    :return: (N,) int array, -1 where there is none
+    """
+    n = mask.shape[1]
+    if start is not None:
+        mask = mask & (np.arange(n)[None, :] >= start[:, None]) & (start[:, None] >= 0)
+    found = mask.any(axis=1)
+    return np.where(found, mask.argmax(axis=1), -1)
+
+
+def barometer(truth, params, rng):
+    """
+    Altitude read by readBarometer() every tick: BMP3XX reading in forced
+    mode (performReading()) with Gaussian noise and glitches, the sensor's
+    IIR filter, and the baseAlt error from power-up.
+
+    :param truth: (N, n_ticks) true altitude
+    :param params: Parameter dict, scalars or (N,) arrays
+    """
+    n, ticks = truth.shape
+
+    def column(name):
+        return np.broadcast_to(params[name], (n,))[:, None]
+
+    raw = truth + rng.normal(size=(n, ticks)) * column("baro_noise")
+    if np.any(column("spike_rate") > 0):
+        glitch = rng.random((n, ticks)) < column("spike_rate")
+        raw = raw + glitch * rng.choice([-1.0, 1.0], size=(n, ticks)) * column("spike")
+
+    # y = (c * y + x) / (c + 1), starting settled on the first reading
+    c = float(params["iir"])
+    if c > 0:
+        from scipy.signal import lfilter
+
+        raw, _ = lfilter([1 / (c + 1)], [1, -c / (c + 1)], raw, axis=1,
+                         zi=raw[:, :1] * (c / (c + 1)))
+
+    base = rng.normal(size=(n, 1)) * column("base_noise")
+    return raw - base
+
+
+def vertical_velocity(altitude, period):
+    """
+    getVerticalVelocity(): finite difference of successive altitudes, EMA
+    filtered with tau = 0.75 s. The first call only stores the altitude and
+    the second returns the raw difference.
+    """
+    raw = np.diff(altitude, axis=1) / period
+    alpha = period / (0.75 + period)
+    velocity = np.zeros_like(altitude)
+    velocity[:, 1:2] = raw[:, :1]
+    if raw.shape[1] > 1:
+        from scipy.signal import lfilter
+
+        velocity[:, 2:], _ = lfilter([alpha], [1, -(1 - alpha)], raw[:, 1:], axis=1,
+                                     zi=raw[:, :1] * (1 - alpha))
+    return velocity
+
+
+def fly_chunk(params, dispersions, n, seed, config=None):
+    """
+    Fly one chunk of n missions.
+
+    :param seed: numpy.random.SeedSequence for this chunk
+    :param config: Config.h values (see read_config), defaults to CONFIG
+    :return: Dict of column name -> (n,) array. Times are seconds, NaN
+        when a state was never reached.
+    """
+    config = {**CONFIG, **(config or {})}
+    rng = np.random.default_rng(seed)
+    drawn = draw_parameters(params, dispersions, n, rng)
+    column = {name: np.broadcast_to(drawn[name], (n,)).astype(float)[:, None]
+              for name in ("hold", "burn_time", "accel", "descent_rate")}
+
+    loop = int(config["LOOP_PERIOD"])
+    period = loop / 1000.0
+    ticks = int(np.ceil(params["tf"] / period)) + 1
+    t = np.arange(ticks) * period
+    millis = np.arange(ticks) * loop
+    rows = np.arange(n)
+
+    truth = ascent_profile(t[None, :], **column)
+    true_velocity = np.gradient(truth, period, axis=1)
+    altitude = barometer(truth, drawn, rng)
+    velocity = vertical_velocity(altitude, period)
+
+    def ticks_after(start, delay_ms):
+        # First tick after start whose millis are at least delay_ms later
+        k = start + max(1, -(-int(delay_ms) // loop))
+        return np.where((start >= 0) & (k < ticks), k, -1)
+
+    def at_time(seconds, after):
+        # First tick after `after` at or past a command time
+        k = np.maximum(np.ceil(np.broadcast_to(seconds, (n,)) / period - 1e-9).astype(int), after + 1)
+        return np.where((after >= 0) & (k < ticks), k, -1)
+
+    ground = np.zeros(n, dtype=int)
+    armed = at_time(drawn["arm_time"], ground)
+    ascent = at_time(drawn["launch_time"], armed)
+
+    # ASCENT: the ABORT_FIRE_PYRO_TIME backup, then checkGNCActivation()
+    climbing = (altitude > config["TARGET_ALTITUDE"]) & (velocity > config["GNC_ACTIVATION_VELOCITY"])
+    by_altitude = first_true(climbing, np.where(ascent >= 0, ascent + 1, -1))
+    by_timeout = ticks_after(ascent, config["ABORT_FIRE_PYRO_TIME"])
+    candidates = np.where(np.stack([by_altitude, by_timeout]) < 0, ticks, np.stack([by_altitude, by_timeout]))
+    gnc = candidates.min(axis=0)
+    gnc = np.where(gnc < ticks, gnc, -1)
+    cause = np.where(gnc < 0, 0, np.where(gnc == by_altitude, 1, 2))
+
+    pyro = ticks_after(gnc, config["GNC_TIME"])
+
+    # firePyros() starts on the tick after PYRO_FIRED is entered, then
+    # checks the velocity every PYRO_INTERVAL; the third charge ends it
+    descent = np.full(n, -1)
+    fired = np.where(pyro >= 0, 1, 0)
+    check = ticks_after(pyro + np.where(pyro >= 0, 1, 0), PYRO_INTERVAL)
+    for charge in (1, 2, 3):
+        pending = (descent < 0) & (check >= 0)
+        falling = pending & (velocity[rows, np.maximum(check, 0)] < PYRO_VELOCITY)
+        done = falling | (pending & (charge == 3))
+        descent = np.where(done, check, descent)
+        more = pending & ~done
+        fired = np.where(more, charge + 1, fired)
+        check = np.where(more, ticks_after(check, PYRO_INTERVAL), check)
+
+    landing = ((altitude < config["ALTITUDE_LANDING_THRESHOLD"])
+               & (np.abs(velocity) < config["LANDING_VELOCITY_THRESHOLD"]))
+    landed = first_true(landing, np.where(descent >= 0, descent + 1, -1))
+
+    def seconds(k):
+        return np.where(k >= 0, millis[np.maximum(k, 0)] / 1000.0, np.nan)
+
+    def sample(values, k):
+        return np.where(k >= 0, values[rows, np.maximum(k, 0)], np.nan)
+
+    crossing = first_true((truth > config["TARGET_ALTITUDE"])
+                          & (true_velocity > config["GNC_ACTIVATION_VELOCITY"]))
+    gnc_truth = sample(truth, gnc)
+    gnc_true_velocity = sample(true_velocity, gnc)
+
+    chunk = {
+        "armed_time": seconds(armed),
+        "ascent_time": seconds(ascent),
+        "gnc_time": seconds(gnc),
+        "gnc_cause": np.array(CAUSES)[cause],
+        "true_crossing": seconds(crossing),
+        "gnc_delay": seconds(gnc) - seconds(crossing),
+        "gnc_true_altitude": gnc_truth,
+        # Triggered by the altitude check while the true flight was not
+        # above TARGET_ALTITUDE and climbing
+        "false_trigger": (cause == 1) & ~((gnc_truth > config["TARGET_ALTITUDE"])
+                                          & (gnc_true_velocity > config["GNC_ACTIVATION_VELOCITY"])),
+        "pyro_time": seconds(pyro),
+        "pyros_fired": fired,
+        "descent_time": seconds(descent),
+        "landed_time": seconds(landed),
+        "landed_true_altitude": sample(truth, landed),
+        "false_landing": (landed >= 0) & (sample(truth, landed) > config["ALTITUDE_LANDING_THRESHOLD"]),
+    }
+    for name in dispersions:
+        chunk[name] = drawn[name]
+    return chunk
+
+
+def run_mission(n_runs, seed=0, dispersions=None, params=None, config=None,
+                chunk_size=100, workers=None):
+    """
+    Fly n_runs missions through the STAG state machine.
+
+    :param n_runs: Number of missions
+    :param seed: Root seed (int or SeedSequence)
+    :param dispersions: Dict of parameter -> (low, high) uniform ranges
+    :param params: Overrides for NOMINAL
+    :param config: Config.h values, e.g. read_config(path); defaults to
+        the current flight_controller_v3/src/Config.h
+    :param chunk_size: Missions per chunk (memory grows with chunk_size * tf)
+    :param workers: Process count, defaults to os.cpu_count(). Use 1 to
+        run in this process.
+    :return: pandas DataFrame with one row per mission
+    """
+    params = {**NOMINAL, **(params or {})}
+    dispersions = dispersions or {}
+    config = read_config() if config is None else {**CONFIG, **config}
+
+    sizes = [chunk_size] * (n_runs // chunk_size)
+    if n_runs % chunk_size:
+        sizes.append(n_runs % chunk_size)
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    seeds = root.spawn(len(sizes))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        chunks = [fly_chunk(params, dispersions, n, s, config) for n, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(fly_chunk, params, dispersions, n, s, config)
+                       for n, s in zip(sizes, seeds)]
+            chunks = [f.result() for f in futures]
+
+    import pandas as pd
+
+    return pd.concat([pd.DataFrame(c) for c in chunks], ignore_index=True)
+
+
+def summarize_missions(table):
+    """
+    Headline numbers of a run_mission() table.
+    """
+    n = len(table)
+    delay = table["gnc_delay"].dropna()
+    return {
+        "runs": n,
+        "gnc_rate": float(table["gnc_time"].notna().mean()),
+        "altitude_trigger_rate": float((table["gnc_cause"] == "altitude").mean()),
+        "timeout_trigger_rate": float((table["gnc_cause"] == "timeout").mean()),
+        "false_trigger_rate": float(table["false_trigger"].mean()),
+        "gnc_delay_p5": float(delay.quantile(0.05)) if len(delay) else np.nan,
+        "gnc_delay_median": float(delay.median()) if len(delay) else np.nan,
+        "gnc_delay_p95": float(delay.quantile(0.95)) if len(delay) else np.nan,
+        "mean_pyros_fired": float(table["pyros_fired"].mean()),
+        "landed_rate": float(table["landed_time"].notna().mean()),
+        "false_landing_rate": float(table["false_landing"].mean()),
+    }
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.time()
+    table = run_mission(2000, dispersions={"accel": (40.0, 80.0), "baro_noise": (0.2, 2.0)})
+    print(f"2000 missions in {time.time() - start:.1f} s")
+    for name, value in summarize_missions(table).items():
+        print(f"{name} = {value:.4f}" if isinstance(value, float) else f"{name} = {value}")
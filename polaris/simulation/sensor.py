@@ -0,0 +1,154 @@
+# ============================================================
+# BNO055 emulation for the GNC Hapsis rotation simulation
+#
+# Sits between the plant and the controller. The fusion output is
+# sampled at a fixed rate, reaches the flight computer after a
+# transport latency, and is held until the next sample arrives.
+# Headings are wrapped to 0-360 and quantized to the BNO055's
+# 1/16 degree, and the gyro reading gets white noise on top of its
+# 1/16 degree/s resolution. Like actuator.py, the history lives in a
+# ring buffer of shape (N, L), so one step is a few array
+# operations for the whole batch.
+#
+# ============================================================
+
+import numpy as np
+
+# Parameters of BNO055Sensor, also campaign.NOMINAL keys
+SENSOR = ("sensor_rate", "sensor_latency", "resolution", "gyro_noise")
+
+# What code.py actually sees: ~18 rows/s in the 10_30_2025_test logs,
+# one 100 Hz fusion period of latency, and the datasheet resolution and
+# gyro noise (0.1 deg/s RMS)
+BNO055 = {
+    "sensor_rate": 18.0,  # (Hz)
+    "sensor_latency": 0.01,  # (s)
+    "resolution": 1 / 16,  # (deg)
+    "gyro_noise": np.radians(0.1),  # (rad/s)
+}
+
+# (rad/s) one LSB of the BNO055 gyro, 1/16 deg/s
+GYRO_RESOLUTION = np.radians(1 / 16)
+
+
+class BNO055Sensor:
+    """
+    Batched BNO055 heading and gyro readings.
+
+    step() returns the heading the flight code would read from
+    sensor.euler[0], in radians; the matching sensor.gyro reading is
+    left in .gyro. Rate and latency are resolved to whole simulation
+    steps.
+    """
+
+    def __init__(self, sensor_rate=0.0, sensor_latency=0.0, resolution=0.0, gyro_noise=0.0, wrap=True):
+        """
+        :param sensor_rate: Output rate (Hz), scalar or (N,). 0 samples
+            every step.
+        :param sensor_latency: Sample to flight computer delay (s), scalar or (N,)
+        :param resolution: Heading quantum (deg), scalar or (N,). 0 turns
+            quantization off.
+        :param gyro_noise: Standard deviation of the gyro noise (rad/s),
+            scalar or (N,)
+        :param wrap: Report headings in [0, 360] degrees like euler[0]
+        """
+        self.sensor_rate = np.asarray(sensor_rate, dtype=float)
+        self.sensor_latency = np.asarray(sensor_latency, dtype=float)
+        self.resolution = np.asarray(resolution, dtype=float)
+        self.gyro_noise = np.asarray(gyro_noise, dtype=float)
+        self.wrap = wrap
+        self.period = None
+        self.latency = None
+        self.history = None
+        self.rates = None
+        self.rng = None
+        self.noise = None
+        self.gyro = None
+        self.dt = None
+        self.i = 0
+
+    def reset(self, n, dt, rng=None, noise=None):
+        """
+        Allocate empty histories for n members.
+
+        :param dt: Simulation step (s)
+        :param rng: numpy.random.Generator for the gyro noise
+        :param noise: Optional precomputed (n, n_steps) standard normal gyro
+            noise draws, used instead of rng
+        """
+        rate = np.broadcast_to(self.sensor_rate, (n,))
+        self.period = np.where(rate > 0, 1.0 / np.where(rate > 0, rate, 1.0), dt)
+        self.period = np.maximum(self.period, dt)
+        self.latency = np.clip(np.broadcast_to(self.sensor_latency, (n,)), 0.0, None)
+
+        length = int(np.ceil((self.latency.max() + self.period.max()) / dt)) + 2
+        self.history = np.zeros((n, length))
+        self.rates = np.zeros((n, length))
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.noise = noise
+        self.gyro = np.zeros(n)
+        self.dt = dt
+        self.i = 0
+
+    def step(self, theta, omega):
+        """
+        Record the true state for this step and read the sensor.
+
+        :param theta: True heading (rad), array of shape (N,)
+        :param omega: True angular velocity (rad/s), array of shape (N,)
+        :return: Measured heading (rad), array of shape (N,)
+        """
+        length = self.history.shape[1]
+        self.history[:, self.i % length] = theta
+        self.rates[:, self.i % length] = omega
+
+        # Latest fusion sample that has arrived by now; the first one
+        # stands in until then
+        age = np.clip(self.i * self.dt - self.latency, 0.0, None)
+        sample = np.floor(age / self.period + 1e-9) * self.period
+        lag = self.i - np.rint(sample / self.dt).astype(np.int64)
+        index = ((self.i - lag) % length)[:, None]
+        draw = None if self.noise is None else self.noise[:, self.i]
+        self.i += 1
+
+        heading = np.degrees(np.take_along_axis(self.history, index, axis=1)[:, 0])
+        if self.wrap:
+            heading = heading % 360.0
+        quantum = np.broadcast_to(self.resolution, heading.shape)
+        heading = np.where(quantum > 0, np.round(heading / np.where(quantum > 0, quantum, 1.0)) * quantum, heading)
+
+        gyro = np.take_along_axis(self.rates, index, axis=1)[:, 0]
+        if np.any(self.gyro_noise > 0):
+            if draw is None:
+                draw = self.rng.standard_normal(gyro.shape)
+            gyro = gyro + self.gyro_noise * draw
+        self.gyro = np.round(gyro / GYRO_RESOLUTION) * GYRO_RESOLUTION
+        return np.radians(heading)
+
+
+def bno055_sensor(params):
+    """
+    BNO055Sensor from the SENSOR entries of a (possibly dispersed)
+    parameter dict, or None when they describe a perfect sensor.
+    """
+    values = {name: params[name] for name in SENSOR if name in params}
+    if all(np.all(np.asarray(value) == 0) for value in values.values()):
+        return None
+    return BNO055Sensor(**values)
+
+
+if __name__ == "__main__":
+    from .campaign import NOMINAL
+    from .controllers import flight_law
+    from .engine import BatchSimulator, cylinder_inertia
+    from .metrics import summarize
+
+    # What the slow loop costs code.py: perfect sensor, then each BNO055
+    # effect on its own, then all of them together, on the same draws
+    cases = {"perfect": {}, **{name: {name: value} for name, value in BNO055.items()}, "bno055": BNO055}
+    for name, params in cases.items():
+        sim = BatchSimulator(cylinder_inertia(NOMINAL["M"], NOMINAL["R"]), flight_law("code", NOMINAL["setpoint"]),
+                             n=2000, sensor=bno055_sensor(params))
+        rows = summarize(sim.run(np.random.default_rng(0)))
+        print(f"{name:>15}: rms error {rows['rms_error'].mean():.4f} rad, "
+              f"pulses {rows['pulses'].mean():.1f}, gas {rows['gas_used'].mean():.2f} s")
@@ -0,0 +1,641 @@
+# ============================================================
+# Software-in-the-loop harness for the CircuitPython flight code
+#
+# Runs polaris/code.py (or any tests/ variant) unmodified on a
+# desktop. The script's imports of board, digitalio, busio,
+# adafruit_bno055, adafruit_sdcard, storage, usb_cdc and time are
+# answered with fake modules backed by a single-cylinder rotation
+# plant: the BNO055 reads its heading and gyro from the plant, and
+# thruster pin writes set the control torque. Files opened (or
+# listed through os) under a storage.mount() point land in a temp
+# dir instead of the SD card, and come back in FlightRecord.sd_files.
+#
+# Time comes from a VirtualClock: sleep() returns at once and only
+# moves the clock forward, and the time the board would spend on
+# compute, I2C reads, SD writes and USB prints is charged to the
+# clock instead of being spent. A 60 s flight replays in a fraction
+# of a second with the loop seeing the same delta_time sequence it
+# would on hardware. RealClock flies in wall-clock time instead.
+#
+# The flight ends by raising FlightOver (a BaseException, so the
+# scripts' `except Exception` handlers cannot swallow it) from the
+# first fake call made at or after tf.
+#
+# ============================================================
+
+import builtins
+import io
+import math
+import os
+import re
+import shutil
+import tempfile
+import time as _time
+import types
+
+import numpy as np
+
+from .engine import BatchResult, cylinder_inertia
+from .metrics import summarize
+
+# Thruster pins and the sign of the torque they put on the heading, for
+# scripts whose pins script_thrusters() cannot read. code.py fires D12
+# (Pico: D11) on a positive PID output, which turns the BNO055 heading
+# towards the setpoint.
+THRUSTERS = {"D12": 1, "D13": -1, "D11": 1, "D10": -1}
+
+# Torque sign on the heading of each thruster variable the scripts
+# assign a pin to. code.py fires negative_thruster (the right thruster)
+# on a positive output and labels it IMPART NEGATIVE; the BNO055 heading
+# runs clockwise, so that is a positive torque on the heading. Thrusters
+# 1 and 3 impart negative torque, 2 and 4 positive (code.py's notes).
+THRUSTER_NAMES = {
+    "negative_thruster": 1,
+    "right_thruster": 1,
+    "thruster_1": 1,
+    "thruster_3": 1,
+    "positive_thruster": -1,
+    "left_thruster": -1,
+    "thruster_2": -1,
+    "thruster_4": -1,
+}
+
+# `name = digitalio.DigitalInOut(board.D13)`, not commented out
+_PIN = re.compile(r"^\s*(\w+)\s*=\s*digitalio\.DigitalInOut\(\s*board\.(\w+)\s*\)", re.MULTILINE)
+
+# Modules replaced inside a SIL flight
+FAKE_MODULES = ("board", "digitalio", "busio", "adafruit_bno055", "adafruit_sdcard",
+                "adafruit_sdcardio", "sdcardio", "storage", "usb_cdc",
+                "microcontroller", "os", "time")
+
+
+def script_thrusters(script):
+    """
+    Pin -> torque sign wiring of a flight script, read from its own pin
+    assignments (THRUSTER_NAMES). Scripts that name no thruster get
+    THRUSTERS. The wiring never depends on how the script flies, so a sign
+    error in a script shows up as a flight that does not settle.
+    """
+    with open(script, errors="replace") as file:
+        source = file.read()
+    wiring = {pin: THRUSTER_NAMES[name] for name, pin in _PIN.findall(source) if name in THRUSTER_NAMES}
+    return wiring or dict(THRUSTERS)
+
+
+class FlightOver(BaseException):
+    """
+    Raised inside the flight script once the simulated flight time is up.
+    """
+
+
+# Virtual time (s) charged per event. Calibrated so code.py's loop
+# (two BNO055 reads, a few prints and an SD append) runs at the
+# 50-70 ms period seen in the 10_30_2025_test logs.
+COSTS = {
+    "loop": 0.004,      # Python compute per control loop (per heading read)
+    "i2c": 0.0015,      # One BNO055 register read
+    "sd": 0.045,        # Opening (appending to and closing) a file on the SD card
+    "print": 0.0005,    # One print or usb_cdc write
+    "call": 2e-5,       # Any other call into time (keeps busy-wait loops moving)
+}
+
+# CircuitPython boards without an RTC boot at 2000-01-01 00:00:00
+BOOT_EPOCH = 946684800.0
+
+
+class RealClock:
+    """
+    Wall-clock time, so a 20 s flight takes 20 s. Costs are paid for real.
+    """
+
+    def __init__(self):
+        self.start = _time.monotonic()
+
+    def now(self):
+        return _time.monotonic() - self.start
+
+    def sleep(self, seconds):
+        _time.sleep(seconds)
+
+    def charge(self, kind):
+        pass
+
+    def time(self):
+        return _time.time()
+
+    def localtime(self, secs=None):
+        return _time.localtime(secs)
+
+
+class VirtualClock:
+    """
+    Simulated time that only moves when the flight code sleeps or pays
+    for an operation.
+    """
+
+    def __init__(self, costs=None, epoch=BOOT_EPOCH):
+        """
+        :param costs: Overrides for COSTS, dict of event -> seconds
+        :param epoch: Wall-clock time (s since 1970) of the script's start,
+            used by time.time() and time.localtime()
+        """
+        self.costs = {**COSTS, **(costs or {})}
+        self.epoch = float(epoch)
+        self.t = 0.0
+
+    def now(self):
+        return self.t
+
+    def sleep(self, seconds):
+        if seconds < 0:
+            raise ValueError("sleep length must be non-negative")
+        self.t += seconds
+
+    def charge(self, kind):
+        self.t += self.costs.get(kind, 0.0)
+
+    def time(self):
+        return self.epoch + self.t
+
+    def localtime(self, secs=None):
+        return _time.gmtime(self.time() if secs is None else secs)
+
+
+class World:
+    """
+    Rotation plant shared by all fake modules of one flight.
+
+    Torque is piecewise constant (thruster command plus a uniform random
+    disturbance held for disturbance_dt), so the plant is integrated
+    exactly up to whatever time the flight code looks at it.
+    """
+
+    def __init__(self, inertia, control_torque, disturbance, tf, disturbance_dt,
+                 rng, theta0, omega0, setpoint, thrusters, clock, sd_dir):
+        self.inertia = float(inertia)
+        self.control_torque = float(control_torque)
+        self.tf = float(tf)
+        self.dt = float(disturbance_dt)
+        steps = int(math.ceil(self.tf / self.dt))
+        self.table = rng.uniform(-1.0, 1.0, size=steps + 1) * float(disturbance)
+        self.thrusters = dict(thrusters)
+        self.clock = clock
+        self.sd_dir = sd_dir
+        self.setpoint = float(setpoint)
+        self.namespace = {}
+
+        self.t = 0.0
+        self.k = 0
+        self.theta = float(theta0)
+        self.omega = float(omega0)
+        self.pins = {}
+        self.command = 0
+        self.mounts = []
+        self.serial = bytearray()
+        self.stdout = io.StringIO()
+
+        self.samples = [(0.0, self.theta, self.omega, 0, self.table[0], self.script_setpoint())]
+        self.reads = []
+
+    def torque(self):
+        return self.command * self.control_torque + self.table[min(self.k, self.table.size - 1)]
+
+    def advance(self, t=None):
+        """
+        Integrate the plant up to time t (default: the clock's now).
+        """
+        t = self.clock.now() if t is None else t
+        end = min(t, self.tf)
+        while self.t < end:
+            boundary = (self.k + 1) * self.dt
+            step_end = min(end, boundary)
+            h = step_end - self.t
+            alpha = self.torque() / self.inertia
+            self.theta += self.omega * h + 0.5 * alpha * h * h
+            self.omega += alpha * h
+            self.t = step_end
+            if step_end >= boundary:
+                self.k += 1
+                self.samples.append((self.t, self.theta, self.omega, self.command, self.torque(),
+                                     self.script_setpoint()))
+        if t >= self.tf:
+            raise FlightOver()
+
+    def script_setpoint(self):
+        """
+        The flight script's global `setpoint` (degrees) converted to radians,
+        so variants that cycle their setpoint are scored against it.
+        """
+        try:
+            return math.radians(float(self.namespace.get("setpoint", self.setpoint)))
+        except (TypeError, ValueError):
+            return math.radians(self.setpoint)
+
+    def sense(self, kind="i2c"):
+        """
+        Pay for a sensor read and bring the plant up to date.
+        """
+        self.clock.charge(kind)
+        self.advance()
+
+    def write_pin(self, name, value):
+        self.advance()
+        self.pins[name] = bool(value)
+        self.command = sum(sign for pin, sign in self.thrusters.items() if self.pins.get(pin))
+
+    def heading(self):
+        """
+        BNO055 heading in degrees, 0 to 360. Every read counts as one
+        control loop.
+        """
+        self.clock.charge("loop")
+        self.sense()
+        self.reads.append(self.t)
+        return math.degrees(self.theta) % 360.0
+
+    def gyro(self):
+        # The gyro z axis is counter-clockwise, the heading clockwise
+        self.sense()
+        return (0.0, 0.0, -self.omega)
+
+    def local_path(self, path):
+        """
+        Map a path under a storage.mount() point into sd_dir.
+        """
+        if isinstance(path, str):
+            for mount in self.mounts:
+                if path == mount or path.startswith(mount.rstrip("/") + "/"):
+                    return os.path.join(self.sd_dir, path[len(mount):].lstrip("/"))
+        return path
+
+    def open(self, file, mode="r", *args, **kwargs):
+        path = self.local_path(file)
+        if path is not file:
+            self.clock.charge("sd")
+        return builtins.open(path, mode, *args, **kwargs)
+
+    def print(self, *args, **kwargs):
+        self.clock.charge("print")
+        kwargs.setdefault("file", self.stdout)
+        builtins.print(*args, **kwargs)
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+def fake_modules(world):
+    """
+    Build the fake CircuitPython modules for one flight.
+
+    :return: Dict of module name -> module object
+    """
+
+    class Pin:
+        def __init__(self, name):
+            self.name = name
+
+        def __repr__(self):
+            return f"board.{self.name}"
+
+    def board_getattr(name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return Pin(name)
+
+    class Bus:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def try_lock(self):
+            return True
+
+        def unlock(self):
+            pass
+
+        def deinit(self):
+            pass
+
+    board = _module("board", __getattr__=board_getattr,
+                    I2C=lambda: Bus(), SPI=lambda: Bus(), STEMMA_I2C=lambda: Bus())
+    busio = _module("busio", I2C=Bus, SPI=Bus, UART=Bus)
+
+    class Direction:
+        INPUT = "INPUT"
+        OUTPUT = "OUTPUT"
+
+    class Pull:
+        UP = "UP"
+        DOWN = "DOWN"
+
+    class DriveMode:
+        PUSH_PULL = "PUSH_PULL"
+        OPEN_DRAIN = "OPEN_DRAIN"
+
+    class DigitalInOut:
+        def __init__(self, pin):
+            self.pin = pin
+            self.direction = Direction.INPUT
+            self.pull = None
+            self._value = False
+
+        @property
+        def value(self):
+            return self._value
+
+        @value.setter
+        def value(self, value):
+            self._value = bool(value)
+            world.write_pin(self.pin.name, self._value)
+
+        def switch_to_output(self, value=False, drive_mode=DriveMode.PUSH_PULL):
+            self.direction = Direction.OUTPUT
+            self.value = value
+
+        def switch_to_input(self, pull=None):
+            self.direction = Direction.INPUT
+            self.pull = pull
+
+        def deinit(self):
+            pass
+
+    digitalio = _module("digitalio", DigitalInOut=DigitalInOut, Direction=Direction,
+                        Pull=Pull, DriveMode=DriveMode)
+
+    class BNO055:
+        def __init__(self, *args, **kwargs):
+            self.mode = 0x0C  # NDOF
+
+        @property
+        def euler(self):
+            return (world.heading(), 0.0, 0.0)
+
+        @property
+        def gyro(self):
+            return world.gyro()
+
+        @property
+        def temperature(self):
+            world.sense()
+            return 25
+
+        @property
+        def quaternion(self):
+            half = -math.radians(world.heading()) / 2
+            return (math.cos(half), 0.0, 0.0, math.sin(half))
+
+        @property
+        def acceleration(self):
+            world.sense()
+            return (0.0, 0.0, 9.81)
+
+        gravity = acceleration
+
+        @property
+        def linear_acceleration(self):
+            world.sense()
+            return (0.0, 0.0, 0.0)
+
+        @property
+        def magnetic(self):
+            world.sense()
+            return (0.0, 0.0, 0.0)
+
+        @property
+        def calibration_status(self):
+            return (3, 3, 3, 3)
+
+        @property
+        def calibrated(self):
+            return True
+
+    adafruit_bno055 = _module("adafruit_bno055", BNO055_I2C=BNO055, BNO055_UART=BNO055)
+
+    class SDCard:
+        def __init__(self, *args, **kwargs):
+            pass
+
+    class VfsFat:
+        def __init__(self, card):
+            self.card = card
+
+    def mount(vfs, path, readonly=False):
+        world.mounts.append(path)
+
+    def umount(path):
+        if path in world.mounts:
+            world.mounts.remove(path)
+
+    storage = _module("storage", VfsFat=VfsFat, mount=mount, umount=umount,
+                      remount=lambda *args, **kwargs: None)
+
+    class SerialPort:
+        connected = True
+        in_waiting = 0
+        timeout = 0
+
+        def write(self, data):
+            world.clock.charge("print")
+            world.advance()
+            world.serial.extend(data)
+            return len(data)
+
+        def read(self, n=None):
+            return b""
+
+        def readline(self):
+            return b""
+
+        def reset_input_buffer(self):
+            pass
+
+    usb_cdc = _module("usb_cdc", console=SerialPort(), data=SerialPort())
+
+    def reset():
+        raise FlightOver()
+
+    microcontroller = _module("microcontroller", reset=reset,
+                              cpu=types.SimpleNamespace(temperature=25.0, frequency=125_000_000))
+
+    def wrap_path(function):
+        return lambda path, *args, **kwargs: function(world.local_path(path), *args, **kwargs)
+
+    fake_path = _module("os.path", join=os.path.join, basename=os.path.basename,
+                        dirname=os.path.dirname, split=os.path.split, splitext=os.path.splitext,
+                        exists=wrap_path(os.path.exists), isdir=wrap_path(os.path.isdir),
+                        isfile=wrap_path(os.path.isfile), getsize=wrap_path(os.path.getsize))
+    fake_os = _module("os", path=fake_path, sep="/", getcwd=lambda: "/",
+                      listdir=lambda path="/": os.listdir(world.local_path(path)),
+                      mkdir=wrap_path(os.mkdir), rmdir=wrap_path(os.rmdir),
+                      remove=wrap_path(os.remove), stat=wrap_path(os.stat),
+                      rename=lambda old, new: os.rename(world.local_path(old), world.local_path(new)),
+                      sync=lambda: None, urandom=os.urandom, getenv=lambda key, default=None: default,
+                      uname=lambda: types.SimpleNamespace(sysname="sil", machine="polaris-sil"))
+
+    def monotonic():
+        world.clock.charge("call")
+        world.advance()
+        return world.clock.now()
+
+    def monotonic_ns():
+        return int(monotonic() * 1e9)
+
+    def sleep(seconds):
+        world.clock.sleep(seconds)
+        world.advance()
+
+    fake_time = _module("time", monotonic=monotonic, monotonic_ns=monotonic_ns, sleep=sleep,
+                        localtime=world.clock.localtime, time=world.clock.time,
+                        struct_time=_time.struct_time)
+
+    return {
+        "board": board,
+        "busio": busio,
+        "digitalio": digitalio,
+        "adafruit_bno055": adafruit_bno055,
+        "adafruit_sdcard": _module("adafruit_sdcard", SDCard=SDCard),
+        "adafruit_sdcardio": _module("adafruit_sdcardio", SDCard=SDCard),
+        "sdcardio": _module("sdcardio", SDCard=SDCard),
+        "storage": storage,
+        "usb_cdc": usb_cdc,
+        "microcontroller": microcontroller,
+        "os": fake_os,
+        "time": fake_time,
+    }
+
+
+class FlightRecord:
+    """
+    What happened during one SIL flight.
+
+    t, theta, omega, u and tau are sampled every disturbance_dt; reads
+    holds the time of every heading read, i.e. one entry per control loop.
+    sd_files maps each file the script left on the SD card (path relative
+    to the card) to its contents.
+    """
+
+    def __init__(self, world, script, error):
+        t, theta, omega, u, tau, setpoint = (np.array(c) for c in zip(*world.samples))
+        self.t = t
+        self.theta = theta
+        self.omega = omega
+        self.u = u.astype(np.int8)
+        self.tau = tau
+        self.setpoint = setpoint
+        self.reads = np.array(world.reads)
+        self.serial = bytes(world.serial)
+        self.stdout = world.stdout.getvalue()
+        self.sd_dir = world.sd_dir
+        self.sd_files = {}
+        for folder, _, names in os.walk(world.sd_dir):
+            for name in names:
+                path = os.path.join(folder, name)
+                with builtins.open(path, "rb") as file:
+                    self.sd_files[os.path.relpath(path, world.sd_dir)] = file.read()
+        self.script = script
+        self.error = error
+        self.inertia = world.inertia
+
+    def as_batch(self):
+        """
+        BatchResult of one member, for the functions in metrics.py.
+        """
+        dt = self.t[1] - self.t[0] if self.t.size > 1 else 0.0
+        return BatchResult(self.t, self.theta[None], self.omega[None], self.tau[None] / self.inertia,
+                           self.tau[None], self.u[None], self.setpoint[None], dt)
+
+    def loop_dt(self):
+        """
+        Time between successive control loops, the delta_time the flight
+        code computes.
+        """
+        return np.diff(self.reads)
+
+    def loop_rate(self):
+        """
+        Mean control loop frequency (Hz) from the heading reads.
+        """
+        if self.reads.size < 2:
+            return 0.0
+        return float((self.reads.size - 1) / (self.reads[-1] - self.reads[0]))
+
+    def summary(self):
+        rows = {name: float(values[0]) for name, values in summarize(self.as_batch()).items()}
+        rows["loop_rate"] = self.loop_rate()
+        return rows
+
+
+def run_flight(script, tf=20.0, M=10.0, R=0.25, control_torque=1.5, disturbance=1.0,
+               disturbance_dt=0.02, seed=None, heading0=90.0, omega0=0.0, setpoint=0.0,
+               thrusters=None, clock=None, sd_dir=None):
+    """
+    Fly one flight script against the rotation plant.
+
+    :param script: Path to the CircuitPython script (e.g. polaris/code.py)
+    :param tf: Flight time (s), measured on the clock from the script's start
+    :param M: Cylinder mass (kg)
+    :param R: Cylinder radius (m)
+    :param control_torque: Torque of one thruster (N*m)
+    :param disturbance: Amplitude of the uniform random torque (N*m)
+    :param disturbance_dt: Hold time of each disturbance sample (s); also
+        the sample interval of the returned record
+    :param seed: Seed for the disturbance draw
+    :param heading0: Initial heading (degrees)
+    :param omega0: Initial heading rate (rad/s)
+    :param setpoint: Heading (degrees) the metrics score against when the
+        script has no global `setpoint`
+    :param thrusters: Dict of pin name -> torque sign, defaults to the
+        script's wiring (script_thrusters())
+    :param clock: VirtualClock (the default) or RealClock
+    :param sd_dir: Directory standing in for the SD card, defaults to a
+        temp dir that is removed once the flight is over (the files stay in
+        the record's sd_files)
+    :return: FlightRecord
+    """
+    script = os.path.abspath(script)
+    with open(script) as file:
+        code = compile(file.read(), script, "exec")
+
+    world = World(cylinder_inertia(M, R), control_torque, disturbance, tf, disturbance_dt,
+                  np.random.default_rng(seed), math.radians(heading0), omega0, setpoint,
+                  script_thrusters(script) if thrusters is None else thrusters,
+                  clock or VirtualClock(), sd_dir or tempfile.mkdtemp(prefix="polaris-sil-"))
+    fakes = fake_modules(world)
+    real_import = builtins.__import__
+
+    def sil_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name in fakes:
+            return fakes[name]
+        return real_import(name, globals, locals, fromlist, level)
+
+    sil_builtins = dict(vars(builtins))
+    sil_builtins.update(__import__=sil_import, open=world.open, print=world.print)
+    namespace = world.namespace
+    namespace.update(__name__="__main__", __file__=script, __builtins__=sil_builtins)
+
+    error = None
+    try:
+        exec(code, namespace)
+    except FlightOver:
+        pass
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    record = FlightRecord(world, script, error)
+    if sd_dir is None:
+        shutil.rmtree(world.sd_dir, ignore_errors=True)
+        record.sd_dir = None
+    return record
+
+
+if __name__ == "__main__":
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "code.py")
+    record = run_flight(script, tf=60.0, seed=0)
+    if record.error:
+        print(f"Flight script failed: {record.error}")
+    for name, value in record.summary().items():
+        print(f"{name} = {value:.4f}")
+    for name, data in record.sd_files.items():
+        print(f"SD card file {name}: {len(data)} bytes")
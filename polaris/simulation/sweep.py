@@ -0,0 +1,261 @@
+# ============================================================
+# Gain-grid sweep for the GNC Hapsis rotation simulation
+#
+# Lays a Kp x Kd (optionally x alpha x threshold) grid out along
+# the batch dimension of the simulator, with every grid point
+# flown against the same set of disturbance draws. The runs are
+# cut into fixed-size chunks and fanned out over a process pool,
+# so a 100 x 100 grid with 50 seeds per point stays within a few
+# hundred MB of memory at any one time.
+#
+# ============================================================
+
+import hashlib
+import inspect
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .actuator import valve_actuator
+from .cache import cache_key
+from .campaign import NOMINAL
+from .controllers import FLIGHT_LAWS, flight_law
+from .engine import BatchSimulator, cylinder_inertia
+from .metrics import BAND, summarize
+from .sensor import bno055_sensor
+
+# Gains that can be swept, in grid axis order
+AXES = ("Kp", "Kd", "alpha", "threshold")
+
+# Cost surfaces returned by sweep()
+COSTS = ("rms_error", "settling_time", "pulses", "gas_used")
+
+
+def disturbance_table(params, n_seeds, seed):
+    """
+    Draw the shared (n_seeds, 2, n_steps) random sequences: [:, 0] unit
+    disturbances, [:, 1] standard normal gyro noise.
+
+    Every grid point is flown against the same draws, so differences
+    between neighbouring cells come from the gains and not the noise.
+    """
+    rng = np.random.default_rng(seed)
+    disturbance = rng.uniform(-1.0, 1.0, size=(n_seeds, int(params["n_steps"])))
+    return np.stack([disturbance, rng.standard_normal(disturbance.shape)], axis=1)
+
+
+def check_axes(law, names):
+    """
+    Make sure the law's controller takes every swept gain.
+
+    :raises KeyError: Unknown law
+    :raises ValueError: An axis the controller has no parameter for, e.g.
+        threshold on "stag" (HysteresisPD takes threshold_on/threshold_off)
+    """
+    if law not in FLIGHT_LAWS:
+        raise KeyError(f"Unknown flight law '{law}', expected one of {sorted(FLIGHT_LAWS)}")
+    cls = FLIGHT_LAWS[law][0]
+    accepted = [name for name in inspect.signature(cls).parameters if name != "setpoint"]
+    unknown = [name for name in names if name not in accepted]
+    if unknown:
+        raise ValueError(f"Law '{law}' ({cls.__name__}) cannot sweep {', '.join(unknown)}; "
+                         f"its gains are {', '.join(accepted)}")
+
+
+def run_chunk(law, params, grid, members, n_seeds, table, band=BAND):
+    """
+    Simulate the runs members[0]:members[1] of a sweep.
+
+    Run m flies grid point m // n_seeds against disturbance draw m % n_seeds.
+
+    :param grid: Dict of axis name -> flattened (n_points,) gain values
+    :return: Dict of cost name -> (n,) array
+    """
+    index = np.arange(*members)
+    point, draw = index // n_seeds, index % n_seeds
+    gains = {name: values[point] for name, values in grid.items()}
+
+    controller = flight_law(law, params["setpoint"], **gains)
+    sim = BatchSimulator(
+        cylinder_inertia(params["M"], params["R"]), controller, n=index.size,
+        tf=params["tf"], n_steps=params["n_steps"],
+        control_torque=params["control_torque"],
+        actuator=valve_actuator(params),
+        sensor=bno055_sensor(params),
+    )
+    result = sim.run(disturbance_torque=table[draw, 0] * params["disturbance"], sensor_noise=table[draw, 1])
+
+    summary = summarize(result, band)
+    # Runs that never settle are charged the whole run
+    summary["settling_time"] = np.where(np.isnan(summary["settling_time"]),
+                                        sim.tf, summary["settling_time"])
+    return {name: summary[name] for name in COSTS}
+
+
+def evaluate(law, params, grid, table, chunk_size=2000, pool=None, band=BAND, cache=None):
+    """
+    Fly every grid point against every disturbance draw in table.
+
+    :param grid: Dict of axis name -> (n_points,) gain values
+    :param table: (n_seeds, 2, n_steps) draws from disturbance_table()
+    :param pool: Executor to fan the chunks out on, or None to run here
+    :param cache: Optional cache.ResultCache. Grid points already flown on
+        the same table are loaded instead of simulated.
+    :return: Dict of cost name -> (n_points, n_seeds) array
+    """
+    if cache is not None:
+        return _evaluate_cached(law, params, grid, table, chunk_size, pool, band, cache)
+
+    n_seeds = table.shape[0]
+    n_runs = np.size(next(iter(grid.values()))) * n_seeds
+    members = [(a, min(a + chunk_size, n_runs)) for a in range(0, n_runs, chunk_size)]
+    if pool is None:
+        chunks = [run_chunk(law, params, grid, m, n_seeds, table, band) for m in members]
+    else:
+        futures = [pool.submit(run_chunk, law, params, grid, m, n_seeds, table, band)
+                   for m in members]
+        chunks = [f.result() for f in futures]
+    return {name: np.concatenate([c[name] for c in chunks]).astype(float).reshape(-1, n_seeds)
+            for name in COSTS}
+
+
+def _evaluate_cached(law, params, grid, table, chunk_size, pool, band, cache):
+    n_points = np.size(next(iter(grid.values())))
+    base = {"law": law, "params": params, "band": band,
+            "table": hashlib.sha256(np.ascontiguousarray(table).tobytes()).hexdigest()}
+    keys = [cache_key({**base, "gains": {name: values[i] for name, values in grid.items()}})
+            for i in range(n_points)]
+    cells = [cache.get(key) for key in keys]
+
+    todo = np.array([i for i, cell in enumerate(cells) if cell is None], dtype=np.int64)
+    if todo.size:
+        fresh = evaluate(law, params, {name: values[todo] for name, values in grid.items()},
+                         table, chunk_size, pool, band)
+        for j, i in enumerate(todo):
+            cells[i] = {name: fresh[name][j] for name in COSTS}
+            cache.put(keys[i], cells[i], evict=False)
+        cache.evict()
+    return {name: np.array([cell[name] for cell in cells], dtype=float).reshape(n_points, -1)
+            for name in COSTS}
+
+
+class SweepResult:
+    """
+    Cost surfaces of a gain sweep.
+
+    surfaces[name] has one axis per swept gain, in the order of axes, and
+    holds the mean cost over all disturbance seeds.
+    """
+
+    def __init__(self, axes, surfaces, n_seeds, law):
+        self.axes = axes
+        self.surfaces = surfaces
+        self.n_seeds = n_seeds
+        self.law = law
+
+    @property
+    def shape(self):
+        return tuple(v.size for v in self.axes.values())
+
+    def best(self, cost="rms_error"):
+        """
+        Gains of the grid point with the lowest mean cost.
+
+        :return: Dict of axis name -> gain value
+        """
+        k = np.unravel_index(np.nanargmin(self.surfaces[cost]), self.shape)
+        return {name: float(values[i]) for (name, values), i in zip(self.axes.items(), k)}
+
+    def slice(self, cost, **at):
+        """
+        Kp x Kd slice of one cost surface.
+
+        Extra axes are fixed at the grid value nearest to at[name], or
+        minimized over when not given.
+        """
+        surface = self.surfaces[cost]
+        names = list(self.axes)
+        for name in reversed(names[2:]):
+            axis = names.index(name)
+            if name in at:
+                i = np.abs(self.axes[name] - at[name]).argmin()
+                surface = np.take(surface, i, axis=axis)
+            else:
+                surface = np.nanmin(surface, axis=axis)
+        return surface
+
+    def heatmap(self, cost="rms_error", ax=None, **at):
+        """
+        Plot a Kp x Kd heatmap of one cost surface with matplotlib.
+
+        :return: matplotlib Axes
+        """
+        import matplotlib.pyplot as plt
+
+        if ax is None:
+            _, ax = plt.subplots()
+        Kp, Kd = self.axes["Kp"], self.axes["Kd"]
+        mesh = ax.pcolormesh(Kd, Kp, self.slice(cost, **at), shading="nearest")
+        ax.figure.colorbar(mesh, ax=ax, label=cost)
+        best = self.best(cost)
+        ax.plot(best["Kd"], best["Kp"], "r+", markersize=12)
+        ax.set_xlabel("Kd")
+        ax.set_ylabel("Kp")
+        ax.set_title(f"{self.law}: mean {cost} over {self.n_seeds} seeds")
+        return ax
+
+
+def sweep(Kp, Kd, alpha=None, threshold=None, law="main", n_seeds=50, seed=0,
+          params=None, chunk_size=2000, workers=None, band=BAND, cache=None):
+    """
+    Evaluate every point of a gain grid against n_seeds disturbance draws.
+
+    :param Kp: Proportional gains to sweep
+    :param Kd: Derivative gains to sweep
+    :param alpha: Optional derivative filter weights (DeadzonePD laws only)
+    :param threshold: Optional deadzones (DeadzonePD and PulsePID laws only)
+    :param law: Key of controllers.FLIGHT_LAWS that the gains are applied to
+    :param n_seeds: Disturbance draws per grid point
+    :param seed: Seed for the shared disturbance draws
+    :param params: Overrides for the campaign.NOMINAL parameters
+    :param chunk_size: Runs per chunk (one batch per worker task)
+    :param workers: Process count, defaults to os.cpu_count(). Use 1 to
+        run in this process.
+    :param band: Half-width of the heading band (rad)
+    :param cache: Optional cache.ResultCache; only uncached points are flown
+    :return: SweepResult
+    """
+    params = {**NOMINAL, **(params or {})}
+    values = {"Kp": Kp, "Kd": Kd, "alpha": alpha, "threshold": threshold}
+    axes = {name: np.atleast_1d(np.asarray(values[name], dtype=float))
+            for name in AXES if values[name] is not None}
+    shape = tuple(v.size for v in axes.values())
+    check_axes(law, axes)
+
+    points = np.array(list(itertools.product(*axes.values())))
+    grid = {name: points[:, i] for i, name in enumerate(axes)}
+    table = disturbance_table(params, n_seeds, seed)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        runs = evaluate(law, params, grid, table, chunk_size, band=band, cache=cache)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            runs = evaluate(law, params, grid, table, chunk_size, pool, band, cache)
+
+    surfaces = {name: runs[name].mean(axis=1).reshape(shape) for name in COSTS}
+    return SweepResult(axes, surfaces, n_seeds, law)
+
+
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    result = sweep(np.linspace(0.1, 2.0, 20), np.linspace(0.05, 1.0, 20), n_seeds=10)
+    print("Best gains (RMS error):", result.best("rms_error"))
+    fig, axs = plt.subplots(2, 2, figsize=(11, 9))
+    for cost, ax in zip(COSTS, axs.flat):
+        result.heatmap(cost, ax=ax)
+    fig.tight_layout()
+    plt.show()
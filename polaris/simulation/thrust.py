@@ -0,0 +1,179 @@
+# ============================================================
+# Thrust curve from the open_nozzle tank-depletion tests
+#
+# misc_scripts/9-21-test.py test4 opened a valve and logged the
+# BMI160 until the tank ran down (tests/test_data/open_nozzle_*.csv).
+# The rig did not rotate in those runs, so the depletion shows up
+# as the flow-induced vibration of the frame: its RMS, above the
+# sensor noise floor, is taken as proportional to thrust. A tank
+# blowdown curve, thrust = floor + (1 - floor) * exp(-on_time / tau),
+# is fitted against cumulative valve on-time and tabulated on a
+# uniform grid, so the batch engine scales the control torque with
+# one vectorized index-and-blend per step.
+#
+# ============================================================
+
+import glob
+import os
+
+import numpy as np
+
+from .logs import BMI160_GYRO, load_log
+
+# tests/test_data, where 9-21-test.py writes its logs
+TEST_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "test_data")
+
+# (rad/s) RMS of the BMI160 gyro vector at rest, 12 counts, from
+# open_nozzle_2024-10-23_20-20-10 where the valve was open but the tank
+# was not pressurized
+GYRO_NOISE_FLOOR = 12.0 * BMI160_GYRO
+
+
+def load_nozzle_log(path):
+    """
+    Read one 9-21-test.py log through logs.load_log().
+
+    :return: Dict with t (s), open (number of valves open), gyro (rad/s)
+        and accel (m/s^2) (n, 3) arrays
+    """
+    frame = load_log(path)
+    return {
+        "t": frame["t"].to_numpy(),
+        "open": frame.filter(["thrust_pos", "thrust_neg", "valve"]).sum(axis=1).to_numpy(),
+        "gyro": frame[["gyro_x", "gyro_y", "gyro_z"]].to_numpy(),
+        "accel": frame[["accel_x", "accel_y", "accel_z"]].to_numpy(),
+    }
+
+
+def vibration_envelope(log, window=1.0, noise_floor=GYRO_NOISE_FLOOR):
+    """
+    Flow-induced vibration per window against cumulative valve on-time.
+
+    :param log: Output of load_nozzle_log()
+    :param window: Window length (s)
+    :param noise_floor: Sensor RMS at rest (rad/s), removed in quadrature
+    :return: (on_time, rms) arrays, one entry per window with samples
+    """
+    t = log["t"]
+    dt = np.diff(t, prepend=t[0])
+    on_time = np.cumsum(log["open"] * dt)
+
+    index = np.floor(t / window).astype(int)
+    counts = np.bincount(index)
+    used = counts > 1
+    sums = np.stack([np.bincount(index, log["gyro"][:, k]) for k in range(3)], axis=1)
+    squares = np.stack([np.bincount(index, log["gyro"][:, k] ** 2) for k in range(3)], axis=1)
+    mean = sums[used] / counts[used, None]
+    variance = (squares[used] / counts[used, None] - mean ** 2).sum(axis=1)
+
+    rms = np.sqrt(np.clip(variance - noise_floor ** 2, 0.0, None))
+    mid = np.bincount(index, on_time)[used] / counts[used]
+    return mid, rms
+
+
+def blowdown(on_time, tau, floor):
+    """
+    Relative thrust after on_time seconds of valve opening.
+    """
+    return floor + (1.0 - floor) * np.exp(-np.asarray(on_time, dtype=float) / tau)
+
+
+def fit_thrust_curve(paths=None, window=1.0, min_rms=3 * GYRO_NOISE_FLOOR):
+    """
+    Fit the blowdown curve to the vibration envelopes of the open_nozzle logs.
+
+    Every log gets its own amplitude (mounting and sensor orientation
+    differ between test days) and all share tau and floor. A soft-L1 loss
+    keeps bumps of the test stand from pulling the fit.
+
+    :param paths: Log files, defaults to tests/test_data/open_nozzle_*.csv
+    :param window: Envelope window (s)
+    :param min_rms: Logs whose median envelope is below this (no flow) are skipped
+    :return: Dict with tau (s of on-time), floor, and per-log amplitude,
+        on_time and rms
+    """
+    from scipy.optimize import least_squares
+
+    paths = sorted(glob.glob(os.path.join(TEST_DATA, "open_nozzle_*.csv"))) if paths is None else paths
+    logs = []
+    for path in paths:
+        on_time, rms = vibration_envelope(load_nozzle_log(path), window)
+        if rms.size and np.median(rms) > min_rms:
+            logs.append((os.path.basename(path), on_time, rms))
+    if not logs:
+        raise ValueError("No open_nozzle log shows any flow to fit")
+
+    # Residuals relative to each log's typical level, so every log weighs
+    # in by its sample count rather than by its vibration amplitude
+    scales = [np.median(rms) for _, _, rms in logs]
+
+    def residuals(x):
+        tau, floor = x[:2]
+        return np.concatenate([(amplitude * blowdown(on_time, tau, floor) - rms) / scale
+                               for amplitude, scale, (_, on_time, rms) in zip(x[2:], scales, logs)])
+
+    longest = max(on_time[-1] for _, on_time, _ in logs)
+    x0 = np.concatenate([[longest, 0.3], [max(scales)] * len(logs)])
+    lower = np.concatenate([[1e-3, 0.0], np.zeros(len(logs))])
+    upper = np.concatenate([[np.inf, 1.0], np.full(len(logs), np.inf)])
+    fit = least_squares(residuals, x0, bounds=(lower, upper), loss="soft_l1", f_scale=0.1)
+
+    tau, floor = fit.x[:2]
+    return {
+        "tau": float(tau),
+        "floor": float(floor),
+        "max_on_time": float(longest),
+        "logs": {name: {"amplitude": float(a), "on_time": on_time, "rms": rms}
+                 for a, (name, on_time, rms) in zip(fit.x[2:], logs)},
+    }
+
+
+class ThrustTable:
+    """
+    Relative thrust against cumulative valve on-time on a uniform grid.
+
+    lookup() is a plain index-and-blend, so it costs a few array operations
+    per step for the whole batch. On-times past the end of the table hold
+    the last value.
+    """
+
+    def __init__(self, step, values):
+        self.step = float(step)
+        self.values = np.asarray(values, dtype=float)
+
+    @classmethod
+    def from_fit(cls, fit, points=64, max_on_time=None):
+        """
+        Tabulate a fit_thrust_curve() result up to max_on_time (default:
+        the longer of the longest log and 3 tau).
+        """
+        end = max_on_time or max(fit["max_on_time"], 3 * fit["tau"])
+        grid = np.linspace(0.0, end, points)
+        return cls(grid[1] - grid[0], blowdown(grid, fit["tau"], fit["floor"]))
+
+    def lookup(self, on_time):
+        """
+        Relative thrust (1 at a full tank) for any array of on-times (s).
+        """
+        x = np.asarray(on_time, dtype=float) / self.step
+        i = np.clip(x.astype(np.int64), 0, self.values.size - 2)
+        frac = np.clip(x - i, 0.0, 1.0)
+        return self.values[i] + frac * (self.values[i + 1] - self.values[i])
+
+    def save(self, path):
+        np.savez(path, step=self.step, values=self.values)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(float(data["step"]), data["values"])
+
+
+if __name__ == "__main__":
+    fit = fit_thrust_curve()
+    print(f"tau = {fit['tau']:.1f} s of valve on-time, floor = {fit['floor']:.3f}")
+    for name, log in fit["logs"].items():
+        print(f"  {name}: {log['on_time'][-1]:.0f} s on-time, amplitude {log['amplitude']:.3f} rad/s")
+    table = ThrustTable.from_fit(fit)
+    table.save("thrust_table.npz")
+    print(f"Wrote thrust_table.npz ({table.values.size} points, step {table.step:.2f} s)")
@@ -0,0 +1,193 @@
+# ============================================================
+# Coarse-to-fine gain tuner for the GNC Hapsis rotation sim
+#
+# Starts from a coarse Kp x Kd grid flown on a few seeds, then
+# zooms in around the best cells. Every zoom level is raced with
+# successive halving: all candidates fly a few disturbance seeds,
+# the worse half is dropped, the rest get twice the seeds, and so
+# on. CPU goes to the promising gains instead of a fine grid.
+#
+# (fine_coarse_tuner.py is the Raspberry Pi relay test script and
+# is unrelated.)
+#
+# ============================================================
+
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .campaign import NOMINAL
+from .metrics import BAND
+from .sweep import disturbance_table, evaluate
+
+
+def score(runs, cost):
+    """
+    Combine per-run costs into one number per run.
+
+    :param runs: Dict of cost name -> (n_points, n_seeds) array
+    :param cost: Cost name, or dict of cost name -> weight
+    """
+    if isinstance(cost, str):
+        return runs[cost]
+    return sum(weight * runs[name] for name, weight in cost.items())
+
+
+def refine_grid(centers, step, n, low, high):
+    """
+    Local n x n grids of half-width step around every center.
+
+    :return: Unique (n_points, 2) array of (Kp, Kd) candidates
+    """
+    offsets = np.linspace(-1.0, 1.0, n)
+    dKp, dKd = np.meshgrid(offsets, offsets, indexing="ij")
+    local = np.column_stack([dKp.ravel(), dKd.ravel()]) * step
+    points = np.clip((centers[:, None, :] + local[None]).reshape(-1, 2), low, high)
+    return np.unique(points.round(12), axis=0)
+
+
+class Race:
+    """
+    Successive halving over a fixed candidate list, sharing one table of
+    disturbance draws so every candidate sees the same seeds.
+    """
+
+    def __init__(self, law, params, table, cost, chunk_size, pool, band, cache=None):
+        self.law = law
+        self.params = params
+        self.table = table
+        self.cost = cost
+        self.chunk_size = chunk_size
+        self.pool = pool
+        self.band = band
+        self.cache = cache
+        self.runs = 0
+
+    def fly(self, points, first, last):
+        """
+        Per-seed scores of points on draws first:last, shape (n_points, last - first).
+        """
+        grid = {"Kp": points[:, 0], "Kd": points[:, 1]}
+        runs = evaluate(self.law, self.params, grid, self.table[first:last],
+                        self.chunk_size, self.pool, self.band, self.cache)
+        self.runs += points.shape[0] * (last - first)
+        return score(runs, self.cost)
+
+    def run(self, points, keep, min_seeds, max_seeds, eta):
+        """
+        Race points down to keep survivors.
+
+        :return: (survivors, mean scores, seeds flown by the survivors)
+        """
+        seeds = min(min_seeds, max_seeds)
+        total = self.fly(points, 0, seeds).sum(axis=1)
+        while True:
+            mean = total / seeds
+            if points.shape[0] <= keep or seeds >= max_seeds:
+                break
+            survive = np.argsort(mean, kind="stable")[:max(keep, math.ceil(points.shape[0] / eta))]
+            points, total = points[survive], total[survive]
+            more = min(seeds * eta, max_seeds)
+            total = total + self.fly(points, seeds, more).sum(axis=1)
+            seeds = more
+        order = np.argsort(mean, kind="stable")[:keep]
+        return points[order], mean[order], seeds
+
+
+def tune(Kp_range=(0.05, 2.0), Kd_range=(0.02, 1.0), law="main", cost="rms_error",
+         coarse=10, keep=3, levels=3, refine=5, min_seeds=4, max_seeds=64, eta=2,
+         seed=0, params=None, chunk_size=2000, workers=None, band=BAND, cache=None):
+    """
+    Find the best (Kp, Kd) for a control law.
+
+    :param Kp_range: (low, high) proportional gain search range
+    :param Kd_range: (low, high) derivative gain search range
+    :param law: Key of controllers.FLIGHT_LAWS; its other gains stay fixed
+    :param cost: Cost to minimize (see sweep.COSTS), or dict of name -> weight
+    :param coarse: Points per axis of the coarse grid
+    :param keep: Cells kept after each level and zoomed in on
+    :param levels: Number of zoom levels after the coarse grid
+    :param refine: Points per axis of each local grid
+    :param min_seeds: Seeds every candidate flies before the first cut
+    :param max_seeds: Seeds flown by the finalists
+    :param eta: Halving factor: keep 1/eta of the field, fly eta times the seeds
+    :param seed: Seed for the shared disturbance draws
+    :param params: Overrides for the campaign.NOMINAL parameters
+    :param chunk_size: Runs per chunk (one batch per worker task)
+    :param workers: Process count, defaults to os.cpu_count(). Use 1 to
+        run in this process.
+    :param band: Half-width of the heading band (rad)
+    :param cache: Optional cache.ResultCache shared with earlier sessions
+    :return: Dict with the best Kp, Kd, its mean cost and tuning history
+    """
+    params = {**NOMINAL, **(params or {})}
+    table = disturbance_table(params, max_seeds, seed)
+    low = np.array([Kp_range[0], Kd_range[0]])
+    high = np.array([Kp_range[1], Kd_range[1]])
+
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        race = Race(law, params, table, cost, chunk_size, pool, band, cache)
+
+        Kp, Kd = np.meshgrid(np.linspace(*Kp_range, coarse), np.linspace(*Kd_range, coarse),
+                             indexing="ij")
+        points = np.column_stack([Kp.ravel(), Kd.ravel()])
+        step = (high - low) / (coarse - 1)
+
+        history = []
+        winner = None
+        for level in range(levels + 1):
+            best, mean, seeds = race.run(points, keep, min_seeds, max_seeds, eta)
+            row = {"level": level, "candidates": points.shape[0],
+                   "Kp": float(best[0, 0]), "Kd": float(best[0, 1]),
+                   "cost": float(mean[0]), "seeds": seeds, "runs": race.runs}
+            history.append(row)
+            # A finer level can lose the incumbent to noise on its first seeds
+            if winner is None or (row["seeds"], -row["cost"]) >= (winner["seeds"], -winner["cost"]):
+                winner = row
+            # Zoom in: the next local grids span one old cell on each side
+            points = refine_grid(best, step, refine, low, high)
+            step = step * 2 / (refine - 1)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return {"law": law, "Kp": winner["Kp"], "Kd": winner["Kd"], "cost": winner["cost"],
+            "seeds": winner["seeds"], "runs": race.runs, "history": history}
+
+
+def write_gains(path, gains):
+    """
+    Save tuned gains where the flight code can pick them up.
+
+    The format follows the file extension:
+    .json  {"Kp": ..., "Kd": ...}, readable by CircuitPython's json module
+    .py    Kp = ... / Kd = ..., for `from gains import Kp, Kd`
+    .h     #define PID_KP ... / PID_KD ..., the names used in STAG Config.h
+    """
+    Kp, Kd = float(gains["Kp"]), float(gains["Kd"])
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        text = json.dumps({"Kp": Kp, "Kd": Kd}, indent=2) + "\n"
+    elif ext == ".py":
+        text = f"# Tuned by polaris/simulation/tuner.py\nKp = {Kp!r}\nKd = {Kd!r}\n"
+    elif ext == ".h":
+        text = f"// Tuned by polaris/simulation/tuner.py\n#define PID_KP {Kp!r}\n#define PID_KD {Kd!r}\n"
+    else:
+        raise ValueError(f"Unknown gains file type '{ext}', expected .json, .py or .h")
+    with open(path, "w") as file:
+        file.write(text)
+
+
+if __name__ == "__main__":
+    best = tune()
+    for row in best["history"]:
+        print(f"level {row['level']}: {row['candidates']:4d} candidates -> "
+              f"Kp = {row['Kp']:.4f}, Kd = {row['Kd']:.4f}, cost = {row['cost']:.4f} "
+              f"({row['seeds']} seeds, {row['runs']} runs so far)")
+    write_gains("best_gains.json", best)
+    print("Wrote best_gains.json")
@@ -3,52 +3,85 @@ import matplotlib.pyplot as plt
 import numpy as np
 import sys
 import os
+import io
+
+
+# Columns of a data row, from the CircuitPython print():
+# Time,Angular Position,R Solenoid,L Solenoid,Angular Vel X,Angular Vel Y,Angular Vel Z,PID Error,P,D
+COLUMNS = ['Delta_Time', 'Angular_Position', 'R_Solenoid', 'L_Solenoid',
+           'Gyro_X', 'Gyro_Y', 'Gyro_Z', 'PID_Output', 'Error', 'Derivative']
 
 
 def parse_log_file(filename):
     """
     Parse the serial log file and extract data into a DataFrame.
 
+    The whole file is scanned as one byte array: lines that are not
+    "[timestamp] " followed by exactly len(COLUMNS) comma separated
+    fields (the log header, "Left Firing", bare error numbers, ERROR:
+    lines) are dropped in bulk, the bracketed host timestamp becomes a
+    leading field, and what is left goes through a single read_csv pass.
+
     Args:
         filename: Path to the log file
 
     Returns:
-        DataFrame with parsed data
+        DataFrame with parsed data, plus Host_Time (datetime64, when the
+        logger received the line) and Time (cumulative Delta_Time)
     """
-    data_lines = []
-
-    with open(filename, 'r') as f:
-        lines = f.readlines()
-
-    # Skip header lines and parse data
-    for line in lines:
-        # Look for lines with timestamps in brackets
-        if line.startswith('['):
-            # Extract the data after the timestamp
-            parts = line.split('] ')
-            if len(parts) > 1:
-                data = parts[1].strip()
-                # Skip debug messages like "Left Firing", "Right Firing", error numbers
-                if ',' in data and not data.startswith('ERROR'):
-                    data_lines.append(data)
-
-    # Create DataFrame
-    # Expected columns based on your CircuitPython code:
-    # Time,Angular Position,R Solenoid,L Solenoid,Angular Vel X,Angular Vel Y,Angular Vel Z,PID Error,P,D
-    columns = ['Delta_Time', 'Angular_Position', 'R_Solenoid', 'L_Solenoid',
-               'Gyro_X', 'Gyro_Y', 'Gyro_Z', 'PID_Output', 'Error', 'Derivative']
-
-    # Parse the data
-    parsed_data = []
-    for line in data_lines:
-        try:
-            values = [float(x.strip()) for x in line.split(',')]
-            if len(values) == len(columns):
-                parsed_data.append(values)
-        except ValueError:
-            continue  # Skip lines that can't be parsed
-
-    df = pd.DataFrame(parsed_data, columns=columns)
+    empty = pd.DataFrame({'Host_Time': pd.Series(dtype='datetime64[ns]'),
+                          **{column: pd.Series(dtype=float) for column in COLUMNS + ['Time']}})
+    raw = np.fromfile(filename, dtype=np.uint8)
+    if not raw.size:
+        return empty
+    if raw[-1] != ord('\n'):
+        raw = np.append(raw, np.uint8(ord('\n')))
+    ends = np.flatnonzero(raw == ord('\n'))
+    starts = np.concatenate([[0], ends[:-1] + 1])
+
+    # Data lines: "[", a "] " on the same line and the right number of
+    # commas (the timestamp itself has none)
+    brackets = np.flatnonzero(raw == ord(']'))
+    close = np.append(brackets, raw.size)[np.searchsorted(brackets, starts)]
+    after = raw[np.minimum(close + 1, raw.size - 1)]
+    commas = np.flatnonzero(raw == ord(','))
+    commas = np.searchsorted(commas, ends) - np.searchsorted(commas, starts)
+    keep = ((raw[starts] == ord('[')) & (close < ends) & (after == ord(' '))
+            & (commas == len(COLUMNS) - 1))
+    if not keep.any():
+        return empty
+
+    # "[ts] data" -> "ts,data": drop the "[" and the space, "]" becomes ","
+    raw[close[keep]] = ord(',')
+    mask = np.repeat(keep, ends - starts + 1)
+    mask[starts[keep]] = False
+    mask[close[keep] + 1] = False
+
+    data = io.BytesIO(raw[mask])
+    del raw, mask
+    # No NA detection: "None", "N/A" and empty fields must reach the
+    # coercion below as text, like float() used to see them
+    df = pd.read_csv(data, header=None, names=['Host_Time'] + COLUMNS, dtype={'Host_Time': str},
+                     keep_default_na=False, na_filter=False)
+
+    # One coercion pass for columns that caught a malformed value (e.g. a
+    # column header line); rows with any field that is not a number are
+    # dropped, as float() used to reject them line by line. The few
+    # fields to_numeric() leaves NaN get float() itself, which also
+    # takes "nan", "inf" and "1_0"
+    bad = np.zeros(len(df), dtype=bool)
+    for column in COLUMNS:
+        if not pd.api.types.is_float_dtype(df[column]):
+            text = df[column]
+            values = pd.to_numeric(text, errors='coerce').to_numpy(dtype=float, copy=True)
+            for row in np.flatnonzero(np.isnan(values)):
+                try:
+                    values[row] = float(text.iat[row])
+                except ValueError:
+                    bad[row] = True
+            df[column] = values
+    df['Host_Time'] = pd.to_datetime(df['Host_Time'], format='%Y-%m-%d %H:%M:%S.%f', errors='coerce')
+    df = df[~bad].reset_index(drop=True)
 
     # Create cumulative time column
     df['Time'] = df['Delta_Time'].cumsum()
@@ -0,0 +1,111 @@
+# ============================================================
+# Valve model vs a per-sample reference, and the metrics that
+# read the delivered thrust
+#
+# ============================================================
+
+import numpy as np
+
+from polaris.simulation.actuator import ValveActuator, valve_actuator
+from polaris.simulation.campaign import NOMINAL
+from polaris.simulation.controllers import flight_law
+from polaris.simulation.engine import BatchSimulator, cylinder_inertia
+from polaris.simulation.metrics import gas_used, pulse_count, summarize, thruster_duty
+
+DT = 0.01
+
+
+def reference_valve(commands, open_lag, close_lag, min_steps):
+    """
+    One valve, one sample at a time: it opens open_lag samples after it is
+    commanded open, closes close_lag samples after it is commanded shut,
+    and never closes before it has been open for min_steps samples.
+    """
+    is_open, open_for, state = False, 0, []
+    for i in range(len(commands)):
+        if is_open:
+            is_open = (i >= close_lag and commands[i - close_lag]) or open_for < min_steps
+        else:
+            is_open = i >= open_lag and commands[i - open_lag]
+        open_for = open_for + 1 if is_open else 0
+        state.append(is_open)
+    return np.array(state)
+
+
+def reference_actuator(command, open_delay, close_delay, min_on, skew, balance):
+    def steps(delay):
+        return int(np.rint(max(delay, 0.0) / DT))
+
+    lags = [max(-skew, 0.0), max(skew, 0.0)]
+    valves = [reference_valve(command * sign > 0, steps(open_delay + lag), steps(close_delay + lag), steps(min_on))
+              for sign, lag in zip((1, -1), lags)]
+    return valves[0] * 1.0 - valves[1] * balance, valves[0].astype(int) + valves[1]
+
+
+def random_commands(n, steps, seed):
+    # Bursts of constant command of random length, like a bang-bang loop
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 12, (n, steps))
+    values = rng.integers(-1, 2, (n, steps))
+    return np.stack([np.repeat(values[k], lengths[k])[:steps] for k in range(n)]).astype(np.int8)
+
+
+def test_valves_match_per_sample_reference():
+    params = {
+        "open_delay": np.array([0.0, 0.02, 0.05, 0.03, 0.0, 0.1]),
+        "close_delay": np.array([0.0, 0.01, 0.02, 0.06, 0.04, 0.0]),
+        "min_on": np.array([0.0, 0.0, 0.05, 0.08, 0.03, 0.2]),
+        "skew": np.array([0.0, 0.01, -0.02, 0.03, 0.0, -0.05]),
+        "balance": np.array([1.0, 0.9, 1.0, 0.8, 1.2, 1.0]),
+    }
+    n, steps = params["skew"].size, 3000
+    commands = random_commands(n, steps, seed=0)
+
+    actuator = ValveActuator(**params)
+    actuator.reset(n, DT)
+    applied, flow = np.empty((n, steps)), np.empty((n, steps))
+    for i in range(steps):
+        applied[:, i] = actuator.step(commands[:, i])
+        flow[:, i] = actuator.flow
+
+    for k in range(n):
+        reference, open_valves = reference_actuator(commands[k], **{name: value[k] for name, value in params.items()})
+        np.testing.assert_array_equal(applied[k], reference)
+        np.testing.assert_array_equal(flow[k], open_valves)
+
+
+def test_minimum_impulse_bit():
+    # A one-sample command still opens the valve for min_on, after open_delay
+    actuator = ValveActuator(open_delay=0.03, close_delay=0.01, min_on=0.05)
+    actuator.reset(1, DT)
+    command = np.zeros(20, dtype=np.int8)
+    command[2] = -1
+    applied = np.array([actuator.step(command[i:i + 1])[0] for i in range(20)])
+    np.testing.assert_array_equal(np.flatnonzero(applied), np.arange(5, 10))
+    assert np.all(applied[5:10] == -1)
+
+
+def test_ideal_valves():
+    assert valve_actuator(NOMINAL) is None
+    commands = random_commands(3, 500, seed=1)
+    actuator = ValveActuator()
+    actuator.reset(3, DT)
+    applied = np.stack([actuator.step(commands[:, i]) for i in range(500)], axis=1)
+    np.testing.assert_array_equal(applied, commands)
+
+
+def test_metrics_count_delivered_thrust():
+    # The min impulse bit stretches the short pulses of the code.py deadzone
+    sim = BatchSimulator(cylinder_inertia(NOMINAL["M"], NOMINAL["R"]), flight_law("code", NOMINAL["setpoint"]),
+                         n=20, tf=20.0, n_steps=2000, actuator=ValveActuator(open_delay=0.02, min_on=0.1))
+    result = sim.run(np.random.default_rng(0))
+    assert not np.array_equal(result.applied, result.u)
+
+    np.testing.assert_allclose(gas_used(result), np.abs(result.applied).sum(axis=1) * result.dt)
+    np.testing.assert_allclose(thruster_duty(result), np.mean(result.applied != 0, axis=1))
+    assert np.all(gas_used(result) > np.abs(result.u).sum(axis=1) * result.dt)
+
+    applied = np.sign(result.applied)
+    onsets = (applied[:, 0] != 0) + np.sum((applied[:, 1:] != 0) & (applied[:, 1:] != applied[:, :-1]), axis=1)
+    np.testing.assert_array_equal(pulse_count(result), onsets)
+    np.testing.assert_array_equal(summarize(result)["pulses"], onsets)
@@ -0,0 +1,86 @@
+# ============================================================
+# Batch log analysis: summary rows and per-log figures
+#
+# ============================================================
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from polaris.simulation.analysis import SUMMARY, analyze, circular_stats
+
+HEADER = "Time,Angular Position,R Solenoid,L Solenoid,Angular Vel X,Angular Vel Y,Angular Vel Z,PID Error,P,D\n"
+
+ERROR = [20.0, 10.0, 3.0, 1.0, -2.0, 0.0, 1.0, 2.0, 0.0, 0.0]
+DT = [0.1, 0.1, 0.2, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1]
+RIGHT = [1, 1, 0, 0, 0, 0, 0, 0, 0, 0]
+LEFT = [0, 0, 1, 1, 0, 0, 0, 0, 0, 0]
+
+
+@pytest.fixture
+def logs(tmp_path):
+    root = tmp_path / "logs"
+    (root / "flight").mkdir(parents=True)
+    with open(root / "flight" / "code.csv", "w") as file:
+        file.write(HEADER)
+        for dt, e, right, left in zip(DT, ERROR, RIGHT, LEFT):
+            file.write(f"{dt},{90 - e},{right},{left},0.0,0.0,0.0,0.0,{e},0.0\n")
+    (root / "notes.txt").write_text("nothing to see\n")
+    return str(root)
+
+
+def test_summary_of_a_tiny_log(logs):
+    table = analyze(logs, workers=1)
+    assert list(table.columns) == SUMMARY and len(table) == 2
+    row = table.set_index("path").loc[os.path.join(logs, "flight", "code.csv")]
+    assert row["dialect"] == "code" and row["samples"] == 10
+    # t is the running sum of the logged loop times
+    assert row["duration"] == pytest.approx(sum(DT[1:]))
+    assert row["rms_error"] == pytest.approx(np.sqrt(np.mean(np.square(ERROR))))
+    assert row["max_error"] == pytest.approx(20.0)
+    assert row["settling_time"] == pytest.approx(0.3)
+    assert row["pos_duty"] == pytest.approx(0.2) and row["neg_duty"] == pytest.approx(0.2)
+    assert row["duty"] == pytest.approx(0.4)
+    # Each row's valves hold for its own loop time
+    assert row["on_time"] == pytest.approx(0.1 + 0.1 + 0.2 + 0.1)
+    assert row["pulses"] == 2
+    assert row["heading_mean"] == pytest.approx(90 - np.mean(ERROR), abs=0.1)
+    assert np.isnan(row["valve_duty"])
+    assert pd.isna(row["figure"])
+
+
+def test_heading_statistics_are_circular():
+    mean, std = circular_stats([350.0, 10.0, 355.0, 5.0])
+    assert min(mean, 360.0 - mean) == pytest.approx(0.0, abs=1e-9)
+    assert std == pytest.approx(circular_stats([170.0, 190.0, 175.0, 185.0])[1])
+    assert std == pytest.approx(7.9, abs=0.1)
+    assert circular_stats([90.0, 90.0]) == pytest.approx((90.0, 0.0))
+    assert circular_stats([0.0, 180.0])[1] > 180.0
+
+
+def test_single_valve_log_has_its_own_duty(tmp_path):
+    path = tmp_path / "nozzle.csv"
+    path.write_text("Nozzle 1 state,Nozzle 2 state,Time,Gyro X,Gyro Y,Gyro Z,Accel X,Accel Y,Accel Z\n"
+                    + "".join(f"{level},{0.01 * k},0,0,0,0,0,16384\n" for k, level in enumerate([0, 0, 1, 1])))
+    row = analyze(str(path), workers=1).iloc[0]
+    assert row["dialect"] == "nozzle-single"
+    assert row["valve_duty"] == pytest.approx(0.5)
+    assert np.isnan(row["pos_duty"]) and np.isnan(row["neg_duty"])
+
+
+def test_unrecognized_file_row(logs):
+    row = analyze(logs, workers=1).set_index("path").loc[os.path.join(logs, "notes.txt")]
+    assert row[["dialect", "figure"]].isna().all()
+    assert row[["samples", "rms_error", "pos_duty"]].isna().all()
+
+
+def test_figures_mirror_the_log_tree(logs, tmp_path):
+    pytest.importorskip("matplotlib")
+    figures = str(tmp_path / "figures")
+    table = analyze(logs, figures=figures, workers=1).set_index("path")
+    figure = os.path.join(figures, "flight", "code.png")
+    assert table.loc[os.path.join(logs, "flight", "code.csv"), "figure"] == figure
+    assert os.path.getsize(figure) > 0
+    assert sorted(os.listdir(figures)) == ["flight"]
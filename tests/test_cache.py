@@ -0,0 +1,49 @@
+# ============================================================
+# On-disk results cache
+#
+# ============================================================
+
+import os
+
+import numpy as np
+
+from polaris.simulation.cache import ResultCache, cache_key
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = cache_key({"Kp": 0.9, "table": np.arange(100.0)})
+    assert cache.get(key) is None
+    cache.put(key, {"rms_error": np.array([0.1, 0.2])})
+    np.testing.assert_array_equal(cache.get(key)["rms_error"], [0.1, 0.2])
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache_key({"Kp": 0.9, "table": np.arange(100.0)}) == key
+    assert cache_key({"Kp": 1.0, "table": np.arange(100.0)}) != key
+
+
+def test_evict_leaves_files_being_written(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=0)
+    key = cache_key({"Kp": 0.9})
+    cache.put(key, {"x": np.zeros(10)}, evict=False)
+    # Another worker's put() in flight in the same shard
+    partial = os.path.join(os.path.dirname(cache.path(key)), "tmpabc.npz.tmp")
+    with open(partial, "wb") as file:
+        file.write(b"partial")
+
+    assert [path for _, _, path in cache.entries()] == [cache.path(key)]
+    cache.evict()
+    assert cache.entries() == []
+    assert os.path.exists(partial)
+
+
+def test_memoize_computes_once(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"x": np.ones(3)}
+
+    for _ in range(3):
+        np.testing.assert_array_equal(cache.memoize({"law": "code"}, compute)["x"], np.ones(3))
+    assert len(calls) == 1
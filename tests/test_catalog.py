@@ -0,0 +1,89 @@
+# ============================================================
+# Log catalog: incremental rescans, pruning and summary metrics
+#
+# ============================================================
+
+import os
+
+import numpy as np
+import pytest
+
+from polaris.simulation.catalog import query, scan
+
+HEADER = "Time,Angular Position,R Solenoid,L Solenoid,Angular Vel X,Angular Vel Y,Angular Vel Z,PID Error,P,D\n"
+
+# code.py rows every 0.1 s: out of the 5 deg band for the first two,
+# right valve (negative torque) then left valve (positive) pulses
+ERROR = [20.0, 10.0, 3.0, 1.0, -2.0, 0.0, 1.0, 2.0, 0.0, 0.0]
+RIGHT = [1, 1, 0, 0, 0, 0, 0, 0, 0, 0]
+LEFT = [0, 0, 0, 1, 1, 0, 0, 0, 0, 0]
+
+
+def code_log(path, error=ERROR):
+    with open(path, "w") as file:
+        file.write(HEADER)
+        for e, right, left in zip(error, RIGHT, LEFT):
+            file.write(f"0.1,{90 + e},{right},{left},0.0,0.0,0.0,0.0,{e},0.0\n")
+    return str(path)
+
+
+@pytest.fixture
+def logs(tmp_path):
+    root = tmp_path / "logs"
+    root.mkdir()
+    code_log(root / "settled.csv")
+    code_log(root / "unsettled.csv", ERROR[:-1] + [8.0])
+    (root / "notes.txt").write_text("nothing to see\n")
+    return str(root), str(tmp_path / "catalog.sqlite")
+
+
+def test_summary_metrics(logs):
+    root, db = logs
+    scan(root, db, workers=1)
+    row = query(db, where="path = ?", params=(os.path.join(root, "settled.csv"),)).iloc[0]
+    assert row["dialect"] == "code" and row["samples"] == 10
+    assert row["duration"] == pytest.approx(0.9)
+    assert row["loop_rate"] == pytest.approx(10.0)
+    assert row["rms_error"] == pytest.approx(np.sqrt(np.mean(np.square(ERROR))))
+    assert row["settling_time"] == pytest.approx(0.2)
+    assert row["duty"] == pytest.approx(0.4)
+    assert row["pulses"] == 2
+
+
+def test_unrecognized_file_has_null_dialect(logs):
+    root, db = logs
+    scan(root, db, workers=1)
+    row = query(db, where="path LIKE '%notes.txt'").iloc[0]
+    assert row["dialect"] is None
+    assert np.isnan(row["samples"]) and np.isnan(row["rms_error"])
+
+
+def test_rescan_skips_unchanged_logs(logs):
+    root, db = logs
+    assert scan(root, db, workers=1) == {"scanned": 3, "skipped": 0, "pruned": 0}
+    assert scan(root, db, workers=1) == {"scanned": 0, "skipped": 3, "pruned": 0}
+
+    path = os.path.join(root, "settled.csv")
+    with open(path, "a") as file:
+        file.write("0.1,90.0,0,0,0.0,0.0,0.0,0.0,0.0,0.0\n")
+    assert scan(root, db, workers=1) == {"scanned": 1, "skipped": 2, "pruned": 0}
+    assert query(db, where="path = ?", params=(path,))["samples"].iloc[0] == 11
+
+
+def test_prune(logs):
+    root, db = logs
+    scan(root, db, workers=1)
+    os.unlink(os.path.join(root, "unsettled.csv"))
+    assert scan(root, db, workers=1, prune=False)["pruned"] == 0
+    assert len(query(db)) == 3
+    assert scan(root, db, workers=1) == {"scanned": 0, "skipped": 2, "pruned": 1}
+    assert not query(db)["path"].str.endswith("unsettled.csv").any()
+
+
+def test_missing_metrics_sort_last(logs):
+    root, db = logs
+    scan(root, db, workers=1)
+    table = query(db, order="settling_time")
+    assert table["path"].iloc[0].endswith(os.sep + "settled.csv")
+    assert table["settling_time"].iloc[1:].isna().all()
+    assert query(db, order="settling_time DESC")["path"].iloc[0].endswith(os.sep + "settled.csv")
@@ -0,0 +1,52 @@
+# ============================================================
+# Common-random-numbers comparison
+#
+# ============================================================
+
+import numpy as np
+import pytest
+
+from polaris.simulation.compare import compare, paired_difference
+from polaris.simulation.sensor import BNO055
+
+# Short runs keep the comparisons quick
+PARAMS = {"tf": 5.0, "n_steps": 500}
+
+
+def test_identical_candidates_fly_identical_runs():
+    # Valves and the BNO055 on, so every random stage is shared
+    params = {**PARAMS, **BNO055, "open_delay": 0.02, "close_delay": 0.02, "min_on": 0.02}
+    table = compare({"a": {"law": "code"}, "b": {"law": "code"}}, 60, params=params,
+                    dispersions={"M": (8.0, 12.0)}, chunk_size=25, workers=1)
+
+    assert table.loc["a"].equals(table.loc["b"])
+    for metric in ("rms_error", "gas_used", "pulses"):
+        s = paired_difference(table, metric, "a", "b")
+        assert s["mean"] == 0 and s["half_width"] == 0
+        assert s["unpaired_half_width"] > 0
+
+
+def test_candidates_see_the_same_draws():
+    table = compare({"sim": {"law": "main"}, "tuned": {"Kp": 1.13, "Kd": 0.456}}, 40, params=PARAMS,
+                    dispersions={"M": (8.0, 12.0)}, chunk_size=15, workers=1)
+    np.testing.assert_array_equal(table.loc["sim", "M"], table.loc["tuned", "M"])
+
+    s = paired_difference(table, "rms_error", "tuned", "sim")
+    assert s["n"] == 40
+    assert s["ci_low"] <= s["mean"] <= s["ci_high"]
+    assert s["variance_reduction"] > 1
+
+
+def test_compare_is_reproducible():
+    candidates = {"code": {"law": "code"}, "stag": {"law": "stag"}}
+    first = compare(candidates, 30, seed=7, params=PARAMS, chunk_size=10, workers=1)
+    again = compare(candidates, 30, seed=7, params=PARAMS, chunk_size=10, workers=2)
+    other = compare(candidates, 30, seed=8, params=PARAMS, chunk_size=10, workers=1)
+    assert first.equals(again)
+    assert not first.equals(other)
+
+
+def test_paired_difference_needs_two_runs():
+    table = compare({"a": {}, "b": {"Kp": 1.2}}, 1, params=PARAMS, workers=1)
+    with pytest.raises(ValueError):
+        paired_difference(table, "rms_error", "a", "b")
@@ -0,0 +1,302 @@
+# ============================================================
+# Batched controllers vs the flight loops they model
+#
+# Each flight loop is transcribed line for line as a scalar
+# reference (thruster flags, wraparound and all), fed the same
+# headings and loop periods as the batched controller, and the
+# commands must agree on every step.
+#
+# ============================================================
+
+import numpy as np
+import pytest
+
+from polaris.simulation.controllers import (FLIGHT_LAWS, BatchPID, ControllerGroup, DeadzonePD,
+                                            HysteresisPD, PulsePID, flight_law)
+
+
+class CircuitPythonPD:
+    """
+    The PD loop of polaris/code.py, with the alpha filter of PID-filter.py,
+    the missing else branch of old-code.py and the missing
+    previous_error = error of martian-filter.py as options.
+    """
+
+    def __init__(self, Kp, Kd, setpoint, threshold=5.0, alpha=1.0, latch=False, hold_error=False):
+        self.Kp = Kp
+        self.Kd = Kd
+        self.setpoint = setpoint
+        self.threshold = threshold
+        self.alpha = alpha
+        self.latch = latch
+        self.hold_error = hold_error
+        self.previous_error = 0
+        self.filtered_derivative = 0
+        self.positive_thruster_on = False
+        self.negative_thruster_on = False
+
+    def step(self, current_heading, delta_time):
+        error = (self.setpoint - current_heading + 180) % 360 - 180
+
+        raw_derivative = (error - self.previous_error) / delta_time if delta_time > 0 else 0
+        self.filtered_derivative = self.alpha * raw_derivative + (1 - self.alpha) * self.filtered_derivative
+        derivative = self.filtered_derivative
+        if not self.hold_error:
+            self.previous_error = error
+
+        output = (self.Kp * error) + (self.Kd * derivative)
+
+        if abs(output) > self.threshold:
+            if output > 0:  # IMPART NEGATIVE on the hardware
+                if not self.negative_thruster_on:
+                    self.negative_thruster_on = True
+                    self.positive_thruster_on = False
+            elif output < 0:
+                if not self.positive_thruster_on:
+                    self.positive_thruster_on = True
+                    self.negative_thruster_on = False
+        elif not self.latch:
+            self.positive_thruster_on = False
+            self.negative_thruster_on = False
+
+        return int(self.negative_thruster_on) - int(self.positive_thruster_on)
+
+
+class StagController:
+    """
+    PIDController::compute() and controlThrusters() of STAG
+    flight_controller_v3, with millis() advanced by the loop period.
+    """
+
+    def __init__(self, Kp, Kd, setpoint, threshold_on=5.0, threshold_off=2.0, min_pulse=50):
+        self.kp = Kp
+        self.kd = Kd
+        self.setpoint = setpoint
+        self.threshold_on = threshold_on
+        self.threshold_off = threshold_off
+        self.min_pulse = min_pulse
+        self.last_error = 0.0
+        self.millis = 0
+        self.left_on = False
+        self.right_on = False
+        self.on_time = 0
+
+    @staticmethod
+    def wrap_angle(angle):
+        while angle > 180.0:
+            angle -= 360.0
+        while angle < -180.0:
+            angle += 360.0
+        return angle
+
+    def compute(self, current_value, delta_time):
+        error = self.wrap_angle(self.setpoint - current_value)
+        derivative = 0.0
+        if delta_time > 0.0:
+            derivative = (error - self.last_error) / delta_time
+        self.last_error = error
+        return (self.kp * error) + (self.kd * derivative)
+
+    def control_thrusters(self, effort):
+        if (self.left_on or self.right_on) and self.millis - self.on_time < self.min_pulse:
+            return
+        if effort > self.threshold_on:
+            if not self.left_on:
+                self.left_on, self.right_on = True, False
+                self.on_time = self.millis
+        elif effort < -self.threshold_on:
+            if not self.right_on:
+                self.left_on, self.right_on = False, True
+                self.on_time = self.millis
+        elif abs(effort) < self.threshold_off:
+            self.left_on = self.right_on = False
+
+    def step(self, current_value, delta_time):
+        self.millis += int(round(delta_time * 1000))
+        self.control_thrusters(self.compute(current_value, delta_time))
+        return int(self.left_on) - int(self.right_on)
+
+
+class RP2040PID:
+    """
+    The PID loop of RP2040_files/integrationTest.py, with the scaled pulse
+    and non-exclusive firing of pidPico.py and the heading-only error and
+    missing turn-off of codeReview.py as options.
+    """
+
+    def __init__(self, Kp, Ki, Kd, setpoint, threshold=5.0, windup=1.0, pulse=0.5, pulse_gain=0.0,
+                 exclusive=True, from_heading=False):
+        self.Kp, self.Ki, self.Kd = Kp, Ki, Kd
+        self.setpoint = setpoint
+        self.threshold = threshold
+        self.windup = windup
+        self.pulse = pulse
+        self.pulse_gain = pulse_gain
+        self.exclusive = exclusive
+        self.from_heading = from_heading
+        self.previous_error = 0
+        self.integral = 0
+        self.current_time = 0.0
+        self.thruster_off_time = 0
+        self.right_thruster_on = False
+        self.left_thruster_on = False
+
+    def step(self, current_heading, delta_time):
+        self.current_time += delta_time
+        current_time = self.current_time
+
+        if self.from_heading:
+            if current_heading > 180:
+                error = current_heading - 360
+            else:
+                error = current_heading
+        else:
+            error = (self.setpoint - current_heading + 180) % 360 - 180
+
+        if abs(error) > self.windup:
+            self.integral += error * delta_time
+        derivative = (error - self.previous_error) / delta_time if delta_time > 0 else 0
+        self.previous_error = error
+
+        output = (self.Kp * error) + (self.Ki * self.integral) + (self.Kd * derivative)
+
+        if abs(error) > self.threshold:
+            duration = min(abs(output) * self.pulse_gain, self.pulse) if self.pulse_gain > 0 else self.pulse
+            if output > 0 and not self.right_thruster_on:
+                if self.exclusive:
+                    self.left_thruster_on = False
+                self.right_thruster_on = True
+                self.thruster_off_time = current_time + duration
+            elif output < 0 and not self.left_thruster_on:
+                if self.exclusive:
+                    self.right_thruster_on = False
+                self.left_thruster_on = True
+                self.thruster_off_time = current_time + duration
+
+        if self.right_thruster_on and current_time >= self.thruster_off_time:
+            self.right_thruster_on = False
+        if self.left_thruster_on and current_time >= self.thruster_off_time:
+            self.left_thruster_on = False
+
+        return int(self.right_thruster_on) - int(self.left_thruster_on)
+
+
+def headings(n, steps, seed):
+    """
+    (n, steps) random-walk headings (rad) that wrap through 0 and 360 deg
+    several times, and (steps,) loop periods around 20 ms.
+    """
+    rng = np.random.default_rng(seed)
+    theta = rng.uniform(-2 * np.pi, 2 * np.pi, (n, 1)) + np.cumsum(rng.normal(0.0, 0.01, (n, steps)), axis=1)
+    dts = rng.uniform(0.005, 0.04, steps)
+    return theta, dts
+
+
+def fly(controller, theta, dts):
+    controller.reset(theta.shape[0])
+    return np.stack([controller.step(theta[:, i], dt) for i, dt in enumerate(dts)], axis=1)
+
+
+def fly_scalar(controller, theta, dts):
+    # The BNO055 reports heading in degrees, 0 to 360
+    return np.array([controller.step(np.degrees(th) % 360.0, dt) for th, dt in zip(theta, dts)])
+
+
+@pytest.mark.parametrize("law", [name for name, (cls, _) in FLIGHT_LAWS.items() if cls is DeadzonePD])
+def test_deadzone_pd_matches_circuitpython_loop(law):
+    theta, dts = headings(4, 2000, seed=1)
+    setpoint = np.array([0.0, np.pi / 2, np.pi, 1.5 * np.pi])
+    commands = fly(flight_law(law, setpoint), theta, dts)
+
+    gains = FLIGHT_LAWS[law][1]
+    for k in range(len(setpoint)):
+        reference = fly_scalar(CircuitPythonPD(setpoint=np.degrees(setpoint[k]), **gains), theta[k], dts)
+        np.testing.assert_array_equal(commands[k], reference)
+    # Both thrusters fire, and the deadzone is visited
+    assert np.any(commands > 0) and np.any(commands < 0)
+    assert np.any(commands == 0) or gains.get("latch")
+
+
+def test_deadzone_pd_per_member_gains():
+    theta, dts = headings(3, 1000, seed=2)
+    Kp, Kd, threshold = np.array([0.3, 0.56, 1.2]), np.array([0.2, 0.5, 0.9]), np.array([1.0, 5.0, 10.0])
+    commands = fly(DeadzonePD(Kp, Kd, np.pi, threshold=threshold, alpha=0.2), theta, dts)
+    for k in range(3):
+        reference = fly_scalar(CircuitPythonPD(Kp[k], Kd[k], 180.0, threshold=threshold[k], alpha=0.2),
+                               theta[k], dts)
+        np.testing.assert_array_equal(commands[k], reference)
+
+
+@pytest.mark.parametrize("law", [name for name, (cls, _) in FLIGHT_LAWS.items() if cls is PulsePID])
+def test_pulse_pid_matches_rp2040_loop(law):
+    theta, dts = headings(4, 2000, seed=6)
+    setpoint = np.array([0.0, np.pi / 2, np.pi, 1.5 * np.pi])
+    commands = fly(flight_law(law, setpoint), theta, dts)
+
+    gains = FLIGHT_LAWS[law][1]
+    for k in range(len(setpoint)):
+        reference = fly_scalar(RP2040PID(setpoint=np.degrees(setpoint[k]), **gains), theta[k], dts)
+        np.testing.assert_array_equal(commands[k], reference)
+    assert np.any(commands > 0) and np.any(commands < 0)
+    assert np.any(commands == 0) or np.isinf(gains["pulse"])
+
+
+def test_pulse_pid_pulse_length():
+    # A steady error fires one thruster for 0.5 s, then again once it has expired
+    controller = PulsePID(Kp=0.9, Ki=0.0, Kd=0.0, setpoint=np.radians(20.0), threshold=5.0, pulse=0.5)
+    commands = fly(controller, np.zeros((1, 200)), np.full(200, 0.01))[0]
+    assert np.all(commands >= 0)
+    np.testing.assert_array_equal(np.flatnonzero(np.diff(commands.astype(int)) < 0), [49, 100, 151])
+
+
+def test_hysteresis_pd_matches_stag_loop():
+    theta, dts = headings(4, 3000, seed=3)
+    # Loop periods around the 100 Hz STAG loop so min_pulse spans several ticks
+    dts = np.round(dts / 4, 3)
+    setpoint = np.array([0.0, np.pi / 2, np.pi, 1.5 * np.pi])
+    commands = fly(flight_law("stag", setpoint), theta, dts)
+
+    gains = FLIGHT_LAWS["stag"][1]
+    for k in range(len(setpoint)):
+        reference = fly_scalar(StagController(setpoint=np.degrees(setpoint[k]), **gains), theta[k], dts)
+        np.testing.assert_array_equal(commands[k], reference)
+    assert np.all(np.isin(commands, [-1, 0, 1]))
+
+
+def test_hysteresis_pd_holds_min_pulse():
+    # Effort flips sign every tick; the thruster may only change every 50 ms
+    controller = HysteresisPD(Kp=10.0, Kd=0.0, setpoint=0.0)
+    theta = np.radians(np.tile([[-10.0, 10.0]], (1, 50)))
+    commands = fly(controller, theta, np.full(100, 0.01))[0]
+    changes = np.flatnonzero(np.diff(commands)) + 1
+    assert changes.size > 1
+    assert np.all(np.diff(changes) >= 5)
+
+
+def test_batch_pid_matches_pid_compute():
+    # misc_scripts/PID.py compute() followed by the sign law of main.py
+    theta, dts = headings(2, 500, seed=4)
+    Kp, Ki, Kd = np.array([0.9, 0.8]), np.array([0.0, 0.3]), np.array([0.45, 0.5])
+    pid = BatchPID(Kp, Ki, Kd, setpoint=np.pi)
+    commands = fly(pid, theta, dts)
+    for k in range(2):
+        previous_error, integral, command = 0, 0, 0
+        for i, dt in enumerate(dts):
+            error = np.pi - theta[k, i]
+            integral += error * dt
+            derivative = (error - previous_error) / dt if dt > 0 else 0
+            previous_error = error
+            output = Kp[k] * error + Ki[k] * integral + Kd[k] * derivative
+            if abs(output) > 0:
+                command = 1 if output > 0 else -1
+            assert commands[k, i] == command
+
+
+def test_controller_group_matches_separate_controllers():
+    theta, dts = headings(6, 500, seed=5)
+    laws = ["code", "pid-filter", "stag"]
+    group = ControllerGroup([flight_law(law, np.pi) for law in laws], [2, 2, 2])
+    commands = fly(group, theta, dts)
+    for j, law in enumerate(laws):
+        block = slice(2 * j, 2 * j + 2)
+        np.testing.assert_array_equal(commands[block], fly(flight_law(law, np.pi), theta[block], dts))
@@ -0,0 +1,71 @@
+# ============================================================
+# Batch engine vs the main.py loop
+#
+# ============================================================
+
+import numpy as np
+
+from polaris.simulation.controllers import BatchPID
+from polaris.simulation.engine import BatchSimulator, cylinder_inertia
+
+# Plant of main.py
+INERTIA = cylinder_inertia(10.0, 0.25)
+
+
+def main_loop(inertia, Kp, Ki, Kd, setpoint, disturbance, tf=20, n_steps=1000, torque=1.5):
+    """
+    The simulation loop of main.py with misc_scripts/PID.py, fed a
+    precomputed disturbance. Torque acts on the step it is commanded
+    (the original list indexing applied it two samples late).
+    """
+    dt = tf / n_steps
+    theta, omega, alpha, tau = [0], [0], [], []
+    previous_error, integral = 0, 0
+    tau_control = 0
+    for i in range(n_steps):
+        error = setpoint - theta[i]
+        integral += error * dt
+        derivative = (error - previous_error) / dt if dt > 0 else 0
+        previous_error = error
+        output = Kp * error + Ki * integral + Kd * derivative
+
+        if abs(output) > 0:
+            if output > 0:
+                tau_control = torque
+            else:
+                tau_control = -torque
+        tau.append(tau_control + disturbance[i])
+
+        alpha.append(tau[i] / inertia)
+        if i + 1 < n_steps:
+            omega.append(omega[i] + alpha[i] * dt)
+            theta.append(theta[i] + omega[i] * dt + 0.5 * alpha[i] * dt**2)
+    return np.array(theta), np.array(omega), np.array(tau)
+
+
+def test_single_member_matches_main_loop():
+    disturbance = np.random.default_rng(0).uniform(-1.0, 1.0, (1, 1000))
+    sim = BatchSimulator(INERTIA, BatchPID(Kp=0.9, Ki=0, Kd=0.45, setpoint=np.pi), n=1, tf=20, n_steps=1000)
+    run = sim.run(disturbance_torque=disturbance).member(0)
+
+    theta, omega, tau = main_loop(INERTIA, 0.9, 0, 0.45, np.pi, disturbance[0])
+    np.testing.assert_allclose(run["theta"], theta, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(run["omega"], omega, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(run["tau"], tau, rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(run["u"], np.sign(tau - disturbance[0]))
+
+
+def test_batch_members_are_independent_runs():
+    rng = np.random.default_rng(1)
+    n = 5
+    M, Kp, setpoint = rng.uniform(8, 12, n), rng.uniform(0.5, 1.5, n), rng.uniform(0, 2 * np.pi, n)
+    disturbance = rng.uniform(-1.0, 1.0, (n, 1000))
+    sim = BatchSimulator(cylinder_inertia(M, 0.25), BatchPID(Kp, 0.1, 0.45, setpoint))
+    result = sim.run(disturbance_torque=disturbance)
+    assert len(result) == n
+
+    for k in range(n):
+        theta, omega, tau = main_loop(cylinder_inertia(M[k], 0.25), Kp[k], 0.1, 0.45, setpoint[k], disturbance[k])
+        np.testing.assert_allclose(result.theta[k], theta, rtol=0, atol=1e-12)
+        np.testing.assert_allclose(result.omega[k], omega, rtol=0, atol=1e-12)
+        np.testing.assert_allclose(result.tau[k], tau, rtol=0, atol=1e-12)
@@ -0,0 +1,47 @@
+# ============================================================
+# Event-driven sim vs the fixed-step engine at fine steps
+#
+# ============================================================
+
+import numpy as np
+
+from polaris.simulation.controllers import BatchPID, DeadzonePD
+from polaris.simulation.engine import BatchSimulator, cylinder_inertia
+from polaris.simulation.events import EventSimulator
+
+# Plant of main.py
+INERTIA = cylinder_inertia(10.0, 0.25)
+
+
+def fine_step_error(controller, Kp, Kd, threshold, n_steps, tf=10.0):
+    """
+    Largest theta and omega gap between the fixed-step engine and the
+    event-driven sim, over held disturbances of both signs.
+    """
+    disturbance = np.array([-0.6, -0.2, 0.0, 0.3, 0.7])
+    theta0 = np.pi - 1.0
+    events = EventSimulator(INERTIA, Kp, Kd, np.pi, n=disturbance.size, tf=tf, threshold=threshold)
+    reference = events.run(disturbance, theta0=theta0)
+
+    sim = BatchSimulator(INERTIA, controller, n=disturbance.size, tf=tf, n_steps=n_steps)
+    result = sim.run(disturbance_torque=np.repeat(disturbance[:, None], n_steps, axis=1), theta0=theta0)
+    sampled = reference.sample(result.t)
+    return np.abs(sampled.theta - result.theta).max(), np.abs(sampled.omega - result.omega).max()
+
+
+def test_event_simulator_matches_fine_step_deadzone():
+    # A 5 degree deadzone on the degree-based code.py law is 5 * pi / 180 on s
+    law = DeadzonePD(Kp=0.56, Kd=0.50, setpoint=np.pi, threshold=5.0)
+    coarse = fine_step_error(law, 0.56, 0.50, np.radians(5.0), 5000)
+    fine = fine_step_error(law, 0.56, 0.50, np.radians(5.0), 20000)
+    assert fine[0] < 5e-3 and fine[1] < 1e-2
+    assert fine[0] < coarse[0] and fine[1] < coarse[1]
+
+
+def test_event_simulator_matches_fine_step_sliding():
+    # The sign-only law chatters on s = 0, which the event sim slides along
+    law = BatchPID(Kp=0.9, Ki=0.0, Kd=0.45, setpoint=np.pi)
+    coarse = fine_step_error(law, 0.9, 0.45, 0.0, 5000)
+    fine = fine_step_error(law, 0.9, 0.45, 0.0, 20000)
+    assert fine[0] < 5e-3 and fine[1] < 1e-2
+    assert fine[0] < coarse[0] and fine[1] < coarse[1]
@@ -0,0 +1,33 @@
+# ============================================================
+# Loop-rate study
+#
+# ============================================================
+
+import numpy as np
+
+from polaris.simulation.campaign import NOMINAL
+from polaris.simulation.latency import loop_rate_curve, loop_ticks, run_point
+
+
+def test_unsettled_runs_count_as_tf():
+    # Two seconds is too short to turn half a revolution and settle
+    params = {**NOMINAL, "tf": 2.0, "n_steps": 2000}
+    rows = run_point("code", params, 0.02, None, 4, np.random.SeedSequence(0))
+    assert not rows["settled"].any()
+    np.testing.assert_array_equal(rows["settling_time"], 2.0)
+
+
+def test_curve_reports_settled_fraction():
+    import pandas as pd
+
+    params = {**NOMINAL, "tf": 10.0, "n_steps": 10000}
+    table = pd.DataFrame(run_point("stag", params, 0.01, None, 6, np.random.SeedSequence(1)))
+    table.loc[:2, ["settled", "settling_time"]] = [False, 10.0]
+    curve = loop_rate_curve(table)
+    assert curve["settled"].iloc[0] == table["settled"].mean()
+    assert curve["settling_time"].iloc[0] == table["settling_time"].mean()
+
+
+def test_loop_ticks():
+    ticks = loop_ticks(np.full(10, 0.05), 0.01, 30)
+    np.testing.assert_array_equal(np.flatnonzero(ticks), [0, 5, 10, 15, 20, 25])
@@ -0,0 +1,73 @@
+# ============================================================
+# Limit-cycle predictor vs the batch engine, gain grids and the
+# points without a cycle
+#
+# ============================================================
+
+import numpy as np
+import pytest
+
+from polaris.simulation.actuator import ValveActuator
+from polaris.simulation.campaign import NOMINAL
+from polaris.simulation.controllers import flight_law
+from polaris.simulation.engine import BatchSimulator, cylinder_inertia
+from polaris.simulation.limit_cycle import law_parameters, limit_cycle
+
+
+def engine_amplitude(law, delays, tf, dt):
+    """
+    Half peak-to-peak heading (deg) over the second half of an undisturbed
+    engine flight, one member per command to thrust delay.
+    """
+    params = law_parameters(law)
+    delays = np.asarray(delays, dtype=float)
+    n_steps = int(round(tf / dt))
+    actuator = ValveActuator(open_delay=delays, close_delay=delays, min_on=params.get("min_pulse", 0.0))
+    sim = BatchSimulator(cylinder_inertia(NOMINAL["M"], NOMINAL["R"]), flight_law(law, np.pi), n=delays.size,
+                         tf=tf, n_steps=n_steps, actuator=actuator)
+    result = sim.run(disturbance_torque=np.zeros((delays.size, n_steps)), theta0=np.pi - 0.3)
+    heading = np.degrees(result.theta[:, n_steps // 2:])
+    return 0.5 * (heading.max(axis=1) - heading.min(axis=1))
+
+
+@pytest.mark.parametrize("law, delays, dt", [
+    # STAG counts whole milliseconds, so it flies at 1 ms steps
+    ("stag", [0.0, 0.02, 0.05], 0.001),
+    ("code", [0.05], 0.0005),
+])
+def test_limit_cycle_matches_engine(law, delays, dt):
+    cycle = limit_cycle(**law_parameters(law), delay=np.array(delays))
+    assert cycle["found"].all()
+    np.testing.assert_allclose(engine_amplitude(law, delays, 20.0, dt), cycle["amplitude"], rtol=0.05)
+
+
+def test_grid_broadcasts():
+    Kp = np.linspace(0.4, 1.6, 4)[None, :]
+    Kd = np.linspace(0.2, 1.0, 3)[:, None]
+    grid = limit_cycle(Kp, Kd, 5.0, 2.0, min_pulse=0.05, delay=0.02)
+    for name in ("amplitude", "offset", "period", "duty", "slope", "found"):
+        assert grid[name].shape == (3, 4)
+    assert grid["found"].dtype == bool
+
+    # Each grid point is the scalar call
+    for i, j in ((0, 0), (1, 2), (2, 3)):
+        point = limit_cycle(Kp[0, j], Kd[i, 0], 5.0, 2.0, min_pulse=0.05, delay=0.02)
+        assert point["found"] == grid["found"][i, j]
+        np.testing.assert_allclose(point["amplitude"], grid["amplitude"][i, j], rtol=1e-6)
+
+
+def test_points_without_a_cycle_are_nan():
+    # Without delay code.py's deadzone law comes to rest; with 50 ms it cycles
+    cycle = limit_cycle(**law_parameters("code"), delay=np.array([0.0, 0.05]))
+    np.testing.assert_array_equal(cycle["found"], [False, True])
+    for name in ("amplitude", "offset", "period", "duty", "slope"):
+        assert np.isnan(cycle[name][0]) and np.isfinite(cycle[name][1])
+
+    # The sign-only law slides on the switching line
+    sliding = limit_cycle(0.9, 0.45, threshold_on=0.0)
+    assert not sliding["found"] and np.isnan(sliding["amplitude"])
+
+
+def test_pulse_laws_are_rejected():
+    with pytest.raises(ValueError):
+        law_parameters("pico")
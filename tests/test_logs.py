@@ -0,0 +1,166 @@
+# ============================================================
+# Log dialect detection and canonical columns on small fixtures
+#
+# ============================================================
+
+import os
+
+import numpy as np
+import pytest
+
+from polaris.simulation import logs
+from polaris.simulation.logs import BMI160_ACCEL, BMI160_GYRO, cache_path, detect, load_log, read_log
+
+CODE_HEADER = "Time,Angular Position,R Solenoid,L Solenoid,Angular Vel X,Angular Vel Y,Angular Vel Z,PID Error,P"
+NOZZLE_HEADER = "Nozzle 1 state,Nozzle 2 state,Time,Gyro X,Gyro Y,Gyro Z,Accel X,Accel Y,Accel Z"
+STAG_HEADER = ("Timestamp,Temperature,Pressure,Altitude,Roll,Pitch,Heading,VerticalAccel,VerticalVel,"
+               "LeftThruster,RightThruster,MissionState")
+
+FIXTURES = {
+    "code": CODE_HEADER + ",D\n"
+            "0.05,90.0,1,0,0.0,0.0,0.1,0.9,-90.0,1.5\n"
+            "0.05,89.5,1,0,0.0,0.0,0.1,0.9,-89.5,1.2\n",
+    "integration": CODE_HEADER + ",I,D\n"
+                   "0.05,90.0,1,0,0.0,0.0,0.1,0.9,-90.0,-4.5,1.5\n"
+                   "0.05,89.5,1,0,0.0,0.0,0.1,0.9,-89.5,-9.0,1.2\n",
+    "square-wave": "Square wave test, period 2 s\n"
+                   "Time,DeltaT," + CODE_HEADER[5:] + "\n"
+                   "1.00,0.05,90.0,0,1,0.0,0.0,0.1,-1,-90.0\n"
+                   "1.05,0.05,89.5,0,1,0.0,0.0,0.1,-1,-89.5\n",
+    "nozzle": NOZZLE_HEADER + "\n"
+              "1,0,0.01,100,-200,300,1000,2000,16384\n"
+              "0,1,0.02,100,-200,300,1000,2000,16384\n",
+    "nozzle-single": NOZZLE_HEADER + "\n"
+                     "1,0.01,100,-200,300,1000,2000,16384\n"
+                     "0,0.02,100,-200,300,1000,2000,16384\n",
+    "pid-boiled": "Nozzle 1 state,Nozzle 2 state,Time,Vel Y\n"
+                  "1,0,0.01,-50\n"
+                  "0,1,0.02,50\n",
+    "serial": "Serial Log Started: 2025-11-12 19:30:16.316861\n"
+              "[2025-11-12 19:30:17.001] Heading: 90.0\n"
+              "[2025-11-12 19:30:17.051] 0.05,90.0,1,0,0.0,0.0,0.1,0.9,-90.0,1.5\n"
+              "[2025-11-12 19:30:17.101] 0.05,89.5,1,0,0.0,0.0,0.1,0.9,-89.5,1.2\n",
+    "stag-v2": STAG_HEADER.replace("VerticalVel,", "") + "\n"
+               "1000,21.5,101325,0.0,0.1,0.2,90.0,0.0,0,0,GROUND\n"
+               "1050,21.5,101320,0.4,0.1,0.2,91.0,9.8,0,1,ARMED\n",
+    "stag": STAG_HEADER + "\r\n"
+            "1000,21.5,101325,0.0,0.1,0.2,90.0,0.0,0.0,0,0,GROUND\r\n"
+            "1050,21.5,101320,0.4,0.1,0.2,91.0,9.8,0.5,1,0,GNC_ACTIVE\r\n",
+}
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / f"{name}.csv"
+    path.write_bytes(text.encode())
+    return str(path)
+
+
+@pytest.mark.parametrize("name", sorted(FIXTURES))
+def test_detects_each_dialect(tmp_path, name):
+    path = write(tmp_path, name, FIXTURES[name])
+    assert detect(path).name == name
+    frame = read_log(path)
+    assert frame.attrs["dialect"] == name and len(frame) == 2
+    assert list(frame.columns[:2]) == ["t", "dt"]
+
+
+def test_unrecognized_log(tmp_path):
+    with pytest.raises(ValueError):
+        detect(write(tmp_path, "notes", "hello\nworld\n"))
+
+
+def test_code_log_columns(tmp_path):
+    frame = read_log(write(tmp_path, "code", FIXTURES["code"]))
+    np.testing.assert_allclose(frame["t"], [0.05, 0.10])
+    np.testing.assert_allclose(frame["error"], [-90.0, -89.5])
+    # R Solenoid is the negative thruster
+    np.testing.assert_array_equal(frame["thrust_neg"], [1, 1])
+    np.testing.assert_array_equal(frame["thrust_pos"], [0, 0])
+
+
+def test_square_wave_keeps_its_preamble(tmp_path):
+    frame = read_log(write(tmp_path, "square-wave", FIXTURES["square-wave"]))
+    assert frame.attrs["preamble"] == ["Square wave test, period 2 s"]
+    np.testing.assert_allclose(frame["t"], [1.00, 1.05])
+
+
+def test_bmi160_counts_are_scaled(tmp_path):
+    frame = read_log(write(tmp_path, "nozzle", FIXTURES["nozzle"]))
+    np.testing.assert_allclose(frame[["gyro_x", "gyro_y", "gyro_z"]].iloc[0], np.array([100, -200, 300]) * BMI160_GYRO)
+    np.testing.assert_allclose(frame[["accel_x", "accel_y", "accel_z"]].iloc[0],
+                               np.array([1000, 2000, 16384]) * BMI160_ACCEL)
+    # 16384 counts is 1 g at the +/-2 g range
+    assert frame["accel_z"].iloc[0] == pytest.approx(9.80665)
+
+    frame = read_log(write(tmp_path, "pid-boiled", FIXTURES["pid-boiled"]))
+    np.testing.assert_allclose(frame["gyro_y"], np.array([-50, 50]) * BMI160_GYRO)
+
+
+def test_relay_levels_are_active_low(tmp_path):
+    # A relay level of 0 is an open valve
+    frame = read_log(write(tmp_path, "nozzle", FIXTURES["nozzle"]))
+    np.testing.assert_array_equal(frame["thrust_pos"], [0, 1])
+    np.testing.assert_array_equal(frame["thrust_neg"], [1, 0])
+    frame = read_log(write(tmp_path, "nozzle-single", FIXTURES["nozzle-single"]))
+    np.testing.assert_array_equal(frame["valve"], [0, 1])
+    # Nozzle 1 is the right valve on the PID_boiled.py bench
+    frame = read_log(write(tmp_path, "pid-boiled", FIXTURES["pid-boiled"]))
+    np.testing.assert_array_equal(frame["thrust_neg"], [0, 1])
+    np.testing.assert_array_equal(frame["thrust_pos"], [1, 0])
+    assert frame["thrust_pos"].dtype == np.int8
+
+
+def test_stag_crlf_and_states(tmp_path):
+    frame = read_log(write(tmp_path, "stag", FIXTURES["stag"]))
+    np.testing.assert_allclose(frame["t"], [1.0, 1.05])
+    np.testing.assert_allclose(frame["dt"], [0.0, 0.05])
+    assert list(frame["state"].astype(str)) == ["GROUND", "GNC_ACTIVE"]
+    np.testing.assert_array_equal(frame["thrust_pos"], [0, 1])
+
+
+def test_serial_capture_host_time(tmp_path):
+    frame = read_log(write(tmp_path, "serial", FIXTURES["serial"]))
+    assert list(frame["host_time"].dt.strftime("%H:%M:%S.%f")) == ["19:30:17.051000", "19:30:17.101000"]
+    np.testing.assert_allclose(frame["heading"], [90.0, 89.5])
+
+
+def test_load_log_reopens_from_the_cache(tmp_path, monkeypatch):
+    path = write(tmp_path, "stag", FIXTURES["stag"])
+    first = load_log(path)
+    assert os.path.exists(os.path.join(cache_path(path), "manifest.json"))
+
+    def no_parse(*args):
+        raise AssertionError("parsed a cached log")
+
+    monkeypatch.setattr(logs, "read_log", no_parse)
+    again = load_log(path)
+    assert again.attrs == first.attrs
+    for name in first.columns:
+        np.testing.assert_array_equal(again[name].to_numpy(), first[name].to_numpy())
+    assert list(again["state"].astype(str)) == ["GROUND", "GNC_ACTIVE"]
+
+
+def test_cache_is_invalidated_when_the_log_changes(tmp_path):
+    path = write(tmp_path, "code", FIXTURES["code"])
+    assert len(load_log(path)) == 2
+    with open(path, "a") as file:
+        file.write("0.05,89.0,0,0,0.0,0.0,0.1,0.0,-89.0,1.0\n")
+    assert len(load_log(path)) == 3
+
+    # Same size, new contents and mtime
+    stat = os.stat(path)
+    with open(path, "r+") as file:
+        text = file.read()
+        file.seek(0)
+        file.write(text.replace("-89.0,1.0", "-88.0,1.0"))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert os.path.getsize(path) == stat.st_size
+    np.testing.assert_allclose(load_log(path)["error"], [-90.0, -89.5, -88.0])
+
+
+def test_forced_dialect_is_not_cached(tmp_path):
+    # An 8-field nozzle-single log read as nozzle keeps no rows
+    path = write(tmp_path, "nozzle-single", FIXTURES["nozzle-single"])
+    assert len(load_log(path, dialect="nozzle")) == 0
+    assert not os.path.exists(cache_path(path))
+    assert load_log(path).attrs["dialect"] == "nozzle-single"
@@ -0,0 +1,104 @@
+# ============================================================
+# BNO055 model vs a per-sample reference, and reproducible gyro
+# noise in the engine
+#
+# ============================================================
+
+import numpy as np
+
+from polaris.simulation.campaign import NOMINAL
+from polaris.simulation.controllers import flight_law
+from polaris.simulation.engine import BatchSimulator, cylinder_inertia
+from polaris.simulation.sensor import BNO055, GYRO_RESOLUTION, BNO055Sensor, bno055_sensor
+from polaris.simulation.sweep import sweep
+
+DT = 0.002
+
+
+def reference_sensor(theta, omega, noise, sensor_rate, sensor_latency, resolution, gyro_noise):
+    """
+    One member, straight from the definition: at time t the flight code
+    reads the newest fusion sample (taken every 1 / sensor_rate from t = 0)
+    that is at least sensor_latency old, as a quantized 0-360 heading.
+    """
+    period = max(1.0 / sensor_rate if sensor_rate > 0 else DT, DT)
+    heading, gyro = [], []
+    for i in range(theta.size):
+        taken = np.floor(max(i * DT - sensor_latency, 0.0) / period + 1e-9) * period
+        j = int(np.rint(taken / DT))
+        degrees = np.degrees(theta[j]) % 360.0
+        if resolution > 0:
+            degrees = np.round(degrees / resolution) * resolution
+        heading.append(np.radians(degrees))
+        gyro.append(np.round((omega[j] + gyro_noise * noise[i]) / GYRO_RESOLUTION) * GYRO_RESOLUTION)
+    return np.array(heading), np.array(gyro)
+
+
+def test_sensor_matches_per_sample_reference():
+    params = {
+        "sensor_rate": np.array([0.0, 18.0, 100.0, 7.0, 18.0]),
+        "sensor_latency": np.array([0.0, 0.01, 0.0, 0.05, 0.033]),
+        "resolution": np.array([0.0, 1 / 16, 1 / 16, 1.0, 0.0]),
+        "gyro_noise": np.array([0.0, np.radians(0.1), 0.0, np.radians(1.0), np.radians(0.1)]),
+    }
+    n, steps = params["sensor_rate"].size, 2000
+    rng = np.random.default_rng(0)
+    omega = np.cumsum(rng.normal(0.0, 0.05, (n, steps)), axis=1)
+    theta = rng.uniform(-np.pi, np.pi, (n, 1)) + np.cumsum(omega * DT, axis=1)
+    noise = rng.standard_normal((n, steps))
+
+    sensor = BNO055Sensor(**params)
+    sensor.reset(n, DT, noise=noise)
+    heading, gyro = np.empty((n, steps)), np.empty((n, steps))
+    for i in range(steps):
+        heading[:, i] = sensor.step(theta[:, i], omega[:, i])
+        gyro[:, i] = sensor.gyro
+
+    for k in range(n):
+        member = {name: value[k] for name, value in params.items()}
+        reference = reference_sensor(theta[k], omega[k], noise[k], **member)
+        np.testing.assert_allclose(heading[k], reference[0], rtol=0, atol=1e-12)
+        np.testing.assert_allclose(gyro[k], reference[1], rtol=0, atol=1e-12)
+
+
+def test_perfect_sensor():
+    assert bno055_sensor(NOMINAL) is None
+    theta = np.linspace(-7.0, 7.0, 50)
+    sensor = BNO055Sensor(wrap=False)
+    sensor.reset(50, DT)
+    np.testing.assert_allclose(sensor.step(theta, np.zeros(50)), theta, rtol=0, atol=1e-12)
+
+
+def bno055_run(torque=None, **kwargs):
+    sim = BatchSimulator(cylinder_inertia(NOMINAL["M"], NOMINAL["R"]), flight_law("code", NOMINAL["setpoint"]),
+                         n=8, tf=5.0, n_steps=500, sensor=bno055_sensor(BNO055))
+    if torque is None:
+        torque = np.random.default_rng(1).uniform(-1.0, 1.0, (8, 500))
+    return sim.run(disturbance_torque=torque, **kwargs)
+
+
+def test_precomputed_torque_gives_reproducible_noise():
+    first, again = bno055_run(), bno055_run()
+    np.testing.assert_array_equal(first.gyro, again.gyro)
+    np.testing.assert_array_equal(first.theta, again.theta)
+
+
+def test_shared_sensor_noise():
+    noise = np.random.default_rng(2).standard_normal((8, 500))
+    result = bno055_run(sensor_noise=noise)
+    np.testing.assert_array_equal(bno055_run(sensor_noise=noise).gyro, result.gyro)
+    assert not np.array_equal(bno055_run(sensor_noise=-noise).gyro, result.gyro)
+
+    # Members flying the same draws read the same gyro
+    torque = np.random.default_rng(3).uniform(-1.0, 1.0, (1, 500))
+    same = bno055_run(np.tile(torque, (8, 1)), sensor_noise=np.tile(noise[:1], (8, 1)))
+    np.testing.assert_array_equal(same.gyro, np.tile(same.gyro[:1], (8, 1)))
+    assert np.any(same.gyro != np.round(same.omega / GYRO_RESOLUTION) * GYRO_RESOLUTION)
+
+
+def test_sweep_does_not_depend_on_chunk_size():
+    params = {**BNO055, "tf": 5.0, "n_steps": 500}
+    kwargs = dict(Kp=[0.4, 0.56, 0.8], Kd=[0.3, 0.5], law="code", n_seeds=10, params=params, workers=1)
+    small, large = sweep(chunk_size=7, **kwargs), sweep(chunk_size=60, **kwargs)
+    for cost in small.surfaces:
+        np.testing.assert_array_equal(small.surfaces[cost], large.surfaces[cost])
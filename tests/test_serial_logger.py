@@ -0,0 +1,95 @@
+# ============================================================
+# Vectorized serial_logger.parse_log_file vs the line-by-line
+# parser it replaced
+#
+# ============================================================
+
+import glob
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+HERE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "polaris", "tests", "11-12-test")
+
+COLUMNS = ['Delta_Time', 'Angular_Position', 'R_Solenoid', 'L_Solenoid',
+           'Gyro_X', 'Gyro_Y', 'Gyro_Z', 'PID_Output', 'Error', 'Derivative']
+
+
+def load_serial_logger():
+    pytest.importorskip("matplotlib")
+    spec = importlib.util.spec_from_file_location("serial_logger", os.path.join(HERE, "serial_logger.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def line_parser(filename):
+    """
+    parse_log_file() as it was, one line and one float() at a time.
+    """
+    data_lines = []
+    with open(filename, 'r') as f:
+        lines = f.readlines()
+    for line in lines:
+        if line.startswith('['):
+            parts = line.split('] ')
+            if len(parts) > 1:
+                data = parts[1].strip()
+                if ',' in data and not data.startswith('ERROR'):
+                    data_lines.append(data)
+
+    parsed_data = []
+    for line in data_lines:
+        try:
+            values = [float(x.strip()) for x in line.split(',')]
+            if len(values) == len(COLUMNS):
+                parsed_data.append(values)
+        except ValueError:
+            continue
+    df = pd.DataFrame(parsed_data, columns=COLUMNS)
+    df['Time'] = df['Delta_Time'].cumsum()
+    return df
+
+
+def assert_same(path):
+    new, old = load_serial_logger().parse_log_file(path), line_parser(path)
+    assert len(new) == len(old)
+    np.testing.assert_array_equal(new[COLUMNS + ['Time']].to_numpy(), old[COLUMNS + ['Time']].to_numpy())
+    return new
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(HERE, "serial_logs", "*"))),
+                         ids=os.path.basename)
+def test_bundled_logs(path):
+    assert_same(path)
+
+
+def test_edge_lines(tmp_path):
+    row = "0.05,90.0,1,0,0.0,0.0,0.1,0.9,-90.0,1.5"
+    lines = [
+        "Serial Log Started: 2025-11-12 19:30:16.316861",
+        f"[2025-11-12 19:30:17.001] {row}",
+        # float() takes nan and inf, so these rows stay
+        "[2025-11-12 19:30:17.051] 0.05,nan,1,0,0.0,0.0,0.1,0.9,NaN,1.5",
+        "[2025-11-12 19:30:17.101] 0.05,90.0,1,0,inf,-inf,0.1,0.9,-90.0,1.5",
+        f"[2025-11-12 19:30:17.151] {row}\r",
+        # No "] ", wrong field counts, text fields
+        f"[2025-11-12 19:30:17.201]{row}",
+        f"2025-11-12 19:30:17.251 {row}",
+        "[2025-11-12 19:30:17.301] 0.05,90.0,1,0,0.0,0.0,0.1,0.9,-90.0",
+        f"[2025-11-12 19:30:17.351] {row},7",
+        "[2025-11-12 19:30:17.401] 0.05,90.0,1,0,0.0,0.0,0.1,0.9,None,1.5",
+        "[2025-11-12 19:30:17.451] 0.05,90.0,1,0,0.0,,0.1,0.9,-90.0,1.5",
+        "[2025-11-12 19:30:17.501] Left Firing",
+        "[2025-11-12 19:30:17.551] ERROR: 0.05,90.0,1,0,0.0,0.0,0.1,0.9,-90.0",
+        f"[2025-11-12 19:30:17.601] {row}",
+    ]
+    path = tmp_path / "serial.csv"
+    path.write_bytes(("\n".join(lines)).encode())
+    new = assert_same(str(path))
+    assert len(new) == 5
+    assert np.isnan(new['Angular_Position'][1]) and np.isinf(new['Gyro_X'][2])
+    assert new['Host_Time'][3] == pd.Timestamp("2025-11-12 19:30:17.151")
@@ -0,0 +1,67 @@
+# ============================================================
+# Software-in-the-loop harness
+#
+# ============================================================
+
+import glob
+import os
+import tempfile
+
+from polaris.simulation.fleet import discover, fly_fleet, report
+from polaris.simulation.sil import THRUSTERS, run_flight, script_thrusters
+
+# polaris/
+SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "polaris")
+
+
+def test_wiring_comes_from_the_pin_assignments():
+    # code.py: negative_thruster on D12; old-code.py swaps the pins
+    assert script_thrusters(os.path.join(SCRIPTS, "code.py")) == {"D12": 1, "D13": -1}
+    assert script_thrusters(os.path.join(SCRIPTS, "tests", "11-12-test", "old-code.py")) == {"D12": -1, "D13": 1}
+    # right_thruster fires on a positive output, like negative_thruster
+    assert script_thrusters(os.path.join(SCRIPTS, "RP2040_files", "pidPico.py")) == {"D10": -1, "D11": 1}
+
+
+def test_commented_pins_are_ignored(tmp_path):
+    script = tmp_path / "flight.py"
+    script.write_text("import board\n"
+                      "# negative_thruster = digitalio.DigitalInOut(board.D12)\n"
+                      "positive_thruster = digitalio.DigitalInOut(board.D12)\n"
+                      "negative_thruster = digitalio.DigitalInOut(board.D13)\n")
+    assert script_thrusters(str(script)) == {"D12": -1, "D13": 1}
+
+    script.write_text("import board\nled = digitalio.DigitalInOut(board.D5)\n")
+    assert script_thrusters(str(script)) == THRUSTERS
+
+
+def test_discover_skips_non_flight_scripts():
+    found = discover()
+    assert "code.py" in found and os.path.join("RP2040_files", "pidPico.py") in found
+    # Sets up the thruster pins but never switches them
+    assert os.path.join("RP2040_files", "ledMosfet.py") not in found
+    assert not any(path.startswith("simulation") for path in found)
+
+
+def test_scripts_without_a_control_loop_are_skipped():
+    # integrationTest.py uses busio without importing it, catches the
+    # NameError and blinks the red LED
+    table = fly_fleet([os.path.join("RP2040_files", "integrationTest.py"), "code.py"], n_seeds=2, tf=5.0, workers=1)
+    summary = report(table)
+    assert summary.loc[os.path.join("RP2040_files", "integrationTest.py"), "skipped"] == 2
+    assert summary.loc[os.path.join("RP2040_files", "integrationTest.py"), "failed"] == 0
+    assert summary.loc["code.py", "skipped"] == 0
+
+
+def test_flight_removes_its_own_sd_dir(tmp_path):
+    def leftovers():
+        return set(glob.glob(os.path.join(tempfile.gettempdir(), "polaris-sil-*")))
+
+    before = leftovers()
+    record = run_flight(os.path.join(SCRIPTS, "code.py"), tf=5.0, seed=0)
+    assert leftovers() == before and record.sd_dir is None
+    assert any(name.endswith(".csv") and data for name, data in record.sd_files.items())
+
+    # A caller's directory is left as it is
+    record = run_flight(os.path.join(SCRIPTS, "code.py"), tf=5.0, seed=0, sd_dir=str(tmp_path))
+    assert record.sd_dir == str(tmp_path)
+    assert sorted(os.listdir(tmp_path)) == sorted(record.sd_files)